@@ -0,0 +1,77 @@
+"""Decode/encode cost of every installed json codec over recorded EMX frames.
+
+    python -m benchmarks.bench_codec
+"""
+from market_maker import codec
+
+from benchmarks.common import load_frames, measure_ns, print_table
+
+
+def make_order_requests():
+    create = {
+        'channel': 'trading',
+        'type': 'request',
+        'action': 'create-order',
+        'data': [
+            {
+                'client_id': '0c55bf3e-8a5d-4c22-9bd3-4e1a8f3cdde3',
+                'contract_code': 'BTC-PERP',
+                'type': 'limit',
+                'side': 'buy' if level % 2 else 'sell',
+                'size': '0.01',
+                'price': str(3925.0 + level * 0.5),
+                'post_only': True,
+            } for level in range(6)
+        ]
+    }
+    amend = {
+        'channel': 'trading',
+        'type': 'request',
+        'action': 'modify-order',
+        'data': [
+            {
+                'type': 'limit',
+                'side': 'buy' if level % 2 else 'sell',
+                'order_id': '475cc533-7248-4266-87ab-3cb82b64b4c7',
+                'size': '0.01',
+                'price': str(3925.0 + level * 0.5),
+            } for level in range(6)
+        ]
+    }
+    return [create, amend]
+
+
+def main():
+    frames = load_frames()
+    ticker_frames = [frame for frame in frames if '"channel":"ticker"' in frame]
+    orders_frames = [frame for frame in frames if '"channel":"orders"' in frame]
+    requests = make_order_requests()
+
+    rows = []
+    for name in codec.codecs:
+        impl = codec.codecs[name]
+
+        def decode_ticker():
+            for frame in ticker_frames:
+                impl.loads(frame)
+
+        def decode_orders():
+            for frame in orders_frames:
+                impl.loads(frame)
+
+        def encode_requests():
+            for request in requests:
+                impl.dumps_bytes(request)
+
+        rows.append([
+            name,
+            '{:.0f}'.format(measure_ns(decode_ticker) / len(ticker_frames)),
+            '{:.0f}'.format(measure_ns(decode_orders) / len(orders_frames)),
+            '{:.0f}'.format(measure_ns(encode_requests) / len(requests)),
+        ])
+
+    print_table('ns per frame', ['codec', 'ticker loads', 'orders loads', 'request dumps'], rows)
+
+
+if __name__ == '__main__':
+    main()
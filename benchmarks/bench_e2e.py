@@ -0,0 +1,256 @@
+"""Ticker frame to wire latency of the full tick-to-order path.
+
+A ticker frame is pushed where the websocket reader puts it, then goes
+through GatewayInterface.listen, StreamingAdapter, the top of book mailbox,
+MarketMaker and OrdersManager to ExecutionAdapter. The latency ends when the
+request bytes are handed to the socket. The socket is an in-process fake
+backed by the simulator matching engine, so every request is acknowledged.
+
+    python -m benchmarks.bench_e2e [-ticks 5000] [-output results.json]
+    python -m benchmarks.bench_e2e -compare        # fails on a regression
+    python -m benchmarks.bench_e2e -save_baseline  # after an intended change
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+
+import aiohttp
+from munch import DefaultMunch
+
+from market_maker import codec
+from market_maker import latency
+from market_maker.engine import Engine
+from market_maker.simulator.server import EmxSimulator, Connection
+
+from benchmarks.common import percentiles, print_table
+
+INSTRUMENT = 'BTC-PERP'
+WARMUP_TICKS = 100
+SEND_TIMEOUT_SECS = 1.0
+PERCENTILES = (50, 99, 99.9)
+# p99.9 of a few thousand samples is a handful of outliers, too noisy to fail on
+CHECKED_PERCENTILES = ('p50', 'p99')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'baselines', 'bench_e2e.json')
+# a metric regresses when it is slower than the baseline by more than this share
+TOLERANCE = 0.25
+
+
+class ExchangeSide:
+    # the simulator's end of the socket, its frames go straight to the client reader queue
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def send_str(self, data):
+        await self.queue.put(
+            (time.perf_counter_ns(), aiohttp.WSMessage(aiohttp.WSMsgType.text, data, None)))
+
+    async def close(self):
+        pass
+
+
+class FakeSocket:
+    # the client's end of the socket, records when the request bytes are handed over
+
+    def __init__(self, simulator, conn):
+        self.simulator = simulator
+        self.conn = conn
+        self.send_ns = []
+        self.sent_bytes = 0
+        self.sent = asyncio.Event()
+
+    async def send_frame(self, data, msg_type):
+        self.send_ns.append(time.perf_counter_ns())
+        self.sent_bytes += len(data)
+        self.sent.set()
+        await self.simulator.process_request(self.conn, codec.loads(data))
+
+    async def send_str(self, data):
+        await self.send_frame(data.encode(), aiohttp.WSMsgType.text)
+
+    async def ping(self, msg):
+        pass
+
+    async def close(self):
+        pass
+
+
+def make_config():
+    cfg = DefaultMunch()
+
+    cfg.strategy = DefaultMunch()
+    cfg.strategy.name = 'market_maker'
+    cfg.strategy.instrument_name = INSTRUMENT
+    cfg.strategy.mid_price_based_calculation = False
+    cfg.strategy.send_post_only_orders = True
+    cfg.strategy.tick_size = 0.5
+    cfg.strategy.stop_strategy_on_error = False
+    cfg.strategy.min_requote_interval = 0.0
+    cfg.strategy.positional_retreat = DefaultMunch()
+    cfg.strategy.positional_retreat.position_increment = 0.03
+    cfg.strategy.positional_retreat.retreat_ticks = 5
+    cfg.strategy.orders = DefaultMunch()
+    cfg.strategy.orders.asks = [[1, 0.01], [3, 0.02], [5, 0.03]]
+    cfg.strategy.orders.bids = [[1, 0.01], [3, 0.02], [5, 0.03]]
+
+    cfg.adapter = DefaultMunch()
+    cfg.adapter.api_key = ''
+    cfg.adapter.api_secret = ''
+    cfg.adapter.streaming = DefaultMunch()
+    cfg.adapter.streaming.symbol = INSTRUMENT
+    cfg.adapter.execution = DefaultMunch()
+    cfg.adapter.execution.symbol = INSTRUMENT
+    return cfg
+
+
+def ticker_frame(bid):
+    return codec.dumps({
+        'channel': 'ticker',
+        'type': 'update',
+        'data': {
+            'contract_code': INSTRUMENT,
+            'quote': {'bid': str(bid), 'bid_size': '1.0000', 'ask': str(bid + 0.5),
+                      'ask_size': '1.0000', 'timestamp': '2019-02-22T10:03:21.012Z'},
+            'mark_price': str(bid + 0.25),
+        }
+    })
+
+
+async def run_bench(number_of_ticks):
+    engine = Engine(make_config())
+    adapter = engine.exchange_adapter
+    queue = adapter.websocket.queue
+
+    simulator = EmxSimulator()
+    conn = Connection(ExchangeSide(queue), 0.0)
+    simulator.connections.add(conn)
+    await simulator.subscribe(conn, {'channels': ['orders', 'trading', 'ticker', 'positions'],
+                                     'contract_codes': [INSTRUMENT]})
+
+    socket = FakeSocket(simulator, conn)
+    adapter.websocket.ws = socket
+    adapter.started = True
+    adapter.ready_to_listen.set()
+    engine.strategy.started_time = 0.0
+
+    tasks = [asyncio.ensure_future(engine.listen_updates()),
+             asyncio.ensure_future(engine.run_strategy(engine.strategy))]
+
+    latencies = []
+    requests = 0
+    missed = 0
+    bid = 3925.0
+    for idx in range(WARMUP_TICKS + number_of_ticks):
+        # alternating moves make every tick a re-quote
+        bid += 0.5 if idx % 2 else -0.5
+        frame = ticker_frame(bid)
+
+        socket.sent.clear()
+        sends_before = len(socket.send_ns)
+        received_ns = time.perf_counter_ns()
+        await queue.put((received_ns, aiohttp.WSMessage(aiohttp.WSMsgType.text, frame, None)))
+
+        try:
+            await asyncio.wait_for(socket.sent.wait(), SEND_TIMEOUT_SECS)
+        except asyncio.TimeoutError:
+            missed += 1
+            continue
+
+        # acks of this re-quote are processed before the next tick is sent
+        while not queue.empty():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        if idx == WARMUP_TICKS - 1:
+            latency.stats.reset()
+        if idx >= WARMUP_TICKS:
+            latencies.append((socket.send_ns[sends_before] - received_ns) / 1000.0)
+            requests += len(socket.send_ns) - sends_before
+
+    engine.is_active = False
+    for task in tasks:
+        task.cancel()
+
+    latencies.sort()
+    results = {
+        'ticks': number_of_ticks,
+        'requotes': len(latencies),
+        'missed': missed,
+        'requests_per_requote': requests / max(len(latencies), 1),
+        'bytes_sent': socket.sent_bytes,
+        'illegal_transitions': engine.strategy.orders_manager.get_illegal_transitions(),
+        'latency_us': percentiles(latencies, PERCENTILES),
+        'stages_us': latency.stats.get_report(),
+    }
+    return results
+
+
+def compare(results, baseline):
+    regressions = []
+    for name in CHECKED_PERCENTILES:
+        value = results['latency_us'][name]
+        base = baseline['latency_us'].get(name)
+        if base is not None and value > base * (1.0 + TOLERANCE):
+            regressions.append(f'latency {name}: {value:.1f} us, baseline {base:.1f} us')
+    if results['requests_per_requote'] > baseline['requests_per_requote']:
+        regressions.append(f'requests per re-quote: {results["requests_per_requote"]:.2f}, '
+                           f'baseline {baseline["requests_per_requote"]:.2f}')
+    if results['missed'] or results['illegal_transitions']:
+        regressions.append(f'missed re-quotes: {results["missed"]}, '
+                           f'illegal transitions: {results["illegal_transitions"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tick-to-order latency benchmark')
+    parser.add_argument('-ticks', type=int, default=5000)
+    parser.add_argument('-output', help='a path to write the results as json')
+    parser.add_argument('-compare', action='store_true', help='compare with the stored baseline')
+    parser.add_argument('-save_baseline', action='store_true', help='store the results as baseline')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    results = asyncio.get_event_loop().run_until_complete(run_bench(args.ticks))
+    results['python'] = platform.python_version()
+    results['codec'] = codec.codec.name
+
+    row = [results['requotes'], results['missed'],
+           '{:.2f}'.format(results['requests_per_requote'])]
+    row += ['{:.1f}'.format(value) for value in results['latency_us'].values()]
+    print_table('ticker frame to request bytes, us',
+                ['re-quotes', 'missed', 'requests'] + list(results['latency_us']), [row])
+
+    for stage, msg_types in results['stages_us'].items():
+        print_table(f'{stage}, us', ['msg type', 'count', 'p50', 'p99', 'p99.9'],
+                    [[msg_type, summary['count']] +
+                     ['{:.1f}'.format(summary[name]) for name in ('p50', 'p99', 'p99.9')]
+                     for msg_type, summary in msg_types.items()])
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=4)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=4)
+
+    if args.compare:
+        with open(BASELINE_PATH, 'r') as baseline_file:
+            regressions = compare(results, json.load(baseline_file))
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('no regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Per-message logging cost on the hot path at the production INFO level.
+
+The legacy variants format the whole payload into an INFO f-string, as
+StreamingAdapter.process and the ExecutionAdapter senders used to do. The
+current code logs payloads at TRACE behind a cached level check. Records
+go through the repo formatter into os.devnull, so the I/O cost is small.
+
+    python -m benchmarks.bench_logging
+"""
+import os
+import logging
+
+from munch import DefaultMunch
+
+from market_maker import codec
+from market_maker.logger.log_formatter import LogFormatter
+from market_maker.logger.logging import TRACE
+from market_maker.mailbox import TopOfBookMailbox
+from market_maker.gateways.emx.streaming import StreamingAdapter
+from market_maker.gateways.emx.shared_storage import SharedStorage
+
+from benchmarks.common import load_frames, measure_ns, print_table
+
+
+class LegacyStreamingAdapter(StreamingAdapter):
+    async def process(self, msg, msg_callback):
+        self.logger.info(f'Emx streaming got a msg: {msg}')
+        return await super().process(msg, msg_callback)
+
+
+def make_logger(devnull):
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(LogFormatter())
+
+    logger = logging.getLogger('bench_logging')
+    logger.propagate = False
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def make_streaming(adapter_type, logger):
+    config = DefaultMunch()
+    config.symbol = 'BTC-PERP'
+    config.exchange_name = 'emx'
+
+    streaming = adapter_type(config, None, SharedStorage(), TopOfBookMailbox())
+    streaming.subscribed = True
+    streaming.logger = logger
+    return streaming
+
+
+def run_coroutine(coro):
+    # process never awaits anything when there is no callback, one send drives it to the end
+    try:
+        coro.send(None)
+    except StopIteration:
+        pass
+
+
+def find_frame(frames, channel, action=None):
+    for frame in frames:
+        msg = codec.loads(frame)
+        if msg.get('channel') == channel and (action is None or msg.get('action') == action):
+            return msg
+    raise Exception(f'No {channel} {action} frame was found')
+
+
+def make_amend_request():
+    return {
+        'channel': 'trading',
+        'type': 'request',
+        'action': 'modify-order',
+        'data': [
+            {
+                'type': 'limit',
+                'side': 'buy' if level % 2 else 'sell',
+                'order_id': '475cc533-7248-4266-87ab-3cb82b64b4c7',
+                'size': '0.01',
+                'price': str(3925.0 + level * 0.5),
+            } for level in range(6)
+        ]
+    }
+
+
+def main():
+    with open(os.devnull, 'w') as devnull:
+        logger = make_logger(devnull)
+        legacy = make_streaming(LegacyStreamingAdapter, logger)
+        current = make_streaming(StreamingAdapter, logger)
+
+        frames = load_frames()
+        rows = []
+        for name, msg in [('ticker frame', find_frame(frames, 'ticker')),
+                          ('accepted frame', find_frame(frames, 'orders', 'accepted')),
+                          ('canceled frame', find_frame(frames, 'orders', 'canceled'))]:
+            legacy_ns = measure_ns(lambda: run_coroutine(legacy.process(msg, None)))
+            current_ns = measure_ns(lambda: run_coroutine(current.process(msg, None)))
+            rows.append([f'StreamingAdapter.process, {name}', '{:.0f}'.format(legacy_ns),
+                         '{:.0f}'.format(current_ns), '{:.0f}'.format(legacy_ns - current_ns)])
+
+        final_data = make_amend_request()
+
+        def legacy_send_log():
+            logger.info(f'Sending bulk amend request. Data: {final_data}')
+
+        def current_send_log():
+            logger.info('Sending bulk amend request. Orders = %d', len(final_data['data']))
+            if logger.isEnabledFor(TRACE):
+                logger.log(TRACE, 'Sending bulk amend request. Data: %s', final_data)
+
+        legacy_ns = measure_ns(legacy_send_log)
+        current_ns = measure_ns(current_send_log)
+        rows.append(['bulk amend request log, 6 orders', '{:.0f}'.format(legacy_ns),
+                     '{:.0f}'.format(current_ns), '{:.0f}'.format(legacy_ns - current_ns)])
+
+    print_table('logging at INFO, ns per message',
+                ['path', 'payload f-string', 'TRACE guarded', 'saved'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Construction time and memory of the slotted message types on the tick and ack paths.
+
+The legacy classes below are the former __dict__ based definitions.
+
+    python -m benchmarks.bench_messages
+"""
+import datetime
+import tracemalloc
+
+from market_maker.definitions import (
+    OrderSide,
+    OrderType,
+    OrderRequest,
+    TopOfBook,
+    OrderFillAcknowledgement,
+    NewOrderAcknowledgement,
+)
+
+from benchmarks.common import measure_ns, print_table
+
+
+class LegacyOrderRequest:
+    def __init__(self):
+        self.instrument_name = ""
+        self.quantity = 0.0
+        self.price = 0.0
+        self.side = OrderSide.unknown
+        self.type = OrderType.unknown
+        self.order_id = ""
+        self.timestamp = datetime.datetime.now().timestamp()
+
+
+class LegacyTopOfBook:
+    def __init__(self):
+        self.exchange = ""
+        self.product = ""
+        self.best_bid_price = None
+        self.best_bid_qty = None
+        self.best_ask_price = None
+        self.best_ask_qty = None
+        self.timestamp = 0.0
+
+
+class LegacyNewOrderAcknowledgement:
+    def __init__(self):
+        self.order_id = ""
+        self.instrument_name = ""
+        self.quantity = 0.0
+        self.price = 0.0
+        self.side = OrderSide.unknown
+        self.type = OrderType.unknown
+        self.timestamp = datetime.datetime.now().timestamp()
+
+
+class LegacyOrderFillAcknowledgement:
+    def __init__(self):
+        self.exchange = ""
+        self.instrument = ""
+        self.order_id = ""
+        self.exchange_id = ""
+        self.fill_id = ""
+        self.side = ""
+        self.order_type = ""
+        self.order_qty = 0.0
+        self.price = 0.0
+        self.fill_price = 0.0
+        self.running_fill_qty = 0.0
+        self.incremental_fill_qty = 0.0
+        self.timestamp = ""
+        self.fee = 0.0
+        self.average_fill_price = 0.0
+
+
+def make_tob(tob_type):
+    tob = tob_type()
+    tob.exchange = 'emx'
+    tob.product = 'BTC-PERP'
+    tob.best_bid_price = 3925.0
+    tob.best_bid_qty = 1.5
+    tob.best_ask_price = 3925.5
+    tob.best_ask_qty = 2.5
+    return tob
+
+
+def bytes_per_instance(factory, count=10000):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    instances = [factory() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del instances
+    # the list holding the instances is not a part of the message cost
+    return (allocated - count * 8) / count
+
+
+def main():
+    pairs = [
+        ('TopOfBook', lambda: make_tob(LegacyTopOfBook), lambda: make_tob(TopOfBook)),
+        ('OrderRequest', LegacyOrderRequest, OrderRequest),
+        ('NewOrderAcknowledgement', LegacyNewOrderAcknowledgement, NewOrderAcknowledgement),
+        ('OrderFillAcknowledgement', LegacyOrderFillAcknowledgement, OrderFillAcknowledgement),
+    ]
+
+    rows = []
+    for name, legacy, slotted in pairs:
+        rows.append([
+            name,
+            '{:.0f}'.format(measure_ns(legacy, number=20000)),
+            '{:.0f}'.format(measure_ns(slotted, number=20000)),
+            '{:.0f}'.format(bytes_per_instance(legacy)),
+            '{:.0f}'.format(bytes_per_instance(slotted)),
+        ])
+
+    print_table(
+        'per message',
+        ['message', 'legacy ns', 'slotted ns', 'legacy bytes', 'slotted bytes'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Order state transitions per second for a simulated ack/fill/amend stream.
+
+    python -m benchmarks.bench_order_state
+"""
+import logging
+
+from market_maker.order_state import Event, OrderState
+from market_maker.orders_manager import OrdersManager
+
+from benchmarks.common import measure_ns, print_table
+
+# a typical order life: placed, re-quoted a few times, partially filled, amended, cancelled
+ORDER_LIFE = (
+    Event.on_creation,
+    Event.on_insert_ack,
+    Event.on_amend,
+    Event.on_amend_ack,
+    Event.on_amend,
+    Event.on_amend_ack,
+    Event.on_fill,
+    Event.on_amend,
+    Event.on_amend_partial_ack,
+    Event.on_fill,
+    Event.on_cancel,
+    Event.on_cancel_ack,
+)
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+
+    def drive_order_state():
+        order_state = OrderState()
+        for event in ORDER_LIFE:
+            order_state.on_event(event)
+
+    om = OrdersManager(None)
+
+    def drive_orders_manager():
+        for event in ORDER_LIFE:
+            om.update_order_state('order_id', event)
+
+    rows = []
+    for name, func in (('OrderState.on_event', drive_order_state),
+                       ('OrdersManager.update_order_state', drive_orders_manager)):
+        ns_per_transition = measure_ns(func, number=20000) / len(ORDER_LIFE)
+        rows.append([name, '{:.0f}'.format(ns_per_transition),
+                     '{:.0f}'.format(1e9 / ns_per_transition)])
+
+    print_table('order state transitions', ['path', 'ns', 'per second'], rows)
+
+
+if __name__ == '__main__':
+    main()
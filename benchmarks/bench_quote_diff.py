@@ -0,0 +1,89 @@
+"""Orders sent per re-quote by the legacy pairing and by the quote differ.
+
+The mid walks on the tick grid, by one tick most of the time. A ladder of
+levels on each side is re-quoted on every move. The legacy pairing zips the
+desired and the live orders sorted by price and amends every pair which
+differs. The differ keeps the levels which did not move.
+
+    python -m benchmarks.bench_quote_diff [-requotes 10000] [-levels 5]
+"""
+import random
+import argparse
+
+from market_maker.quote_differ import QuoteDiffer
+from market_maker.definitions import OrderRequest, OrderSide, OrderType
+
+from benchmarks.common import measure_ns, print_table
+
+TICK = 0.5
+
+
+def make_ladder(mid_ticks, levels):
+    orders = []
+    for level in range(levels):
+        for side, price_ticks in ((OrderSide.buy, mid_ticks - 1 - level),
+                                  (OrderSide.sell, mid_ticks + 1 + level)):
+            order = OrderRequest()
+            order.order_id = f'{side.name}-{level}'
+            order.side = side
+            order.type = OrderType.limit
+            order.price = price_ticks * TICK
+            order.quantity = 1.0
+            orders.append(order)
+    return orders
+
+
+def legacy_amends(desired, live):
+    # OrdersManager.amend_orders before the differ, every order is active
+    def by_price(order):
+        return order.price
+    return sum(1 for new, existing in zip(sorted(desired, key=by_price), sorted(live, key=by_price))
+               if new.price != existing.price or new.quantity != existing.quantity)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Orders sent per re-quote')
+    parser.add_argument('-requotes', type=int, default=10000)
+    parser.add_argument('-levels', type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    moves = [rnd.choice((-1, 1)) * (1 if rnd.random() < 0.9 else rnd.randint(2, 2 * args.levels))
+             for _ in range(args.requotes)]
+
+    differs = [('legacy pairing', None),
+               ('differ', QuoteDiffer()),
+               ('differ, amend costs 3', QuoteDiffer(amend_cost=3))]
+
+    rows = []
+    for name, differ in differs:
+        mid_ticks = 8000
+        live = make_ladder(mid_ticks, args.levels)
+        orders = cost = 0
+        for move in moves:
+            mid_ticks += move
+            desired = make_ladder(mid_ticks, args.levels)
+            if differ is None:
+                amends = legacy_amends(desired, live)
+                orders += amends
+                cost += amends
+            else:
+                diff = differ.diff(desired, live)
+                orders += len(diff.amend) + len(diff.place) + len(diff.cancel)
+                cost += diff.get_cost(differ)
+            live = desired
+
+        desired = make_ladder(mid_ticks + 1, args.levels)
+        if differ is None:
+            diff_ns = measure_ns(lambda: legacy_amends(desired, live), number=2000)
+        else:
+            diff_ns = measure_ns(lambda: differ.diff(desired, live), number=2000)
+        rows.append([name, '{:.2f}'.format(orders / len(moves)),
+                     '{:.2f}'.format(cost / len(moves)), '{:.1f}'.format(diff_ns / 1000)])
+
+    print_table(f'{args.levels} levels per side, {len(moves)} re-quotes',
+                ['pairing', 'orders/requote', 'cost/requote', 'diff, us'], rows)
+
+
+if __name__ == '__main__':
+    main()
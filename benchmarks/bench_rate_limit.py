@@ -0,0 +1,156 @@
+"""Orders over the venue rate limit in a burst of re-quotes.
+
+A fast market re-quotes every few milliseconds through OrdersManager and the
+EMX ExecutionAdapter. The venue allows a number of orders per second and
+acknowledges the ones it takes ACK_SECS later, everything above its budget
+is rejected, and a rejection makes the strategy reconnect. Here rejected
+orders are only left out of later re-quotes. Without the scheduler every
+request goes out. With it the orders wait for the budget.
+Orders with an in-flight request hold their newest target in OrdersManager,
+so the scheduler does not get repeated amends of one order to coalesce.
+
+    python -m benchmarks.bench_rate_limit [-requotes 200] [-interval 0.002] [-rate 100]
+"""
+import time
+import random
+import asyncio
+import logging
+import argparse
+
+from munch import DefaultMunch
+
+from market_maker import codec
+from market_maker.orders_manager import OrdersManager
+from market_maker.order_state import Event
+from market_maker.request_scheduler import TokenBucket
+from market_maker.gateways.emx.execution import ExecutionAdapter
+from market_maker.gateways.emx.shared_storage import SharedStorage
+from market_maker.definitions import OrderRequest, OrderSide, OrderType
+
+from benchmarks.common import print_table
+
+INSTRUMENT = 'BTC-PERP'
+TICK = 0.5
+LEVELS = 3
+ACK_SECS = 0.01
+ACTIONS = ('cancel-order', 'modify-order', 'create-order')
+
+
+class Venue:
+    # the websocket of the execution adapter, rejects the orders over its token bucket per action
+    def __init__(self, rate, burst, storage):
+        self.buckets = {action: TokenBucket(rate, burst) for action in ACTIONS}
+        self.storage = storage
+        self.orders_manager = None
+        self.accepted = 0
+        self.rejected = 0
+        self.requests = 0
+        self.next_eid = 0
+
+    async def send_payload(self, data, action):
+        self.requests += 1
+        bodies = codec.loads(data)['data']
+        if not isinstance(bodies, list):
+            bodies = [bodies]
+
+        bucket = self.buckets[action]
+        accepted = min(len(bodies), bucket.available(time.monotonic()))
+        bucket.take(accepted)
+        self.accepted += accepted
+        self.rejected += len(bodies) - accepted
+
+        loop = asyncio.get_event_loop()
+        for idx, body in enumerate(bodies):
+            loop.call_later(ACK_SECS, self.ack, action, body, idx < accepted)
+
+    def ack(self, action, body, accepted):
+        if action == 'create-order':
+            uid = body['client_id']
+            if accepted:
+                self.next_eid += 1
+                self.storage.map_ids(uid, f'eid-{self.next_eid}')
+            event = Event.on_insert_ack if accepted else Event.on_insert_rejection
+        elif action == 'modify-order':
+            uid = self.storage.get_uid(body['order_id'])
+            self.storage.clear_amend(body['order_id'])
+            event = Event.on_amend_ack if accepted else Event.on_amend_rejection
+        else:
+            uid = self.storage.release_eid(body['order_id'])
+            event = Event.on_cancel_ack if accepted else Event.on_cancel_rejection
+
+        if uid is None:
+            return
+        self.orders_manager.update_order_state(uid, event)
+        if self.orders_manager.has_intent(uid):
+            asyncio.ensure_future(self.orders_manager.send_intent(uid))
+
+
+def make_ladder(mid_ticks):
+    orders = []
+    for level in range(LEVELS):
+        for side, price_ticks in ((OrderSide.buy, mid_ticks - 1 - level),
+                                  (OrderSide.sell, mid_ticks + 1 + level)):
+            order = OrderRequest()
+            order.instrument_name = INSTRUMENT
+            order.side = side
+            order.type = OrderType.limit
+            order.price = price_ticks * TICK
+            order.quantity = 1.0
+            orders.append(order)
+    return orders
+
+
+async def run_bench(requotes, interval, rate, limits):
+    config = DefaultMunch()
+    config.symbol = INSTRUMENT
+    config.rate_limits = limits
+    storage = SharedStorage()
+    venue = Venue(rate, rate / 10, storage)
+    execution = ExecutionAdapter(config, None, venue, storage)
+    om = venue.orders_manager = OrdersManager(execution, INSTRUMENT)
+
+    rnd = random.Random(3)
+    mid_ticks = 8000
+    started = time.monotonic()
+    for _ in range(requotes):
+        mid_ticks += rnd.choice((-1, 1))
+        await om.amend_active_orders(make_ladder(mid_ticks))
+        await asyncio.sleep(interval)
+    while execution.scheduler.task is not None:
+        await asyncio.sleep(interval)
+    await asyncio.sleep(2 * ACK_SECS)
+    elapsed = time.monotonic() - started
+
+    stats = execution.scheduler.get_stats()
+    return [venue.requests, venue.accepted, venue.rejected,
+            sum(stats['queued'].values()), sum(stats['coalesced'].values()),
+            om.get_requote_stats().get('held', 0), '{:.2f}'.format(elapsed)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Orders over the venue rate limit')
+    parser.add_argument('-requotes', type=int, default=200)
+    parser.add_argument('-interval', type=float, default=0.002)
+    parser.add_argument('-rate', type=float, default=100.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    rows = []
+    limit = {'rate': args.rate, 'burst': args.rate / 10}
+    for name, limits in (('no scheduler', None),
+                         ('scheduler', {action: limit for action in ACTIONS})):
+        rows.append([name] + loop.run_until_complete(
+            run_bench(args.requotes, args.interval, args.rate, limits)))
+    loop.close()
+
+    print_table(f'{args.requotes} re-quotes of {LEVELS} levels per side every '
+                f'{args.interval * 1000:g} ms, venue limit {args.rate:g} orders/s per action',
+                ['', 'requests', 'accepted', 'rejected', 'queued', 'coalesced', 'held',
+                 'secs'], rows)
+
+
+if __name__ == '__main__':
+    main()
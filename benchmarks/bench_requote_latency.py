@@ -0,0 +1,192 @@
+"""Tick arrival to amend send latency of the strategy loop.
+
+Compares the former fixed 0.1 s sleep between runs with the event driven
+wakeup, with and without the minimal re-quote interval.
+
+    python -m benchmarks.bench_requote_latency
+"""
+import time
+import random
+import asyncio
+import logging
+
+from munch import DefaultMunch
+
+from market_maker.strategy.market_maker import MarketMaker
+from market_maker.gateways.gateway_interface import GatewayInterface
+from market_maker.definitions import (
+    ApiResult,
+    TopOfBook,
+    NewOrderAcknowledgement,
+    AmendAcknowledgement,
+)
+
+from benchmarks.common import print_table
+
+INSTRUMENT = 'BTC-PERP'
+NUMBER_OF_TICKS = 200
+
+
+class AckingAdapter(GatewayInterface):
+    # acknowledges every request on the next loop iteration and records send times
+
+    def __init__(self):
+        super().__init__()
+        self.config = DefaultMunch()
+        self.config.name = 'bench'
+        self.storage = DefaultMunch()
+        self.storage.uid_to_eid = {}
+        self.storage.eid_to_uid = {}
+        self.strategy = None
+        self.send_times = []
+
+    def set_order_update_callback(self, msg_callback):
+        pass
+
+    def update_post_only_flag(self, post_only_flag):
+        pass
+
+    def _ack(self, ack_type, orders):
+        for order in orders:
+            ack = ack_type()
+            ack.order_id = order.order_id
+            asyncio.ensure_future(self.strategy.on_market_update(ack))
+
+    def _sent(self):
+        self.send_times.append(time.perf_counter())
+        res = ApiResult()
+        res.success = True
+        return res
+
+    async def send_order(self, order):
+        self._ack(NewOrderAcknowledgement, [order])
+        return self._sent()
+
+    async def send_orders(self, orders):
+        self._ack(NewOrderAcknowledgement, orders)
+        return self._sent()
+
+    async def amend_orders(self, new, old):
+        self._ack(AmendAcknowledgement, new)
+        return self._sent()
+
+    async def cancel_order(self, order_id):
+        return self._sent()
+
+    async def cancel_orders(self, orders_ids):
+        return self._sent()
+
+    async def cancel_active_orders(self, contract_code=None):
+        return self._sent()
+
+    async def start(self):
+        pass
+
+    def is_ready(self):
+        return True
+
+
+def make_config(min_requote_interval):
+    cfg = DefaultMunch()
+    cfg.name = 'market_maker'
+    cfg.instrument_name = INSTRUMENT
+    cfg.mid_price_based_calculation = False
+    cfg.send_post_only_orders = True
+    cfg.tick_size = 0.5
+    cfg.stop_strategy_on_error = False
+    cfg.min_requote_interval = min_requote_interval
+    cfg.positional_retreat = DefaultMunch()
+    cfg.positional_retreat.position_increment = None
+    cfg.positional_retreat.retreat_ticks = None
+    cfg.orders = DefaultMunch()
+    cfg.orders.asks = [[1, 0.01], [3, 0.02], [5, 0.03]]
+    cfg.orders.bids = [[1, 0.01], [3, 0.02], [5, 0.03]]
+    return cfg
+
+
+async def sleeping_loop(strategy, running):
+    while running.is_set():
+        await strategy.run()
+        await asyncio.sleep(0.1)
+
+
+async def event_loop(strategy, running):
+    while running.is_set():
+        await strategy.run()
+        await strategy.wait_for_update()
+
+
+async def run_scenario(strategy_loop, min_requote_interval, seed):
+    adapter = AckingAdapter()
+    strategy = MarketMaker(make_config(min_requote_interval), adapter)
+    strategy.started_time = 0.0
+    adapter.strategy = strategy
+
+    running = asyncio.Event()
+    running.set()
+    loop_task = asyncio.ensure_future(strategy_loop(strategy, running))
+
+    rnd = random.Random(seed)
+    tick_times = []
+    price = 3925.0
+    for _ in range(NUMBER_OF_TICKS):
+        await asyncio.sleep(rnd.uniform(0.005, 0.15))
+        price += rnd.choice((-0.5, 0.5))
+
+        tob = TopOfBook()
+        tob.product = INSTRUMENT
+        tob.best_bid_price = price
+        tob.best_ask_price = price + 0.5
+        tick_times.append(time.perf_counter())
+        adapter.tob_mailbox.put(tob)
+
+    await asyncio.sleep(0.3)
+    running.clear()
+    strategy.wakeup.set()
+    await loop_task
+
+    # the first send after a tick is attributed to the latest tick which arrived before it
+    latencies = []
+    tick_idx = 0
+    last_tick_idx = None
+    for send_time in adapter.send_times:
+        while tick_idx + 1 < len(tick_times) and tick_times[tick_idx + 1] <= send_time:
+            tick_idx += 1
+        if tick_idx != last_tick_idx:
+            latencies.append((send_time - tick_times[tick_idx]) * 1000.0)
+            last_tick_idx = tick_idx
+    latencies.sort()
+    return latencies
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def main():
+    scenarios = [
+        ('sleep 0.1 s', sleeping_loop, 0.0),
+        ('event, min interval 0.1 s', event_loop, 0.1),
+        ('event, min interval 0 s', event_loop, 0.0),
+    ]
+
+    logging.disable(logging.CRITICAL)
+
+    rows = []
+    loop = asyncio.get_event_loop()
+    for name, strategy_loop, min_requote_interval in scenarios:
+        latencies = loop.run_until_complete(
+            run_scenario(strategy_loop, min_requote_interval, seed=1))
+        rows.append([
+            name,
+            len(latencies),
+            '{:.2f}'.format(percentile(latencies, 50)),
+            '{:.2f}'.format(percentile(latencies, 99)),
+            '{:.2f}'.format(latencies[-1]),
+        ])
+
+    print_table('tick arrival to amend send, ms', ['loop', 're-quotes', 'p50', 'p99', 'max'], rows)
+
+
+if __name__ == '__main__':
+    main()
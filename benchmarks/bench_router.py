@@ -0,0 +1,151 @@
+"""Dispatch cost of StreamingAdapter.process per frame type.
+
+The legacy adapter below is the former process method, a chain of type and
+channel comparisons ahead of the order event table. The current one looks
+the (channel, type, action) key up in the precompiled routes.
+
+    python -m benchmarks.bench_router
+"""
+import logging
+
+from munch import DefaultMunch
+
+from market_maker import codec
+from market_maker.mailbox import TopOfBookMailbox
+from market_maker.definitions import TopOfBook
+from market_maker.logger.logging import TRACE
+from market_maker.gateways.emx.streaming import StreamingAdapter
+from market_maker.gateways.emx.shared_storage import SharedStorage
+
+from benchmarks.common import load_frames, measure_ns, print_table
+
+ROUNDS = 20
+
+
+class LegacyStreamingAdapter(StreamingAdapter):
+    async def process(self, msg, msg_callback):
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx streaming got a msg: %s', msg)
+
+        if msg.get('type') == 'subscriptions':
+            self.subscribed = True
+            return
+
+        if msg.get('type') == 'snapshot' and msg.get('channel') == 'orders':
+            res = self.process_active_orders(msg['data'])
+            if res and msg_callback is not None:
+                await msg_callback(res)
+            return
+
+        if self.subscribed is False:
+            return
+
+        if msg.get('channel') == 'positions':
+            for pos in self.process_position_update(msg):
+                if msg_callback is not None:
+                    await msg_callback(pos)
+            return
+
+        if msg.get('channel') == 'ticker':
+            res = self.process_tick(msg)
+            try:
+                self.positions_mngr.set_mark_price(self.config.exchange_name,
+                                                   msg['data']['contract_code'],
+                                                   float(res.mark_price))
+            except Exception:
+                pass
+            self.tob_mailbox.put(res)
+            return
+
+        if msg.get('channel') != 'orders':
+            return
+
+        if msg.get('type') != 'update':
+            return
+
+        action = msg.get('action')
+        if action is None:
+            return
+
+        process_event = self.events.get(action)
+        if process_event is None:
+            return
+
+        res = process_event(msg['data'])
+        if res and msg_callback is not None:
+            await msg_callback(res)
+
+
+def make_streaming(adapter_type, stub_handlers=False):
+    config = DefaultMunch()
+    config.exchange_name = 'emx'
+
+    streaming = adapter_type(config, None, SharedStorage(), TopOfBookMailbox())
+    streaming.subscribed = True
+
+    if stub_handlers:
+        # only the dispatch is left to measure
+        def stub(msg):
+            return None
+        tob = TopOfBook()
+        tob.product = 'BTC-PERP'
+        streaming.process_tick = lambda msg: tob
+        streaming.process_position_update = lambda msg: []
+        for key, route in streaming.routes.items():
+            if route.many:
+                route.handler = streaming.process_position_update
+            elif route.takes_data:
+                route.handler = stub
+        for action in streaming.events:
+            streaming.events[action] = stub
+    return streaming
+
+async def msg_callback(msg):
+    pass
+
+
+def run_coroutine(coro):
+    # nothing on these paths really waits, one send drives process to the end
+    try:
+        coro.send(None)
+    except StopIteration:
+        pass
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+
+    frames = {}
+    for frame in load_frames():
+        msg = codec.loads(frame)
+        name = msg.get('action') or msg.get('channel')
+        frames.setdefault(name, msg)
+
+    for title, stub_handlers in (('dispatch only, handlers stubbed', True),
+                                 ('dispatch and translation', False)):
+        legacy = make_streaming(LegacyStreamingAdapter, stub_handlers)
+        current = make_streaming(StreamingAdapter, stub_handlers)
+
+        rows = []
+        for name, msg in frames.items():
+            # interleaved rounds, this is a small difference on a noisy machine
+            legacy_ns, current_ns = float('inf'), float('inf')
+            for _ in range(ROUNDS):
+                legacy_ns = min(legacy_ns, measure_ns(
+                    lambda: run_coroutine(legacy.process(msg, msg_callback)), number=5000,
+                    repeat=1))
+                current_ns = min(current_ns, measure_ns(
+                    lambda: run_coroutine(current.process(msg, msg_callback)), number=5000,
+                    repeat=1))
+            rows.append([name, '{:.0f}'.format(legacy_ns), '{:.0f}'.format(current_ns),
+                         '{:.2f}x'.format(legacy_ns / current_ns)])
+
+        print_table(f'StreamingAdapter.process per frame, {title}, ns',
+                    ['frame', 'if chain', 'router', 'speedup'], rows)
+
+    print_table('frames per route', ['route', 'count'],
+                [[route, count] for route, count in current.get_route_stats().items()])
+
+
+if __name__ == '__main__':
+    main()
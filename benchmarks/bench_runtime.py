@@ -0,0 +1,96 @@
+"""Message throughput of the engine under the runtime profiles.
+
+Ticker frames are queued where the websocket reader puts them and consumed
+by Engine.listen_updates, with the strategy loop woken up on every tick.
+The production profile runs on uvloop if it is installed, with loop debug
+off. The diagnostic profile runs the default loop in debug mode.
+
+    python -m benchmarks.bench_runtime [-frames 20000]
+"""
+import time
+import asyncio
+import logging
+import argparse
+
+import aiohttp
+
+from market_maker import codec
+from market_maker import runtime
+from market_maker.engine import Engine
+
+from benchmarks.bench_e2e import INSTRUMENT, make_config, ticker_frame
+from benchmarks.common import print_table
+
+LAST_INSTRUMENT = 'END-PERP'
+
+
+async def run_bench(number_of_frames):
+    engine = Engine(make_config())
+    adapter = engine.exchange_adapter
+    queue = adapter.websocket.queue
+
+    adapter.started = True
+    adapter.ready_to_listen.set()
+    adapter.streaming.subscribed = True
+
+    # a tick of an unknown instrument marks the end, the mailbox wakes up its listener
+    done = asyncio.Event()
+    adapter.tob_mailbox.subscribe(LAST_INSTRUMENT, done)
+
+    frames = []
+    bid = 3925.0
+    for idx in range(number_of_frames):
+        bid += 0.5 if idx % 2 else -0.5
+        frames.append(ticker_frame(bid))
+    frames.append(ticker_frame(bid).replace(INSTRUMENT, LAST_INSTRUMENT))
+
+    # the reader queue is bounded, frames are fed while the engine consumes them
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(engine.listen_updates()),
+             asyncio.ensure_future(engine.run_strategy(engine.strategy))]
+    for frame in frames:
+        await queue.put((time.perf_counter_ns(),
+                         aiohttp.WSMessage(aiohttp.WSMsgType.text, frame, None)))
+    await done.wait()
+    elapsed = time.perf_counter() - started
+
+    engine.is_active = False
+    for task in tasks:
+        task.cancel()
+    await asyncio.sleep(0)
+    return len(frames) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Message throughput per runtime profile')
+    parser.add_argument('-frames', type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    variants = [(runtime.PRODUCTION, True), (runtime.DIAGNOSTIC, True)]
+    if runtime.uvloop is not None:
+        variants.insert(1, (runtime.PRODUCTION, False))
+
+    rows = []
+    baseline = None
+    for profile, use_uvloop in variants:
+        loop = runtime.new_event_loop(profile, use_uvloop)
+        asyncio.set_event_loop(loop)
+        try:
+            msgs_per_sec = loop.run_until_complete(run_bench(args.frames))
+        finally:
+            loop.close()
+
+        if baseline is None:
+            baseline = msgs_per_sec
+        rows.append([profile, type(loop).__module__, loop.get_debug(),
+                     '{:.0f}'.format(msgs_per_sec), '{:.2f}x'.format(msgs_per_sec / baseline)])
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+    print_table(f'ticker frames per second, {args.frames} frames, codec {codec.codec.name}',
+                ['profile', 'loop', 'debug', 'msgs/s', 'vs production'], rows)
+
+
+if __name__ == '__main__':
+    main()
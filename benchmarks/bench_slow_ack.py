@@ -0,0 +1,115 @@
+"""Re-quotes while the ack of one order is slow.
+
+Every request is acknowledged on the next loop iteration, except the amends
+of one bid, which are acknowledged SLOW_ACK_SECS later. The legacy strategy
+waits until all orders are acknowledged before it re-quotes, so the whole
+ladder stands still. With pending intents the other levels follow the
+market and the slow order gets its newest target after its ack.
+
+    python -m benchmarks.bench_slow_ack
+"""
+import time
+import random
+import asyncio
+import logging
+
+from market_maker.strategy.market_maker import MarketMaker
+from market_maker.definitions import TopOfBook, AmendAcknowledgement
+
+from benchmarks.common import print_table
+from benchmarks.bench_requote_latency import (
+    INSTRUMENT,
+    AckingAdapter,
+    make_config,
+    event_loop,
+)
+
+NUMBER_OF_TICKS = 200
+SLOW_ACK_SECS = 0.5
+
+
+class SlowAckAdapter(AckingAdapter):
+    def __init__(self):
+        super().__init__()
+        self.slow_order_id = None
+        self.amended_orders = 0
+
+    async def amend_orders(self, new, old):
+        self.amended_orders += len(new)
+        if self.slow_order_id is None:
+            self.slow_order_id = new[0].order_id
+
+        fast = [order for order in new if order.order_id != self.slow_order_id]
+        self._ack(AmendAcknowledgement, fast)
+        if len(fast) != len(new):
+            asyncio.get_event_loop().call_later(SLOW_ACK_SECS, self.slow_ack)
+        return self._sent()
+
+    def slow_ack(self):
+        ack = AmendAcknowledgement()
+        ack.order_id = self.slow_order_id
+        asyncio.ensure_future(self.strategy.on_market_update(ack))
+
+
+class LegacyMarketMaker(MarketMaker):
+    # the former gate: no re-quote until every sent order is acknowledged
+    async def react_to_market_move(self):
+        ready = self.orders_manager.get_number_of_ready_for_amend()
+        if self.last_amend_time and len(self.orders_manager.live_orders) > 0 and \
+                ready != self.num_of_sent_orders:
+            return
+        await super().react_to_market_move()
+
+
+async def run_scenario(strategy_type, seed):
+    adapter = SlowAckAdapter()
+    strategy = strategy_type(make_config(0.0), adapter)
+    strategy.started_time = 0.0
+    adapter.strategy = strategy
+
+    running = asyncio.Event()
+    running.set()
+    loop_task = asyncio.ensure_future(event_loop(strategy, running))
+
+    rnd = random.Random(seed)
+    price = 3925.0
+    started = time.perf_counter()
+    for _ in range(NUMBER_OF_TICKS):
+        await asyncio.sleep(rnd.uniform(0.005, 0.02))
+        price += rnd.choice((-0.5, 0.5))
+
+        tob = TopOfBook()
+        tob.product = INSTRUMENT
+        tob.best_bid_price = price
+        tob.best_ask_price = price + 0.5
+        adapter.tob_mailbox.put(tob)
+    elapsed = time.perf_counter() - started
+
+    await asyncio.sleep(SLOW_ACK_SECS + 0.1)
+    running.clear()
+    strategy.wakeup.set()
+    await loop_task
+
+    # the longest time without any request while the market kept moving
+    gaps = [b - a for a, b in zip(adapter.send_times, adapter.send_times[1:])
+            if b - started <= elapsed]
+    return [len(adapter.send_times), adapter.amended_orders,
+            '{:.0f}'.format(max(gaps) * 1000.0),
+            strategy.orders_manager.get_requote_stats().get('held', 0)]
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+
+    rows = []
+    loop = asyncio.get_event_loop()
+    for name, strategy_type in (('wait for all acks', LegacyMarketMaker),
+                                ('pending intents', MarketMaker)):
+        rows.append([name] + loop.run_until_complete(run_scenario(strategy_type, seed=1)))
+
+    print_table(f'{NUMBER_OF_TICKS} ticks, amends of one bid acked after {SLOW_ACK_SECS} s',
+                ['strategy', 'requests', 'amended orders', 'max gap, ms', 'held'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Encode time per request batch: request dicts vs pre-serialized templates.
+
+The legacy functions are the former ExecutionAdapter request builders,
+which built the body dicts and encoded the whole request with the codec.
+
+    python -m benchmarks.bench_templates
+"""
+from munch import DefaultMunch
+
+from market_maker import codec
+from market_maker.definitions import OrderRequest, OrderSide, OrderType
+from market_maker.gateways.emx.execution import ExecutionAdapter
+
+from benchmarks.common import measure_ns, print_table
+
+ROUNDING_QTY = 4
+NUMBER_OF_LEVELS = 3
+
+
+def legacy_amend_request(new_orders, old_orders, eids):
+    data = []
+    for new_order, old_order, eid in zip(new_orders, old_orders, eids):
+        if new_order.type == OrderType.mkt:
+            ord_type = 'market'
+        elif new_order.type == OrderType.limit:
+            ord_type = 'limit'
+        else:
+            raise Exception(f'Unknown order type. Type = {new_order.type}')
+
+        if new_order.side != old_order.side:
+            raise Exception(f'Wrong order side. Side = {new_order.side}')
+
+        if new_order.side == OrderSide.buy:
+            side = 'buy'
+        elif new_order.side == OrderSide.sell:
+            side = 'sell'
+        else:
+            raise Exception(f'Unknown order side. Type = {new_order.side}')
+
+        body = {
+            'type': ord_type,
+            'side': side,
+            'order_id': eid,
+            'size': str(round(new_order.quantity, ROUNDING_QTY))
+        }
+        if new_order.type == OrderType.limit:
+            body['price'] = str(new_order.price)
+        data.append(body)
+
+    final_data = {
+        'channel': 'trading',
+        'type': 'request',
+        'action': 'modify-order',
+        'data': data
+    }
+    return codec.dumps_bytes(final_data)
+
+
+def legacy_create_request(orders, symbol):
+    data = []
+    for order in orders:
+        if order.side == OrderSide.buy:
+            side = 'buy'
+        elif order.side == OrderSide.sell:
+            side = 'sell'
+        else:
+            raise Exception(f'Unknown order side. Type = {order.side}')
+
+        if order.type == OrderType.mkt:
+            ord_type = 'market'
+        elif order.type == OrderType.limit:
+            ord_type = 'limit'
+        else:
+            raise Exception(f'Unknown order type. Type = {order.type}')
+
+        body = {
+            'client_id': order.order_id,
+            'contract_code': symbol,
+            'type': ord_type,
+            'side': side,
+            'size': str(round(order.quantity, ROUNDING_QTY))
+        }
+        if order.type == OrderType.limit:
+            body['price'] = str(order.price)
+            body['post_only'] = True
+        data.append(body)
+
+    final_data = {
+        'channel': 'trading',
+        'type': 'request',
+        'action': 'create-order',
+        'data': data
+    }
+    return codec.dumps_bytes(final_data)
+
+
+def make_orders(price_shift):
+    orders = []
+    for side in (OrderSide.buy, OrderSide.sell):
+        for level in range(NUMBER_OF_LEVELS):
+            order = OrderRequest()
+            order.order_id = f'0c55bf3e-8a5d-4c22-9bd3-4e1a8f3cdd{side.value}{level}'
+            order.instrument_name = 'BTC-PERP'
+            order.side = side
+            order.type = OrderType.limit
+            order.quantity = 0.01 * (level + 1)
+            order.price = 3925.0 + price_shift + (level if side == OrderSide.sell else -level)
+            orders.append(order)
+    return orders
+
+
+def main():
+    config = DefaultMunch()
+    config.symbol = 'BTC-PERP'
+    adapter = ExecutionAdapter(config, None, None, None)
+
+    old_orders = make_orders(0.0)
+    new_orders = make_orders(0.5)
+    eids = [f'475cc533-7248-4266-87ab-3cb82b64b4{idx:02d}' for idx in range(len(old_orders))]
+
+    def template_amend_request():
+        adapter.templates.check_codec()
+        return adapter.templates.request('modify-order', [
+            adapter._amend_body(new, old, eid)
+            for new, old, eid in zip(new_orders, old_orders, eids)])
+
+    def template_create_request():
+        adapter.templates.check_codec()
+        return adapter.templates.request('create-order',
+                                         [adapter._create_body(order) for order in new_orders])
+
+    rows = []
+    for name in sorted(codec.codecs):
+        codec.use(name)
+        assert legacy_amend_request(new_orders, old_orders, eids) == template_amend_request()
+        assert legacy_create_request(new_orders, 'BTC-PERP') == template_create_request()
+
+        for request, legacy, template in (
+                ('amend', lambda: legacy_amend_request(new_orders, old_orders, eids),
+                 template_amend_request),
+                ('create', lambda: legacy_create_request(new_orders, 'BTC-PERP'),
+                 template_create_request)):
+            legacy_ns = measure_ns(legacy, number=10000)
+            template_ns = measure_ns(template, number=10000)
+            rows.append([name, request, '{:.0f}'.format(legacy_ns), '{:.0f}'.format(template_ns),
+                         '{:.2f}x'.format(legacy_ns / template_ns)])
+    codec.use()
+
+    print_table(f'encode time per batch of {len(new_orders)} orders, ns',
+                ['codec', 'request', 'dict + dumps', 'template', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Decode and translation cost of a ticker frame into a TopOfBook.
+
+The generic path decodes the whole frame with the codec and translates the
+dict in process_tick. The fast path cuts the quote fields, the contract code
+and the mark price out of the text.
+
+    python -m benchmarks.bench_ticker
+"""
+import logging
+
+from munch import DefaultMunch
+
+from market_maker import codec
+from market_maker.gateways.emx.streaming import StreamingAdapter
+from market_maker.gateways.emx.shared_storage import SharedStorage
+
+from benchmarks.common import load_frames, measure_ns, print_table
+
+ROUNDS = 15
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+
+    config = DefaultMunch()
+    config.exchange_name = 'emx'
+    streaming = StreamingAdapter(config, None, SharedStorage())
+
+    frames = [frame for frame in load_frames() if frame.startswith('{"channel":"ticker"')]
+    assert all(streaming.decode_tick(frame) is not None for frame in frames)
+
+    def generic():
+        for frame in frames:
+            streaming.process_tick(codec.loads(frame))
+
+    def fast():
+        for frame in frames:
+            streaming.decode_tick(frame)
+
+    rows = []
+    for codec_name in sorted(codec.codecs):
+        codec.use(codec_name)
+        # interleaved rounds, the machine noise hits both sides alike
+        generic_ns, fast_ns = float('inf'), float('inf')
+        for _ in range(ROUNDS):
+            generic_ns = min(generic_ns, measure_ns(generic, number=1000, repeat=1) / len(frames))
+            fast_ns = min(fast_ns, measure_ns(fast, number=1000, repeat=1) / len(frames))
+        rows.append([codec_name, '{:.0f}'.format(generic_ns), '{:.0f}'.format(fast_ns),
+                     '{:.2f}x'.format(generic_ns / fast_ns)])
+    codec.use()
+
+    print_table(f'ticker frame to TopOfBook, {len(frames)} frames, ns per frame',
+                ['codec', 'loads + process_tick', 'decode_tick', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
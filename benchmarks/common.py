@@ -0,0 +1,32 @@
+import os
+import timeit
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def load_frames(file_name='emx_frames.jsonl'):
+    with open(os.path.join(DATA_DIR, file_name), 'r') as frames_file:
+        return [line.rstrip('\n') for line in frames_file if line.strip()]
+
+
+def measure_ns(func, number=1000, repeat=5):
+    # the best of several runs is the least noisy estimate of the per call cost
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def print_table(title, header, rows):
+    print(title)
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+    print()
+
+
+def percentiles(sorted_values, pcts):
+    # nearest rank on already sorted values, keyed like 'p99.9'
+    res = {}
+    for pct in pcts:
+        idx = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))
+        res[f'p{pct:g}'] = sorted_values[idx] if sorted_values else None
+    return res
@@ -0,0 +1,96 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class StdJsonCodec:
+    name = 'json'
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+    @staticmethod
+    def dumps_bytes(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+
+class UJsonCodec:
+    name = 'ujson'
+
+    @staticmethod
+    def loads(data):
+        return ujson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+    @staticmethod
+    def dumps_bytes(obj):
+        return ujson.dumps(obj, escape_forward_slashes=False).encode()
+
+
+class OrJsonCodec:
+    name = 'orjson'
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    @staticmethod
+    def dumps_bytes(obj):
+        return orjson.dumps(obj)
+
+
+codecs = {
+    'json': StdJsonCodec,
+}
+if ujson is not None:
+    codecs['ujson'] = UJsonCodec
+if orjson is not None:
+    codecs['orjson'] = OrJsonCodec
+
+# the first available one is used by default
+preferred_codecs = ('orjson', 'ujson', 'json')
+
+codec = None
+loads = None
+dumps = None
+dumps_bytes = None
+
+
+def use(name=None):
+    global codec, loads, dumps, dumps_bytes
+
+    if name is None:
+        name = next(codec_name for codec_name in preferred_codecs if codec_name in codecs)
+
+    try:
+        codec = codecs[name]
+    except KeyError:
+        raise Exception(f'json codec {name} is not available')
+
+    loads = codec.loads
+    dumps = codec.dumps
+    dumps_bytes = codec.dumps_bytes
+    return codec
+
+
+use()
@@ -1,4 +1,4 @@
-import datetime
+import time
 from enum import Enum
 
 
@@ -15,13 +15,38 @@ class OrderType(Enum):
     stop = 3
 
 
-class ApiResult:
+class Message:
+    # messages are created for every tick and order event, __slots__ keeps them small
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return {name: getattr(self, name, None) for name in self.__slots__}
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}' for name, value in self.to_dict().items())
+        return f'{self.__class__.__name__}({fields})'
+
+
+class ApiResult(Message):
+    __slots__ = ('success', 'msg')
+
     def __init__(self):
         self.success = False
         self.msg = ""
 
 
-class OrderRequest:
+class OrderRequest(Message):
+    __slots__ = (
+        'instrument_name',
+        'quantity',
+        'price',
+        'side',
+        'type',
+        'order_id',
+        'timestamp',
+    )
+
     def __init__(self):
         self.instrument_name = ""
         self.quantity = 0.0
@@ -29,10 +54,20 @@ class OrderRequest:
         self.side = OrderSide.unknown
         self.type = OrderType.unknown
         self.order_id = ""
-        self.timestamp = datetime.datetime.now().timestamp()
+        self.timestamp = time.monotonic_ns()
 
 
-class ExchangeOrder:
+class ExchangeOrder(Message):
+    __slots__ = (
+        'instrument_name',
+        'quantity',
+        'filled_quantity',
+        'price',
+        'side',
+        'type',
+        'exchange_order_id',
+    )
+
     def __init__(self):
         self.instrument_name = ""
         self.quantity = 0.0
@@ -43,7 +78,14 @@ class ExchangeOrder:
         self.exchange_order_id = ""
 
 
-class ExchangeOrders:
+class ExchangeOrders(Message):
+    __slots__ = (
+        'exchange',
+        'instrument',
+        'bids',
+        'asks',
+    )
+
     def __init__(self):
         self.exchange = ""
         self.instrument = ""
@@ -51,7 +93,20 @@ class ExchangeOrders:
         self.asks = []  # exchange_order is expected
 
 
-class Fill:
+class Fill(Message):
+    __slots__ = (
+        'exchange',
+        'instrument',
+        'order_id',
+        'fill_id',
+        'fill_price',
+        'qty',
+        'timestamp',
+        'fees',
+        'is_funding',
+        'type',
+    )
+
     def __init__(self):
         self.exchange = ""
         self.instrument = ""
@@ -65,7 +120,19 @@ class Fill:
         self.type = OrderType.unknown
 
 
-class TopOfBook:
+class TopOfBook(Message):
+    __slots__ = (
+        'exchange',
+        'product',
+        'best_bid_price',
+        'best_bid_qty',
+        'best_ask_price',
+        'best_ask_qty',
+        'mark_price',
+        'timestamp',
+        'received_ns',
+    )
+
     def __init__(self):
         self.exchange = ""
         self.product = ""
@@ -73,10 +140,23 @@ class TopOfBook:
         self.best_bid_qty = None
         self.best_ask_price = None
         self.best_ask_qty = None
+        self.mark_price = None
         self.timestamp = 0.0
+        # perf_counter_ns of the frame read, None if the tick did not come from a socket
+        self.received_ns = None
+
 
+class NewOrderAcknowledgement(Message):
+    __slots__ = (
+        'order_id',
+        'instrument_name',
+        'quantity',
+        'price',
+        'side',
+        'type',
+        'timestamp',
+    )
 
-class NewOrderAcknowledgement:
     def __init__(self):
         self.order_id = ""
         self.instrument_name = ""
@@ -84,31 +164,58 @@ class NewOrderAcknowledgement:
         self.price = 0.0
         self.side = OrderSide.unknown
         self.type = OrderType.unknown
-        self.timestamp = datetime.datetime.now().timestamp()
+        self.timestamp = time.monotonic_ns()
+
 
+class NewOrderRejection(Message):
+    __slots__ = ('order_id', 'instrument', 'exchange_order_id', 'rejection_reason')
 
-class NewOrderRejection:
     def __init__(self):
         self.order_id = ""
+        self.instrument = ""
         self.exchange_order_id = ""
         self.rejection_reason = ""
         # self.timestamp = None
 
 
-class OrderEliminationAcknowledgement:
+class OrderEliminationAcknowledgement(Message):
+    __slots__ = ('order_id', 'instrument')
+
     def __init__(self):
         self.order_id = ""
+        self.instrument = ""
         # self.timestamp = None
 
 
-class OrderEliminationRejection:
+class OrderEliminationRejection(Message):
+    __slots__ = ('order_id', 'instrument', 'rejection_reason')
+
     def __init__(self):
         self.order_id = ""
+        self.instrument = ""
         self.rejection_reason = ""
         # self.timestamp = None
 
 
-class OrderFillAcknowledgement:
+class OrderFillAcknowledgement(Message):
+    __slots__ = (
+        'exchange',
+        'instrument',
+        'order_id',
+        'exchange_id',
+        'fill_id',
+        'side',
+        'order_type',
+        'order_qty',
+        'price',
+        'fill_price',
+        'running_fill_qty',
+        'incremental_fill_qty',
+        'timestamp',
+        'fee',
+        'average_fill_price',
+    )
+
     def __init__(self):
         self.exchange = ""
         self.instrument = ""
@@ -124,9 +231,28 @@ class OrderFillAcknowledgement:
         self.incremental_fill_qty = 0.0
         self.timestamp = ""
         self.fee = 0.0
+        self.average_fill_price = 0.0
+
+
+class OrderFullFillAcknowledgement(Message):
+    __slots__ = (
+        'exchange',
+        'instrument',
+        'order_id',
+        'exchange_id',
+        'fill_id',
+        'side',
+        'order_type',
+        'order_qty',
+        'price',
+        'fill_price',
+        'running_fill_qty',
+        'incremental_fill_qty',
+        'timestamp',
+        'fee',
+        'average_fill_price',
+    )
 
-
-class OrderFullFillAcknowledgement:
     def __init__(self):
         self.exchange = ""
         self.instrument = ""
@@ -142,9 +268,26 @@ class OrderFullFillAcknowledgement:
         self.incremental_fill_qty = 0.0
         self.timestamp = ""
         self.fee = 0.0
+        self.average_fill_price = 0.0
+
+
+class AmendAcknowledgementPartial(Message):
+    __slots__ = (
+        'exchange',
+        'instrument',
+        'order_id',
+        'exchange_id',
+        'fill_id',
+        'side',
+        'order_type',
+        'order_qty',
+        'price',
+        'running_fill_qty',
+        'timestamp',
+        'fee',
+        'average_fill_price',
+    )
 
-
-class AmendAcknowledgementPartial:
     def __init__(self):
         self.exchange = ""
         self.instrument = ""
@@ -158,9 +301,20 @@ class AmendAcknowledgementPartial:
         self.running_fill_qty = 0.0
         self.timestamp = ""
         self.fee = 0.0
+        self.average_fill_price = 0.0
+
 
+class AmendAcknowledgement(Message):
+    __slots__ = (
+        'order_id',
+        'instrument_name',
+        'quantity',
+        'price',
+        'side',
+        'type',
+        'timestamp',
+    )
 
-class AmendAcknowledgement:
     def __init__(self):
         self.order_id = ""
         self.instrument_name = ""
@@ -168,15 +322,20 @@ class AmendAcknowledgement:
         self.price = 0.0
         self.side = OrderSide.unknown
         self.type = OrderType.unknown
-        self.timestamp = datetime.datetime.now().timestamp()
+        self.timestamp = time.monotonic_ns()
 
 
-class AmendRejection:
+class AmendRejection(Message):
+    __slots__ = ('order_id', 'instrument', 'rejection_reason')
+
     def __init__(self):
         self.order_id = ""
+        self.instrument = ""
         self.rejection_reason = ""
 
-class Position:
+class Position(Message):
+    __slots__ = ('exchange', 'instrument', 'position')
+
     def __init__(self):
         self.exchange = ""
         self.instrument = ""
@@ -3,6 +3,8 @@ import traceback
 
 from .strategy.market_maker import MarketMaker
 from .gateways.emx.adapter import EmxAdapter
+from . import latency
+from .definitions import ExchangeOrders, TopOfBook, NewOrderAcknowledgement, AmendAcknowledgement
 
 from .logger import logging
 
@@ -10,6 +12,22 @@ strategies_factory = {
     'market_maker': MarketMaker,
 }
 
+# updates name their contract differently, the rest use 'instrument'
+INSTRUMENT_FIELDS = {
+    TopOfBook: 'product',
+    NewOrderAcknowledgement: 'instrument_name',
+    AmendAcknowledgement: 'instrument_name',
+}
+
+
+def split_orders(orders_msg, instrument):
+    res = ExchangeOrders()
+    res.exchange = orders_msg.exchange
+    res.instrument = instrument
+    res.bids = [order for order in orders_msg.bids if order.instrument_name == instrument]
+    res.asks = [order for order in orders_msg.asks if order.instrument_name == instrument]
+    return res
+
 
 class Engine:
     def __init__(self, cfg):
@@ -18,17 +36,56 @@ class Engine:
         self.is_active = True
         self.exchange_adapter = EmxAdapter(cfg.adapter)
 
+        self.latency_report_interval = None
+        if cfg.logger is not None:
+            self.latency_report_interval = cfg.logger.latency_report_interval
+
+        # several instruments are quoted over one connection, one strategy per instrument
+        strategies_cfg = cfg.strategies
+        if not strategies_cfg:
+            strategies_cfg = [cfg.strategy]
+
+        self.strategies = []
+        self.strategies_by_instrument = {}
+        for strategy_cfg in strategies_cfg:
+            strategy = self.create_strategy(strategy_cfg)
+            if strategy.instrument_name in self.strategies_by_instrument:
+                raise Exception(f'{strategy.instrument_name} is quoted by several strategies')
+            self.strategies.append(strategy)
+            self.strategies_by_instrument[strategy.instrument_name] = strategy
+
+        # the first strategy reconnects on connection errors, the rest is reset on reconnect
+        self.strategy = self.strategies[0]
+        if len(self.strategies) > 1:
+            self.exchange_adapter.set_order_update_callback(self.route_update)
+
+    def create_strategy(self, strategy_cfg):
         try:
-            strategy_name = cfg.strategy.name
+            strategy_name = strategy_cfg.name
         except AttributeError:
             self.logger.exception('strategy was not found')
             raise Exception('strategy was not found')
 
         try:
-            self.strategy = strategies_factory[strategy_name](cfg.strategy, self.exchange_adapter)
+            strategy_cls = strategies_factory[strategy_name]
         except KeyError:
             self.logger.exception('strategy was not found in a factory')
             raise Exception('strategy was not found in a factory')
+        return strategy_cls(strategy_cfg, self.exchange_adapter)
+
+    async def route_update(self, update):
+        if isinstance(update, ExchangeOrders):
+            # the snapshot of active orders is split per instrument
+            for instrument, strategy in self.strategies_by_instrument.items():
+                await strategy.on_market_update(split_orders(update, instrument))
+            return
+
+        instrument = getattr(update, INSTRUMENT_FIELDS.get(type(update), 'instrument'), None)
+        strategy = self.strategies_by_instrument.get(instrument)
+        if strategy is None:
+            self.logger.warning('No strategy for the instrument of %s', update)
+            return
+        await strategy.on_market_update(update)
 
     async def listen_updates(self):
         while self.is_active:
@@ -36,19 +93,30 @@ class Engine:
                 await self.exchange_adapter.listen()
             except Exception as err:
                 self.logger.info('listen error: {}'.format(err))
-                await self.strategy.handle_exception(str(err))
+                await self.handle_connection_error(str(err))
         self.logger.warning('listen_updates was stopped')
 
-    async def run_strategy(self):
+    async def handle_connection_error(self, err_msg):
+        # the connection is shared, every strategy which stops on errors is stopped before
+        # the first one reconnects
+        for strategy in self.strategies[1:]:
+            if strategy.stop_strategy_on_error is True:
+                try:
+                    await strategy.stop_strategy()
+                except Exception as err:
+                    self.logger.warning(f'{strategy.instrument_name} was not stopped on {err}')
+        await self.strategy.handle_exception(err_msg)
+
+    async def run_strategy(self, strategy):
         while self.is_active:
             try:
-                await self.strategy.run()
+                await strategy.run()
             except Exception as err:
                 try:
-                    await self.strategy.handle_exception(str(err))
+                    await strategy.handle_exception(str(err))
                 except Exception as err:
                     self.logger.warning('run_strategy handle_exception failed on {}'.format(err))
-            await asyncio.sleep(0.1)
+            await strategy.wait_for_update()
         self.logger.warning('run_strategy was stopped')
 
     def run(self):
@@ -71,11 +139,16 @@ class Engine:
 
         asyncio.ensure_future(self.exchange_adapter.start())
         asyncio.ensure_future(self.listen_updates())
-        asyncio.ensure_future(self.run_strategy())
+        for strategy in self.strategies:
+            asyncio.ensure_future(self.run_strategy(strategy))
+        if self.latency_report_interval:
+            asyncio.ensure_future(latency.stats.report_periodically(self.latency_report_interval))
 
-        loop.set_debug(enabled=True)
-        loop.slow_callback_duration = 0.05
-        loop.run_forever()
+        # debug mode and the loop implementation follow the runtime profile, see runtime.py
+        try:
+            loop.run_forever()
+        finally:
+            self.exchange_adapter.close()
         loop.close()
         self.logger.info('Engine stopped')
 
@@ -1,5 +1,7 @@
 import asyncio
 
+from market_maker import codec
+from market_maker.recorder import FrameRecorder
 from market_maker.websocket_client import WebsocketClient
 
 from market_maker.gateways.gateway_interface import GatewayInterface
@@ -14,13 +16,20 @@ class EmxAdapter(GatewayInterface):
         super().__init__()
 
         self.config = config
-        self.storage = SharedStorage()
+        if self.config.json_codec:
+            codec.use(self.config.json_codec)
+
+        self.storage = SharedStorage(self.config.max_tracked_orders)
         self.websocket = WebsocketClient()
         self.auth = Authentication(self.config)
 
         self.execution = ExecutionAdapter(self.config.execution, self.auth,
                                           self.websocket, self.storage)
-        self.streaming = StreamingAdapter(self.config.streaming, self.auth, self.storage)
+        self.streaming = StreamingAdapter(self.config.streaming, self.auth, self.storage,
+                                          self.tob_mailbox)
+
+        if self.config.record_path:
+            self.recorder = FrameRecorder(self.config.record_path)
 
     def set_order_update_callback(self, msg_callback):
         self.msg_callback = msg_callback
@@ -32,6 +41,7 @@ class EmxAdapter(GatewayInterface):
         self.started = False
         self.storage.reset()
         self.streaming.reset()
+        self.execution.reset()
         self.ready_to_listen.clear()
 
     async def amend_order(self, new, old):
@@ -50,13 +60,13 @@ class EmxAdapter(GatewayInterface):
         return await self.execution.cancel_order(order_id)
 
     async def cancel_orders(self, orders_ids):
-        raise Exception('cancel_orders method is not implemented yet')
+        return await self.execution.cancel_orders(orders_ids)
 
-    async def cancel_active_orders(self):
-        return await self.execution.cancel_active_orders()
+    async def cancel_active_orders(self, contract_code=None):
+        return await self.execution.cancel_active_orders(contract_code)
 
-    async def request_orders(self):
-        return await self.execution.request_orders()
+    async def request_orders(self, contract_code=None):
+        return await self.execution.request_orders(contract_code)
 
     async def start(self):
         self.started = False
@@ -1,11 +1,12 @@
 import hashlib
 import hmac
-import json
 import base64
 
+from market_maker import codec
+
 
 def body_to_string(body):
-    return json.dumps(body, separators=(',', ':'))
+    return codec.dumps(body)
 
 
 class Authentication:
@@ -1,10 +1,14 @@
 import time
-import json
 import aiohttp
 
+from market_maker import codec
 from market_maker.definitions import ApiResult, OrderType, OrderSide, ExchangeOrders, ExchangeOrder
 
+from market_maker.request_scheduler import RequestScheduler
+from market_maker.gateways.emx.templates import RequestTemplates
+
 from market_maker.logger import logging
+from market_maker.logger.logging import TRACE
 
 
 def get_timestamp():
@@ -13,6 +17,7 @@ def get_timestamp():
 
 class ExecutionAdapter:
     ROUNDING_QTY = 4
+    MAX_ORDERS_PER_CANCEL = 20
 
     def __init__(self, config, auth, ws, shared_storage):
         self.logger = logging.getLogger()
@@ -22,14 +27,37 @@ class ExecutionAdapter:
         self.shared_storage = shared_storage
         self.auth = auth
         self.send_post_only_orders = True
+        self.templates = RequestTemplates(self.ROUNDING_QTY)
+
+        # orders carry their contract, the configured symbols are used by cancel all
+        self.symbols = self.config.symbol
+        if self.symbols is None:
+            self.symbols = []
+        elif type(self.symbols) is not list:
+            self.symbols = [self.symbols]
+        self.symbol = self.symbols[0] if len(self.symbols) == 1 else None
+
+        self.max_orders_per_cancel = self.MAX_ORDERS_PER_CANCEL
+        if self.config.max_orders_per_cancel:
+            self.max_orders_per_cancel = self.config.max_orders_per_cancel
 
         self.headers = {
             'content-type': 'application/json'
         }
 
-    async def request_orders(self):
+        # orders per second and burst per action, cancels are sent ahead of amends and amends
+        # ahead of new orders while they wait for the budget
+        self.scheduler = RequestScheduler(self.send_request, self.config.rate_limits)
+
+    def reset(self):
+        self.scheduler.reset()
+
+    async def request_orders(self, contract_code=None):
+        if contract_code is None:
+            contract_code = self.symbol
+
         body = {}
-        endpoint = f'/v1/orders?contract_code={self.config.symbol}'
+        endpoint = f'/v1/orders?contract_code={contract_code}'
         url = self.config.url + endpoint
 
         timestamp = get_timestamp()
@@ -39,8 +67,8 @@ class ExecutionAdapter:
         self.headers['EMX-ACCESS-SIG'] = signature.decode().strip()
         self.headers['EMX-ACCESS-TIMESTAMP'] = str(timestamp)
 
-        self.logger.info(
-            f'{self.config.exchange_name} Requesting orders, Info = {self.headers}, Data: {body}')
+        self.logger.info('%s Requesting orders, Info = %s, Data: %s',
+                         self.config.exchange_name, self.headers, body)
 
         try:
             resp = await self.ws.session.get(url, json=body, headers=self.headers)
@@ -48,13 +76,13 @@ class ExecutionAdapter:
             raise Exception(str(err))
         msg = await resp.text()
 
-        self.logger.info(f'{self.config.exchange_name} Orders received: {msg}')
+        self.logger.info('%s Orders received: %s', self.config.exchange_name, msg)
 
         if resp.status != 200:
             raise Exception(f'Failed to request positions. Reason: {msg}')
 
         try:
-            msg_json = json.loads(msg)
+            msg_json = codec.loads(msg)
         except Exception as err:
             self.logger.exception(
                 f'{self.config.exchange_name} Exception raised '
@@ -65,7 +93,7 @@ class ExecutionAdapter:
         res = ExchangeOrders()
 
         res.exchange = self.config.exchange_name
-        res.instrument = self.config.symbol
+        res.instrument = contract_code
 
         for order_dict in msg_json['orders']:
             order = ExchangeOrder()
@@ -88,110 +116,98 @@ class ExecutionAdapter:
                 res.asks.append(order)
         return res
 
-    async def send_orders(self, orders):
-        res = ApiResult()
+    def _create_body(self, order):
+        # sides and types are enums, identity checks are cheaper than hashing them
+        side = order.side
+        if side is OrderSide.buy:
+            side = 'buy'
+        elif side is OrderSide.sell:
+            side = 'sell'
+        else:
+            raise Exception(f'Unknown order side. Type = {order.side}')
 
-        data = []
-        for order in orders:
-            if order.side == OrderSide.buy:
-                side = 'buy'
-            elif order.side == OrderSide.sell:
-                side = 'sell'
-            else:
-                raise Exception(f'Unknown order side. Type = {order.side}')
+        if order.type is OrderType.limit:
+            return self.templates.create_body(order.instrument_name or self.symbol, side, 'limit',
+                                              self.send_post_only_orders, order.order_id,
+                                              order.quantity, order.price)
+        elif order.type is OrderType.mkt:
+            return self.templates.create_body(order.instrument_name or self.symbol, side, 'market',
+                                              self.send_post_only_orders, order.order_id,
+                                              order.quantity)
+        raise Exception(f'Unknown order type. Type = {order.type}')
+
+    def _amend_body(self, new_order, old_order, eid):
+        if new_order.type is not OrderType.limit and new_order.type is not OrderType.mkt:
+            raise Exception(f'Unknown order type. Type = {new_order.type}')
 
-            if order.type == OrderType.mkt:
-                ord_type = 'market'
-            elif order.type == OrderType.limit:
-                ord_type = 'limit'
-            else:
-                raise Exception(f'Unknown order type. Type = {order.type}')
-
-            body = {
-                'client_id': order.order_id,
-                'contract_code': self.config.symbol,
-                'type': ord_type,
-                'side': side,
-                'size': str(round(order.quantity, self.ROUNDING_QTY))
-            }
-            if order.type == OrderType.limit:
-                body['price'] = str(order.price)
-                if self.send_post_only_orders:
-                    body['post_only'] = True
-            data.append(body)
-
-        final_data = {
-            'channel': 'trading',
-            'type': 'request',
-            'action': 'create-order',
-            'data': data
-        }
+        if new_order.side != old_order.side:
+            raise Exception(f'Wrong order side. Side = {new_order.side}')
+
+        side = new_order.side
+        if side is OrderSide.buy:
+            side = 'buy'
+        elif side is OrderSide.sell:
+            side = 'sell'
+        else:
+            raise Exception(f'Unknown order side. Type = {new_order.side}')
 
-        self.logger.info(f'EMX sending new order request. Data: {final_data}')
+        if new_order.type is OrderType.limit:
+            return self.templates.amend_body(side, 'limit', eid, new_order.quantity,
+                                             new_order.price)
+        return self.templates.amend_body(side, 'market', eid, new_order.quantity)
+
+    async def send_request(self, action, bodies):
+        # called by the scheduler with the bodies it lets through
+        if action == 'cancel-order' and isinstance(bodies, list):
+            # requests are chunked, a chunk of one is sent in the single order format
+            for idx in range(0, len(bodies), self.max_orders_per_cancel):
+                chunk = bodies[idx:idx + self.max_orders_per_cancel]
+                self.logger.info('Sending bulk cancellation request. Orders = %d', len(chunk))
+                await self._send(action, self.templates.request(
+                    action, chunk[0] if len(chunk) == 1 else chunk))
+            return
+        await self._send(action, self.templates.request(action, bodies))
+
+    async def _send(self, action, data):
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'EMX sending %s request. Data: %s', action, data)
         try:
-            await self.ws.ws.send_str(json.dumps(final_data))
+            await self.ws.send_payload(data, action)
         except aiohttp.client_exceptions.ClientConnectorError as err:
             raise ConnectionError(str(err))
 
+    async def send_orders(self, orders):
+        res = ApiResult()
+
+        self.templates.check_codec()
+        bodies = [self._create_body(order) for order in orders]
+
+        self.logger.info('EMX sending new order request. Orders = %d', len(orders))
+        await self.scheduler.submit('create-order', [order.order_id for order in orders], bodies)
+
         res.success = True
         return res
 
     async def amend_order(self, new_order, old_order):
         res = ApiResult()
 
-        try:
-            eid = self.shared_storage.uid_to_eid[old_order.order_id]
-        except KeyError:
+        eid = self.shared_storage.get_eid(old_order.order_id)
+        if eid is None:
             self.logger.warning(
                 f'Order id was not found for amend. Order id = {old_order.order_id}')
             return res
 
-        if new_order.type == OrderType.mkt:
-            ord_type = 'market'
-        elif new_order.type == OrderType.limit:
-            ord_type = 'limit'
-        else:
-            raise Exception(f'Unknown order type. Type = {new_order.type}')
+        self.templates.check_codec()
+        body = self._amend_body(new_order, old_order, eid)
 
-        if new_order.side != old_order.side:
-            raise Exception(f'Wrong order side. Side = {new_order.side}')
+        self.logger.info('Sending amend request. New orderId = %s, old order_id = %s',
+                         new_order.order_id, old_order.order_id)
 
-        if new_order.side == OrderSide.buy:
-            side = 'buy'
-        elif new_order.side == OrderSide.sell:
-            side = 'sell'
-        else:
-            raise Exception(f'Unknown order side. Type = {new_order.side}')
-
-        body = {
-            'type': ord_type,
-            'side': side,
-            'order_id': eid,
-            'size': str(round(new_order.quantity, self.ROUNDING_QTY))
-        }
-        if new_order.type == OrderType.limit:
-            body['price'] = str(new_order.price)
-
-        final_data = {
-            'channel': 'trading',
-            'type': 'request',
-            'action': 'modify-order',
-            'data': body
-        }
+        self.shared_storage.map_ids(new_order.order_id, eid)
+        self.shared_storage.mark_amend(eid)
 
-        self.logger.info(
-            f'Sending amend request. New orderId = {new_order.order_id},'
-            f' old order_id = {old_order.order_id}, Data: {final_data}')
-
-        self.shared_storage.eid_to_uid[eid] = new_order.order_id
-        self.shared_storage.uid_to_eid[new_order.order_id] = eid
-        self.shared_storage.eids_to_amend[eid] = True
-
-        self.logger.debug(f'Ids mapped during amend, eid = {eid}, uid = {new_order.order_id}')
-        try:
-            await self.ws.ws.send_str(json.dumps(final_data))
-        except aiohttp.client_exceptions.ClientConnectorError as err:
-            raise ConnectionError(str(err))
+        self.logger.debug('Ids mapped during amend, eid = %s, uid = %s', eid, new_order.order_id)
+        await self.scheduler.submit('modify-order', [eid], body)
 
         res.success = True
         return res
@@ -199,59 +215,26 @@ class ExecutionAdapter:
     async def amend_orders(self, new_orders, old_orders):
         res = ApiResult()
 
-        data = []
+        self.templates.check_codec()
+        eids = []
+        bodies = []
         for new_order, old_order in zip(new_orders, old_orders):
-            try:
-                eid = self.shared_storage.uid_to_eid[old_order.order_id]
-            except KeyError:
+            eid = self.shared_storage.get_eid(old_order.order_id)
+            if eid is None:
                 self.logger.warning(
                     f'Order id was not found for amend. Order id = {old_order.order_id}')
                 return res
 
-            if new_order.type == OrderType.mkt:
-                ord_type = 'market'
-            elif new_order.type == OrderType.limit:
-                ord_type = 'limit'
-            else:
-                raise Exception(f'Unknown order type. Type = {new_order.type}')
-
-            if new_order.side != old_order.side:
-                raise Exception(f'Wrong order side. Side = {new_order.side}')
+            eids.append(eid)
+            bodies.append(self._amend_body(new_order, old_order, eid))
 
-            if new_order.side == OrderSide.buy:
-                side = 'buy'
-            elif new_order.side == OrderSide.sell:
-                side = 'sell'
-            else:
-                raise Exception(f'Unknown order side. Type = {new_order.side}')
-
-            body = {
-                'type': ord_type,
-                'side': side,
-                'order_id': eid,
-                'size': str(round(new_order.quantity, self.ROUNDING_QTY))
-            }
-            if new_order.type == OrderType.limit:
-                body['price'] = str(new_order.price)
-            data.append(body)
-
-            self.shared_storage.eid_to_uid[eid] = new_order.order_id
-            self.shared_storage.uid_to_eid[new_order.order_id] = eid
-            self.shared_storage.eids_to_amend[eid] = True
-            self.logger.debug(f'Ids mapped during amend, eid = {eid}, uid = {new_order.order_id}')
-
-        final_data = {
-            'channel': 'trading',
-            'type': 'request',
-            'action': 'modify-order',
-            'data': data
-        }
+            self.shared_storage.map_ids(new_order.order_id, eid)
+            self.shared_storage.mark_amend(eid)
+            self.logger.debug('Ids mapped during amend, eid = %s, uid = %s',
+                              eid, new_order.order_id)
 
-        self.logger.info(f'Sending bulk amend request. Data: {final_data}')
-        try:
-            await self.ws.ws.send_str(json.dumps(final_data))
-        except aiohttp.client_exceptions.ClientConnectorError as err:
-            raise ConnectionError(str(err))
+        self.logger.info('Sending bulk amend request. Orders = %d', len(bodies))
+        await self.scheduler.submit('modify-order', eids, bodies)
 
         res.success = True
         return res
@@ -259,102 +242,84 @@ class ExecutionAdapter:
     async def send_order(self, order):
         res = ApiResult()
 
-        if order.side == OrderSide.buy:
-            side = 'buy'
-        elif order.side == OrderSide.sell:
-            side = 'sell'
-        else:
-            raise Exception(f'Unknown order side. Type = {order.side}')
+        self.templates.check_codec()
+        body = self._create_body(order)
 
-        if order.type == OrderType.mkt:
-            ord_type = 'market'
-        elif order.type == OrderType.limit:
-            ord_type = 'limit'
-        else:
-            raise Exception(f'Unknown order type. Type = {order.type}')
-
-        body = {
-            'client_id': order.order_id,
-            'contract_code': self.config.symbol if self.config.symbol else order.instrument_name,
-            'type': ord_type,
-            'side': side,
-            'size': str(round(order.quantity, self.ROUNDING_QTY))
-        }
-        if order.type == OrderType.limit:
-            body['price'] = str(order.price)
-            if self.send_post_only_orders:
-                body['post_only'] = True
-
-        final_data = {
-            'channel': 'trading',
-            'type': 'request',
-            'action': 'create-order',
-            'data': body
-        }
-
-        self.logger.info(
-            f'EMX sending new order request. OrderId = {order.order_id}, Data: {final_data}')
-        try:
-            await self.ws.ws.send_str(json.dumps(final_data))
-        except aiohttp.client_exceptions.ClientConnectorError as err:
-            raise ConnectionError(str(err))
+        self.logger.info('EMX sending new order request. OrderId = %s', order.order_id)
+        await self.scheduler.submit('create-order', [order.order_id], body)
 
         res.success = True
         return res
 
     async def cancel_order(self, order_id):
         res = ApiResult()
-        try:
-            eid = self.shared_storage.uid_to_eid[order_id]
-        except KeyError:
+        if self.scheduler.drop('create-order', order_id):
+            self.logger.info('Queued order was dropped. Order id = %s', order_id)
+            res.success = True
+            return res
+
+        eid = self.shared_storage.get_eid(order_id)
+        if eid is None:
             # Order elimination msg was received on the Streaming side
             self.logger.warning(f'Order was already removed. Order id = {order_id}')
             res.success = True
             return res
 
-        body = {
-            'order_id': eid
-        }
-
-        final_data = {
-            'channel': 'trading',
-            'type': 'request',
-            'action': 'cancel-order',
-            'data': body
-        }
-
-        self.logger.info(f'Sending cancellation request. eid = {eid}, data: {final_data}')
-        try:
-            await self.ws.ws.send_str(json.dumps(final_data))
-        except aiohttp.client_exceptions.ClientConnectorError as err:
-            self.logger.warning('ConnectionError will be raised')
-            raise ConnectionError(str(err))
+        self.templates.check_codec()
+        self.logger.info('Sending cancellation request. eid = %s', eid)
+        await self.scheduler.submit('cancel-order', [eid], self.templates.cancel_body(eid))
 
         res.success = True
         return res
 
-    async def cancel_active_orders(self):
+    async def cancel_active_orders(self, contract_code=None):
+        # all configured contracts are cleared if no contract is given
         res = ApiResult()
 
-        body = {
-            'contract_code': self.config.symbol
-        }
-
-        final_data = {
-            'channel': 'trading',
-            'type': 'request',
-            'action': 'cancel-all-orders',
-            'data': body
-        }
+        # queued requests would go out after the cancel all and leave orders nobody tracks.
+        # Nothing is queued ahead of the cancel all then, it goes out before anything else
+        self.scheduler.reset()
+
+        contract_codes = self.symbols if contract_code is None else [contract_code]
+        for code in contract_codes:
+            final_data = {
+                'channel': 'trading',
+                'type': 'request',
+                'action': 'cancel-all-orders',
+                'data': {
+                    'contract_code': code
+                }
+            }
 
-        self.logger.info('Sending cancel all request')
-        try:
-            await self.ws.ws.send_str(json.dumps(final_data))
-        except aiohttp.client_exceptions.ClientConnectorError as err:
-            raise ConnectionError(str(err))
+            self.logger.info('Sending cancel all request. Contract = %s', code)
+            try:
+                await self.ws.send(final_data)
+            except aiohttp.client_exceptions.ClientConnectorError as err:
+                raise ConnectionError(str(err))
 
         res.success = True
         return res
 
     async def cancel_orders(self, orders_ids):
-        raise Exception('Multiple orders cancellation is not supported')
+        res = ApiResult()
+
+        eids = []
+        for order_id in orders_ids:
+            # a new order which was not sent yet has no eid, it is dropped from the queue
+            if self.scheduler.drop('create-order', order_id):
+                self.logger.info('Queued order was dropped. Order id = %s', order_id)
+                continue
+            eid = self.shared_storage.get_eid(order_id)
+            if eid is None:
+                # Order elimination msg was received on the Streaming side
+                self.logger.warning(f'Order was already removed. Order id = {order_id}')
+                continue
+            eids.append(eid)
+
+        if eids:
+            self.templates.check_codec()
+            await self.scheduler.submit('cancel-order', eids,
+                                        [self.templates.cancel_body(eid) for eid in eids])
+
+        res.success = True
+        return res
@@ -1,13 +1,101 @@
+import collections
+
+
 class SharedStorage:
     # uid is an user id
     # eid is an exchange id
 
-    def __init__(self):
-        self.uid_to_eid = {}
-        self.eid_to_uid = {}
-        self.eids_to_amend = {}
+    MAX_SIZE = 10000
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or self.MAX_SIZE
+
+        self.uid_to_eid = collections.OrderedDict()
+        self.eid_to_uid = collections.OrderedDict()
+        self.eids_to_amend = set()
+
+        self.uid_hits = 0
+        self.uid_misses = 0
+        self.eid_hits = 0
+        self.eid_misses = 0
+        self.evictions = 0
 
     def reset(self):
-        self.uid_to_eid = {}
-        self.eid_to_uid = {}
-        self.eids_to_amend = {}
+        self.uid_to_eid = collections.OrderedDict()
+        self.eid_to_uid = collections.OrderedDict()
+        self.eids_to_amend = set()
+
+        # the stats describe the current connection only
+        self.uid_hits = 0
+        self.uid_misses = 0
+        self.eid_hits = 0
+        self.eid_misses = 0
+        self.evictions = 0
+
+    def map_ids(self, uid, eid):
+        # an amend binds the exchange order to a new uid, the previous one is not valid anymore
+        prev_uid = self.eid_to_uid.get(eid)
+        if prev_uid is not None and prev_uid != uid and self.uid_to_eid.get(prev_uid) == eid:
+            del self.uid_to_eid[prev_uid]
+
+        self.eid_to_uid[eid] = uid
+        self.eid_to_uid.move_to_end(eid)
+        self.uid_to_eid[uid] = eid
+        self.uid_to_eid.move_to_end(uid)
+
+        # LRU cap in case terminal states were never reported by the exchange
+        while len(self.eid_to_uid) > self.max_size:
+            old_eid, old_uid = self.eid_to_uid.popitem(last=False)
+            if self.uid_to_eid.get(old_uid) == old_eid:
+                del self.uid_to_eid[old_uid]
+            self.eids_to_amend.discard(old_eid)
+            self.evictions += 1
+        while len(self.uid_to_eid) > self.max_size:
+            self.uid_to_eid.popitem(last=False)
+            self.evictions += 1
+
+    def release_eid(self, eid):
+        uid = self.eid_to_uid.pop(eid, None)
+        if uid is not None and self.uid_to_eid.get(uid) == eid:
+            del self.uid_to_eid[uid]
+        self.eids_to_amend.discard(eid)
+        return uid
+
+    def get_uid(self, eid):
+        uid = self.eid_to_uid.get(eid)
+        if uid is None:
+            self.uid_misses += 1
+        else:
+            self.uid_hits += 1
+            self.eid_to_uid.move_to_end(eid)
+        return uid
+
+    def get_eid(self, uid):
+        eid = self.uid_to_eid.get(uid)
+        if eid is None:
+            self.eid_misses += 1
+        else:
+            self.eid_hits += 1
+            self.uid_to_eid.move_to_end(uid)
+        return eid
+
+    def mark_amend(self, eid):
+        self.eids_to_amend.add(eid)
+
+    def is_amend(self, eid):
+        return eid in self.eids_to_amend
+
+    def clear_amend(self, eid):
+        self.eids_to_amend.discard(eid)
+
+    def get_stats(self):
+        return {
+            'uid_to_eid': len(self.uid_to_eid),
+            'eid_to_uid': len(self.eid_to_uid),
+            'eids_to_amend': len(self.eids_to_amend),
+            'uid_hits': self.uid_hits,
+            'uid_misses': self.uid_misses,
+            'eid_hits': self.eid_hits,
+            'eid_misses': self.eid_misses,
+            'evictions': self.evictions,
+        }
@@ -1,7 +1,10 @@
 import time
 import datetime
+from logging import INFO
 
 from market_maker.logger import logging
+from market_maker.logger.logging import TRACE
+from market_maker.gateways.emx import ticker
 from market_maker.definitions import (
     TopOfBook,
     ExchangeOrders,
@@ -21,12 +24,27 @@ from market_maker.definitions import (
 )
 
 
+class Route:
+    __slots__ = ('name', 'handler', 'needs_subscription', 'takes_data', 'many', 'count')
+
+    def __init__(self, name, handler, needs_subscription, takes_data=False, many=False):
+        # handler translates the frame, or its data if takes_data is set, into an update,
+        # or into a list of updates if many is set
+        self.name = name
+        self.handler = handler
+        self.needs_subscription = needs_subscription
+        self.takes_data = takes_data
+        self.many = many
+        self.count = 0
+
+
 class StreamingAdapter:
-    def __init__(self, config, auth, shared_storage):
+    def __init__(self, config, auth, shared_storage, tob_mailbox=None):
         self.logger = logging.getLogger()
 
         self.config = config
         self.shared_storage = shared_storage
+        self.tob_mailbox = tob_mailbox
 
         self.symbol = self.config.symbol
 
@@ -34,6 +52,8 @@ class StreamingAdapter:
 
         self.subscribed = False
         self.orders_received = False
+        # perf_counter_ns read time of the frame being processed, set by the gateway
+        self.received_ns = None
 
         self.events = {
             'order-received': self.process_new_received,
@@ -47,6 +67,26 @@ class StreamingAdapter:
             'filled': self.process_fill,
         }
 
+        # one lookup per frame: (channel, type, action) -> route
+        self.routes = {
+            (None, 'subscriptions', None):
+                Route('subscriptions', self.route_subscriptions, False),
+            ('orders', 'snapshot', None):
+                Route('orders-snapshot', self.process_active_orders, False, takes_data=True),
+            ('positions', 'snapshot', None):
+                Route('positions-snapshot', self.process_position_update, True, many=True),
+            ('positions', 'update', None):
+                Route('positions', self.process_position_update, True, many=True),
+            ('ticker', 'snapshot', None): Route('ticker-snapshot', self.route_tick, True),
+            ('ticker', 'update', None): Route('ticker', self.route_tick, True),
+        }
+        for action, process_event in self.events.items():
+            self.routes[('orders', 'update', action)] = \
+                Route(action, process_event, True, takes_data=True)
+        self.unrouted = 0
+        # name of the route of the last frame, the gateway keys the frame latencies with it
+        self.route_name = None
+
         if self.symbol is None:
             self.config.symbol = None
         elif type(self.config.symbol) is not list:
@@ -81,98 +121,127 @@ class StreamingAdapter:
             msg['contract_codes'] = []
         return [msg]
 
+    def find_route(self, msg):
+        # frames outside of the precompiled keys are matched by type and channel as before
+        msg_type = msg.get('type')
+        channel = msg.get('channel')
+        if msg_type == 'subscriptions':
+            return self.routes[(None, 'subscriptions', None)]
+        if msg_type == 'snapshot' and channel == 'orders':
+            return self.routes[('orders', 'snapshot', None)]
+        if channel == 'positions':
+            return self.routes[('positions', 'update', None)]
+        if channel == 'ticker':
+            return self.routes[('ticker', 'update', None)]
+
+        if channel != 'orders':
+            self.logger.debug('Message is not about orders updates')
+        elif msg_type != 'update':
+            self.logger.info('No need to process since it is not an update')
+        elif msg.get('action') is None:
+            self.logger.warning('No action was found')
+        else:
+            self.logger.warning(f'No {msg.get("action")} callback found related to order updates')
+        return None
+
     async def process(self, msg, msg_callback):
-        self.logger.info(f'Emx streaming got a msg: {msg}')
+        # isEnabledFor is cached by the logger, the payload is formatted only if traced
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx streaming got a msg: %s', msg)
+
+        route = self.routes.get((msg.get('channel'), msg.get('type'), msg.get('action')))
+        if route is None:
+            route = self.find_route(msg)
+            if route is None:
+                self.unrouted += 1
+                self.route_name = 'unrouted'
+                return
 
-        if msg.get('type') == 'subscriptions':
-            self.subscribed = True
-            self.logger.info(f'{self.config.exchange_name}: Successfully subscribed')
+        self.route_name = route.name
+        if route.needs_subscription and self.subscribed is False:
+            self.logger.warning('emx app was not subscribed to order updates')
             return
 
-        if msg.get('type') == 'snapshot' and msg.get('channel') == 'orders':
+        # handlers translate the frame, the callback is awaited here
+        route.count += 1
+        if route.takes_data:
             try:
-                msg = msg['data']
+                data = msg['data']
             except KeyError:
                 raise Exception('Unable to parse data')
 
             try:
-                res = self.process_active_orders(msg)
+                res = route.handler(data)
             except Exception as err:
                 raise Exception(f'process_event raised an exception. Reason: {err}')
+        else:
+            res = route.handler(msg)
 
-            if res:
-                if msg_callback is None:
-                    return
-                await msg_callback(res)
-
+        if not res:
             return
-
-        if self.subscribed is False:
-            self.logger.warning('emx app was not subscribed to order updates')
+        if msg_callback is None:
+            self.logger.debug('No msg callback found for EMX adapter')
             return
-
-        if msg.get('channel') == 'positions':
-            res = self.process_position_update(msg)
-            if msg_callback is None or res is None:
-                return
-
+        if route.many:
+            for update in res:
+                await msg_callback(update)
+        else:
             await msg_callback(res)
-            return
 
-        if msg.get('channel') == 'ticker':
-            try:
-                res = self.process_tick(msg)
-            except KeyError as error:
-                raise Exception(f'{self.config.exchange_name} Ticker processing failed: {error}')
-            if res is None:
-                self.logger.warning('process_tick returned None')
-                return
+    def get_route_stats(self):
+        # the time spent per route is in the translate histograms of latency.stats
+        stats = {route.name: route.count for route in self.routes.values() if route.count}
+        stats['unrouted'] = self.unrouted
+        return stats
 
-            try:
-                self.positions_mngr.set_mark_price(self.config.exchange_name,
-                                                   msg['data']['contract_code'],
-                                                   float(res.mark_price))
-            except Exception:
-                pass
+    def route_subscriptions(self, msg):
+        self.subscribed = True
+        self.logger.info(f'{self.config.exchange_name}: Successfully subscribed')
 
-            if msg_callback is None:
-                return
-            await msg_callback(res)
+    def route_tick(self, msg):
+        try:
+            res = self.process_tick(msg)
+        except KeyError as error:
+            raise Exception(f'{self.config.exchange_name} Ticker processing failed: {error}')
+        if res is None:
+            self.logger.warning('process_tick returned None')
             return
+        return self.put_tick(res)
 
-        if msg.get('channel') != 'orders':
-            self.logger.debug('Message is not about orders updates')
+    def put_tick(self, tob):
+        if self.tob_mailbox is not None:
+            # ticks are conflated, the strategy picks up the latest one when it is ready
+            self.tob_mailbox.put(tob)
             return
+        return tob
 
-        if msg.get('type') != 'update':
-            self.logger.info('No need to process since it is not an update')
-            return
+    def decode_tick(self, data):
+        # ticker frames are cut out of the text by the fast decoder, (route, top of book) is
+        # returned for them and None for any other frame, those are decoded as usual
+        fields = ticker.decode(data)
+        if fields is None:
+            return None
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx streaming got a msg: %s', data)
 
-        action = msg.get('action')
-        if action is None:
-            self.logger.warning('No action was found')
-            return
+        msg_type, contract_code, bid, bid_size, ask, ask_size, mark_price = fields
+        return (self.routes[('ticker', msg_type, None)],
+                self.make_tick(contract_code, bid, bid_size, ask, ask_size, mark_price))
 
-        process_event = self.events.get(action)
-        if process_event is None:
-            self.logger.warning(f'No {action} callback found related to order updates')
+    async def process_decoded_tick(self, route, tob, msg_callback):
+        self.route_name = route.name
+        if self.subscribed is False:
+            self.logger.warning('emx app was not subscribed to order updates')
             return
 
-        try:
-            msg = msg['data']
-        except KeyError:
-            raise Exception('Unable to parse data')
-
-        try:
-            res = process_event(msg)
-        except Exception as err:
-            raise Exception(f'process_event raised an exception. Reason: {err}')
-
-        if res:
-            if msg_callback is None:
-                self.logger.warning('No msg callback found for EMX adapter')
-                return
-            await msg_callback(res)
+        route.count += 1
+        res = self.put_tick(tob)
+        if res is None:
+            return
+        if msg_callback is None:
+            self.logger.debug('No msg callback found for EMX adapter')
+            return
+        await msg_callback(res)
 
     def process_active_orders(self, msg):
         self.logger.info(f'process_active_orders started. Msg = {msg}')
@@ -207,38 +276,48 @@ class StreamingAdapter:
         return orders_msg
 
     def process_position_update(self, msg):
-        _pos = None
+        # a snapshot carries the positions of every subscribed contract
         if msg['type'] == 'snapshot':
-            for elem in msg['data']:
-                if elem['contract_code'] == self.symbol:
-                    _pos = elem['quantity']
-                    break
+            elems = msg['data']
         else:
-            if msg['data']['contract_code'] != self.symbol:
-                return None
-            _pos = msg['data']['quantity']
-
-        if _pos is None:
-            self.logger.info(f'Were not able to parse position update {msg}')
-            return None
-
-        pos = Position()
-        pos.exchange = self.config.exchange_name
-        pos.instrument_name = self.symbol
-        pos.position = float(_pos)
-        return pos
+            elems = [msg['data']]
+
+        positions = []
+        for elem in elems:
+            if self.config.symbol and elem['contract_code'] not in self.config.symbol:
+                continue
+            pos = Position()
+            pos.exchange = self.config.exchange_name
+            pos.instrument = elem['contract_code']
+            pos.position = float(elem['quantity'])
+            positions.append(pos)
+
+        if not positions:
+            self.logger.info('Were not able to parse position update %s', msg)
+        return positions
 
     def process_tick(self, msg):
         data = msg['data']
+        quote = data['quote']
+        mark_price = data.get('mark_price')
+        return self.make_tick(data['contract_code'], float(quote['bid']),
+                              float(quote['bid_size']), float(quote['ask']),
+                              float(quote['ask_size']),
+                              None if mark_price is None else float(mark_price))
+
+    def make_tick(self, contract_code, bid, bid_size, ask, ask_size, mark_price):
         tb = TopOfBook()
         tb.exchange = 'emx'
-        tb.product = data['contract_code']
-        tb.best_bid_price = float(data['quote']['bid'])
-        tb.best_bid_qty = float(data['quote']['bid_size'])
-        tb.best_ask_price = float(data['quote']['ask'])
-        tb.best_ask_qty = float(data['quote']['ask_size'])
-
-        tb.timestamp = datetime.datetime.utcnow()
+        tb.product = contract_code
+        tb.best_bid_price = bid
+        tb.best_bid_qty = bid_size
+        tb.best_ask_price = ask
+        tb.best_ask_qty = ask_size
+        tb.mark_price = mark_price
+
+        # epoch seconds, utcnow builds a datetime for every tick
+        tb.timestamp = time.time()
+        tb.received_ns = self.received_ns
         return tb
 
     def process_new_received(self, msg):
@@ -253,8 +332,7 @@ class StreamingAdapter:
         except KeyError:
             self.logger.warning(f'Got new_received, but unable to find uid for {msg["order_id"]}')
 
-        self.shared_storage.eid_to_uid[eid] = uid
-        self.shared_storage.uid_to_eid[uid] = eid
+        self.shared_storage.map_ids(uid, eid)
         return None
 
     def process_amend_received(self, msg):
@@ -274,15 +352,14 @@ class StreamingAdapter:
         except KeyError:
             raise Exception('Unable to parse eid')
 
-        uid = '0'
-        try:
-            uid = self.shared_storage.eid_to_uid[eid]
-        except KeyError:
-            self.logger.debug(f'Got order process ack, but unable to find uid for {eid}')
+        uid = self.shared_storage.get_uid(eid)
+        if uid is None:
+            uid = '0'
+            self.logger.debug('Got order process ack, but unable to find uid for %s', eid)
 
-        if self.shared_storage.eids_to_amend.get(eid):
+        if self.shared_storage.is_amend(eid):
             if float(msg['size_filled']) > 0:
-                self.logger.info(f'amend_ack_on_partial will be created. Msg = {eid}')
+                self.logger.info('amend_ack_on_partial will be created. Msg = %s', eid)
 
                 ack = AmendAcknowledgementPartial()
                 ack.exchange = 'emx'
@@ -301,7 +378,7 @@ class StreamingAdapter:
                 return ack
 
             ack = AmendAcknowledgement()
-            del self.shared_storage.eids_to_amend[eid]
+            self.shared_storage.clear_amend(eid)
         else:
             ack = NewOrderAcknowledgement()
 
@@ -331,20 +408,23 @@ class StreamingAdapter:
             self.logger.warning(f'emx msg for the wrong instrument. {msg}')
             return
 
-        self.logger.info(f'Emx received new rejection: {msg}')
+        self.logger.info('Emx received new rejection. eid = %s, reason = %s',
+                         msg.get('order_id'), msg.get('message'))
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx received new rejection: %s', msg)
         try:
             eid = msg['order_id']
         except KeyError:
             raise Exception('Unable to parse eid')
 
-        try:
-            uid = self.shared_storage.eid_to_uid[eid]
-        except KeyError:
+        uid = self.shared_storage.release_eid(eid)
+        if uid is None:
             self.logger.warning(f'Got new order rejection, but unable to find uid for {eid}')
             return
 
         rejection = NewOrderRejection()
         rejection.order_id = uid
+        rejection.instrument = msg['contract_code']
         rejection.exchange_order_id = eid
         rejection.rejection_reason = msg.get('message')
         return rejection
@@ -354,23 +434,26 @@ class StreamingAdapter:
             self.logger.warning(f'emx msg for the wrong instrument. {msg}')
             return
 
-        self.logger.info(f'Emx received amend rejection: {msg}')
+        self.logger.info('Emx received amend rejection. eid = %s, reason = %s',
+                         msg.get('order_id'), msg.get('message'))
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx received amend rejection: %s', msg)
         try:
             eid = msg['order_id']
         except KeyError:
             raise Exception('f{self.config.exchange_name} Unable to parse eid')
 
-        try:
-            uid = self.shared_storage.eid_to_uid[eid]
-        except KeyError:
+        uid = self.shared_storage.get_uid(eid)
+        if uid is None:
             self.logger.warning(
                 f'{self.config.exchange_name} Got amend reject, but unable to find uid for {eid}')
             return
 
-        del self.shared_storage.eids_to_amend[eid]
+        self.shared_storage.clear_amend(eid)
 
         rejection = AmendRejection()
         rejection.order_id = uid
+        rejection.instrument = msg['contract_code']
         rejection.rejection_reason = msg.get('message')
         return rejection
 
@@ -379,14 +462,15 @@ class StreamingAdapter:
             self.logger.warning(f'emx msg for the wrong instrument. {msg}')
             return None
 
-        self.logger.info(f'Emx received elimination: {msg}')
+        self.logger.info('Emx received elimination. eid = %s', msg.get('order_id'))
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx received elimination: %s', msg)
         try:
             eid = msg['order_id']
         except KeyError:
             raise Exception('Unable to parse eid')
-        try:
-            uid = self.shared_storage.eid_to_uid[eid]
-        except KeyError:
+        uid = self.shared_storage.release_eid(eid)
+        if uid is None:
             self.logger.warning(f'Got elim ack, but unable to find uid for {eid}')
             return None
 
@@ -396,6 +480,7 @@ class StreamingAdapter:
 
         ack = OrderEliminationAcknowledgement()
         ack.order_id = uid
+        ack.instrument = msg['contract_code']
         return ack
 
     def process_elimination_reject(self, msg):
@@ -403,19 +488,22 @@ class StreamingAdapter:
             self.logger.warning(f'emx msg for the wrong instrument. {msg}')
             return
 
-        self.logger.info(f'Emx received elim rejection: {msg}')
+        self.logger.info('Emx received elim rejection. eid = %s, reason = %s',
+                         msg.get('order_id'), msg.get('message'))
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx received elim rejection: %s', msg)
         try:
             eid = msg['order_id']
         except KeyError:
             raise Exception('Unable to parse eid')
-        try:
-            uid = self.shared_storage.eid_to_uid[eid]
-        except KeyError:
+        uid = self.shared_storage.get_uid(eid)
+        if uid is None:
             self.logger.warning(f'Got elim reject, but unable to find uid for {msg["order_id"]}')
             return
 
         rejection = OrderEliminationRejection()
         rejection.order_id = uid
+        rejection.instrument = msg['contract_code']
         rejection.rejection_reason = msg.get('message')
         return rejection
 
@@ -424,7 +512,8 @@ class StreamingAdapter:
             self.logger.warning(f'emx msg for the wrong instrument. {msg}')
             return
 
-        self.logger.debug(f'Emx streaming got a fill: {msg}')
+        if self.logger.isEnabledFor(TRACE):
+            self.logger.log(TRACE, 'Emx streaming got a fill: %s', msg)
 
         try:
             status = msg['status']
@@ -432,6 +521,7 @@ class StreamingAdapter:
             raise Exception('Unable to parse message status')
 
         if status == 'canceled':
+            # the ids are released by the elimination, which may come after this frame
             return
 
         try:
@@ -439,13 +529,14 @@ class StreamingAdapter:
         except KeyError:
             raise Exception('Unable to parse eid')
 
-        uid = '0'
-        try:
-            uid = self.shared_storage.eid_to_uid[eid]
-        except KeyError:
+        if status == 'done':
+            uid = self.shared_storage.release_eid(eid)
+        else:
+            uid = self.shared_storage.get_uid(eid)
+        if uid is None:
+            uid = '0'
             self.logger.warning(f'Got a fill, but unable to find uid for {msg["order_id"]}')
 
-        timestamp_obj = datetime.datetime.strptime(msg['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ')
         if status == 'done':
             ack = OrderFullFillAcknowledgement()
             ack.exchange = 'emx'
@@ -481,6 +572,9 @@ class StreamingAdapter:
             ack.timestamp = msg['timestamp']
             ack.fee = float(msg['fill_fees_delta'])
 
-        t_diff = datetime.datetime.utcnow() - timestamp_obj
-        self.logger.info(f'Took {t_diff.total_seconds()} to receive a fill')
+        # parsing the exchange timestamp costs more than the rest of the translation
+        if self.logger.isEnabledFor(INFO):
+            timestamp_obj = datetime.datetime.strptime(msg['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ')
+            t_diff = datetime.datetime.utcnow() - timestamp_obj
+            self.logger.info('Took %s to receive a fill', t_diff.total_seconds())
         return ack
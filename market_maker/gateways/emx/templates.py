@@ -0,0 +1,127 @@
+from market_maker import codec
+
+SLOT = '\x00slot\x00'
+
+
+def escape(value):
+    # the content of a json string, plain ascii ids (uuids) are copied as they are
+    if value.isascii() and value.isprintable() and '"' not in value and '\\' not in value:
+        return value
+    return codec.dumps(value)[1:-1]
+
+
+class RequestTemplates:
+    # trading requests pre-serialized per instrument, side and order type, only ids, sizes and
+    # prices are formatted into them. The output is byte identical to the request dict encoded
+    # by the compact codec the templates were built with.
+    # check_codec has to be called before the bodies of a request are built
+    MAX_CACHED_NUMBERS = 10000
+
+    def __init__(self, rounding_qty):
+        self.rounding_qty = rounding_qty
+
+        self.codec = None
+        self.envelopes = {}
+        self.create_bodies = {}
+        self.amend_bodies = {}
+        self.cancel_body_template = None
+
+        # quotes are re-sent at a handful of sizes and at prices on the tick grid
+        self.sizes = {}
+        self.prices = {}
+
+    def check_codec(self):
+        # templates follow the codec, they are rebuilt if it was switched
+        if self.codec is not codec.codec:
+            self.codec = codec.codec
+            self.envelopes = {}
+            self.create_bodies = {}
+            self.amend_bodies = {}
+            self.cancel_body_template = None
+
+    def build(self, fields):
+        # None values become "%s" slots
+        data = codec.dumps({name: SLOT if value is None else value
+                            for name, value in fields.items()})
+        return data.replace('%', '%%').replace(codec.dumps(SLOT)[1:-1], '%s')
+
+    def format_size(self, quantity):
+        size = self.sizes.get(quantity)
+        if size is None:
+            if len(self.sizes) >= self.MAX_CACHED_NUMBERS:
+                self.sizes.clear()
+            size = self.sizes[quantity] = str(round(quantity, self.rounding_qty))
+        return size
+
+    def format_price(self, price):
+        price_str = self.prices.get(price)
+        if price_str is None:
+            if len(self.prices) >= self.MAX_CACHED_NUMBERS:
+                self.prices.clear()
+            price_str = self.prices[price] = str(price)
+        return price_str
+
+    def create_body(self, contract_code, side, ord_type, post_only, client_id, quantity,
+                    price=None):
+        key = (contract_code, side, ord_type, post_only, price is None)
+        template = self.create_bodies.get(key)
+        if template is None:
+            fields = {
+                'client_id': None,
+                'contract_code': contract_code,
+                'type': ord_type,
+                'side': side,
+                'size': None,
+            }
+            if price is not None:
+                fields['price'] = None
+                if post_only:
+                    fields['post_only'] = True
+            template = self.create_bodies[key] = self.build(fields)
+
+        if type(client_id) is not str:
+            client_id = str(client_id)
+        if price is None:
+            return template % (escape(client_id), self.format_size(quantity))
+        return template % (escape(client_id), self.format_size(quantity),
+                           self.format_price(price))
+
+    def amend_body(self, side, ord_type, order_id, quantity, price=None):
+        key = (side, ord_type, price is None)
+        template = self.amend_bodies.get(key)
+        if template is None:
+            fields = {
+                'type': ord_type,
+                'side': side,
+                'order_id': None,
+                'size': None,
+            }
+            if price is not None:
+                fields['price'] = None
+            template = self.amend_bodies[key] = self.build(fields)
+
+        if price is None:
+            return template % (escape(order_id), self.format_size(quantity))
+        return template % (escape(order_id), self.format_size(quantity),
+                           self.format_price(price))
+
+    def cancel_body(self, order_id):
+        if self.cancel_body_template is None:
+            self.cancel_body_template = self.build({'order_id': None})
+        return self.cancel_body_template % escape(order_id)
+
+    def request(self, action, bodies):
+        # a list of bodies is sent as a bulk request, a single one as it is
+        envelope = self.envelopes.get(action)
+        if envelope is None:
+            envelope = self.build({
+                'channel': 'trading',
+                'type': 'request',
+                'action': action,
+                'data': None,
+            }).replace('"%s"', '%s')
+            self.envelopes[action] = envelope
+
+        if isinstance(bodies, list):
+            bodies = '[' + ','.join(bodies) + ']'
+        return (envelope % bodies).encode()
@@ -0,0 +1,39 @@
+import re
+import sys
+
+# possessive quantifiers (python 3.11+) never backtrack into the scanned values, the match
+# takes about half of the time with them
+MANY = '*+' if sys.version_info >= (3, 11) else '*'
+
+# a string value without escapes, and the fields of a flat object up to its closing brace
+STRING = r'"([^"\\]' + MANY + ')"'
+REST = r'[^}]' + MANY + r'\}'
+
+# the compact ticker frame as EMX lays it out, one match cuts out the type, the contract code,
+# the quote and the mark price. The quote ends the data or the mark price follows it, any other
+# layout does not match and is decoded as usual
+TICKER_FRAME = re.compile(
+    r'\{"channel":"ticker","type":"(update|snapshot)","data":\{'
+    r'"contract_code":' + STRING + ','
+    r'(?:"last_trade":\{' + REST + ',)?'
+    r'"quote":\{"bid":' + STRING + ',"bid_size":' + STRING + ',"ask":' + STRING +
+    ',"ask_size":' + STRING + REST +
+    r'(?:\}|,"mark_price":' + STRING + ')'
+)
+
+
+def decode(data):
+    # (type, contract_code, bid, bid_size, ask, ask_size, mark_price) without decoding the
+    # whole frame, None if the frame is not a ticker frame laid out as expected
+    if type(data) is not str:
+        return None
+    match = TICKER_FRAME.match(data)
+    if match is None:
+        return None
+
+    msg_type, contract_code, bid, bid_size, ask, ask_size, mark_price = match.groups()
+    try:
+        return (msg_type, contract_code, float(bid), float(bid_size), float(ask),
+                float(ask_size), None if mark_price is None else float(mark_price))
+    except ValueError:
+        return None
@@ -1,10 +1,12 @@
 import abc
 import time
-import json
 import aiohttp
 import asyncio
 
+from market_maker import codec
+from market_maker import latency
 from market_maker.definitions import ApiResult
+from market_maker.mailbox import TopOfBookMailbox
 from market_maker.logger import logging
 
 
@@ -12,13 +14,16 @@ class GatewayInterface(abc.ABC):
     def __init__(self):
         self.msg_callback = None
         self.stop = False
-        self.last_hb_time = time.time()
         self.cancel_orders_on_start = False
         self.send_post_only_orders = True
 
         self.started = False
         self.reconnecting = False
         self.ready_to_listen = asyncio.Event()
+        self.tob_mailbox = TopOfBookMailbox()
+        self.recorder = None
+        # awaited after the connection was re-established, every order was cancelled on start
+        self.reconnect_listeners = []
 
         self.logger = logging.getLogger()
 
@@ -26,7 +31,7 @@ class GatewayInterface(abc.ABC):
     async def set_order_update_callback(self, msg_callback):
         pass
 
-    async def request_orders(self) -> ApiResult:
+    async def request_orders(self, contract_code=None) -> ApiResult:
         pass
 
     @abc.abstractmethod
@@ -46,7 +51,7 @@ class GatewayInterface(abc.ABC):
         pass
 
     @abc.abstractmethod
-    async def cancel_active_orders(self) -> ApiResult:
+    async def cancel_active_orders(self, contract_code=None) -> ApiResult:
         pass
 
     @abc.abstractmethod
@@ -57,36 +62,23 @@ class GatewayInterface(abc.ABC):
     def is_ready(self):
         pass
 
+    def reset(self):
+        # state of the previous connection, dropped before a reconnection starts
+        pass
+
+    def close(self):
+        # called once the event loop is stopped
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
     async def listen(self):
         while not self.stop:
-            # await self.ready_to_listen.wait()
-            if self.ready_to_listen.is_set() is False:
-                await asyncio.sleep(0.1)
-                continue
+            await self.ready_to_listen.wait()
 
             try:
-                if time.time() - self.last_hb_time >= 30:
-                    try:
-                        await self.websocket.ping('keepalive')
-                    except Exception as err:
-                        self.logger.info(f'Ping failed: {err}')
-                        await asyncio.sleep(0.1)
-                        continue
-                    self.last_hb_time = time.time()
-
-                try:
-                    msg = await self.websocket.receive()
-                    if msg is None:
-                        continue
-                except Exception as err:
-                    self.logger.info(f'Receive failed: {err}')
-                    if self.reconnecting is False:
-                        self.logger.error(f'Will be reconnected. Receive failed: {err}')
-                        raise Exception('Failed to get ws msg')
-                    await asyncio.sleep(0.1)
-                    continue
+                msg = await self.websocket.receive()
 
-                self.logger.debug(f'websocket msg received: {msg}')
                 if msg.type == aiohttp.WSMsgType.closed:
                     if self.reconnecting is False:
                         self.logger.warning('Connection msg closed was received')
@@ -99,25 +91,47 @@ class GatewayInterface(abc.ABC):
                     self.logger.warning('Connection is closed')
                     continue
                 elif msg.type == aiohttp.WSMsgType.error:
-                    self.logger.warning('Connection msg error was received')
-                    raise Exception('Connection msg error was received')
+                    if self.reconnecting is False:
+                        self.logger.error(f'Will be reconnected. Receive failed: {msg.data}')
+                        raise Exception(f'Connection msg error was received: {msg.data}')
+                    continue
             except Exception as e:
                 self.logger.warning(f'Exception raised: {e}')
                 raise Exception(f'Exception raised: {e}')
             if msg.type == aiohttp.WSMsgType.text:
+                dequeued_ns = time.perf_counter_ns()
+                received_ns = self.websocket.received_ns
+                if self.recorder is not None:
+                    self.recorder.write(msg.data, received_ns)
+                self.streaming.received_ns = received_ns
+
+                # ticks skip the generic decode, anything unexpected falls through to it
+                tick = self.streaming.decode_tick(msg.data)
+                if tick is None:
+                    try:
+                        msg = codec.loads(msg.data)
+                    except ValueError:
+                        self.logger.warning(f'Unable to load the msg. Msg = {msg}')
+                        raise Exception(f'Unable to load the msg. Msg = {msg}')
+                decoded_ns = time.perf_counter_ns()
+
                 try:
-                    msg = json.loads(msg.data)
-                except ValueError:
-                    self.logger.warning(f'Unable to load the msg. Msg = {msg}')
-                    raise Exception(f'Unable to load the msg. Msg = {msg}')
-                try:
-                    await self.streaming.process(msg, self.msg_callback)
+                    if tick is None:
+                        await self.streaming.process(msg, self.msg_callback)
+                    else:
+                        await self.streaming.process_decoded_tick(*tick, self.msg_callback)
                 except Exception as e:
                     self.logger.warning(f'Exception raised during processing: {e}')
                     raise Exception(f'Exception raised during processing: {e}')
+
+                latency.stats.record_frame(self.streaming.route_name, received_ns, dequeued_ns,
+                                           decoded_ns, time.perf_counter_ns())
             else:
                 raise Exception(f'Unknown msg type was received. {msg}')
 
+    def add_reconnect_listener(self, callback):
+        self.reconnect_listeners.append(callback)
+
     async def reconnect(self):
         if self.reconnecting:
             return
@@ -127,6 +141,8 @@ class GatewayInterface(abc.ABC):
         self.reconnecting = True
 
         await self.websocket.close()
+        # queued requests refer to orders which are cancelled on start
+        self.reset()
 
         self.logger.warning('Connection is closed before new attempt')
 
@@ -141,3 +157,6 @@ class GatewayInterface(abc.ABC):
 
         self.reconnecting = False
         self.logger.warning('Connection was established')
+
+        for callback in self.reconnect_listeners:
+            await callback()
@@ -0,0 +1,162 @@
+import time
+import asyncio
+
+from .logger import logging
+
+
+class Histogram:
+    # HDR style log-linear buckets: every power of two range of ns is split into
+    # 2 ** (SUB_BUCKET_BITS - 1) linear buckets, so the relative error stays below 1%
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def bucket_index(cls, value):
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        if shift <= 0:
+            return value
+        return (shift << (cls.SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+    @classmethod
+    def bucket_value(cls, idx):
+        # the middle of the bucket
+        shift = (idx >> (cls.SUB_BUCKET_BITS - 1)) - 1
+        if shift <= 0:
+            return idx
+        return ((idx - (shift << (cls.SUB_BUCKET_BITS - 1))) << shift) + (1 << (shift - 1))
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+
+        idx = self.bucket_index(value)
+        if idx >= len(self.counts):
+            self.counts.extend([0] * (idx + 1 - len(self.counts)))
+        self.counts[idx] += 1
+
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        if self.count == 0:
+            return None
+
+        rank = max(1, int(round(self.count * pct / 100.0)))
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(self.bucket_value(idx), self.min), self.max)
+        return self.max
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for idx, count in enumerate(other.counts):
+            self.counts[idx] += count
+
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def get_summary(self, pcts=(50, 99, 99.9)):
+        # microseconds
+        summary = {
+            'count': self.count,
+            'min': None if self.min is None else self.min / 1000.0,
+            'mean': self.total / self.count / 1000.0 if self.count else None,
+            'max': None if self.max is None else self.max / 1000.0,
+        }
+        for pct in pcts:
+            value = self.percentile(pct)
+            summary[f'p{pct:g}'] = None if value is None else value / 1000.0
+        return summary
+
+
+class LatencyStats:
+    # per stage and per message type histograms of the tick-to-order path, all in
+    # time.perf_counter_ns units:
+    #   queue      frame read from the socket -> taken by the gateway
+    #   decode     json decoding
+    #   translate  StreamingAdapter turning the frame into a message and handing it over
+    #   strategy   ticker frame read -> orders decided by the strategy
+    #   send       orders decided -> request bytes handed to the socket
+    #   tick_to_wire  ticker frame read -> first request bytes handed to the socket
+
+    def __init__(self):
+        self.logger = logging.getLogger()
+
+        self.enabled = True
+        self.histograms = {}
+
+        self.origin_ns = None
+        self.decision_ns = None
+
+    def reset(self):
+        self.histograms = {}
+        self.origin_ns = None
+        self.decision_ns = None
+
+    def record(self, stage, msg_type, value):
+        histogram = self.histograms.get((stage, msg_type))
+        if histogram is None:
+            histogram = self.histograms[(stage, msg_type)] = Histogram()
+        histogram.record(value)
+
+    def record_frame(self, msg_type, received_ns, dequeued_ns, decoded_ns, processed_ns):
+        if not self.enabled:
+            return
+        self.record('queue', msg_type, dequeued_ns - received_ns)
+        self.record('decode', msg_type, decoded_ns - dequeued_ns)
+        self.record('translate', msg_type, processed_ns - decoded_ns)
+
+    def mark_decision(self, origin_ns):
+        # the strategy decided to send orders because of the frame read at origin_ns
+        if not self.enabled or origin_ns is None:
+            return
+        self.decision_ns = time.perf_counter_ns()
+        self.origin_ns = origin_ns
+        self.record('strategy', 'ticker', self.decision_ns - origin_ns)
+
+    def end_decision(self):
+        self.decision_ns = None
+        self.origin_ns = None
+
+    def mark_sent(self, msg_type):
+        if not self.enabled or self.decision_ns is None:
+            return
+        now = time.perf_counter_ns()
+        self.record('send', msg_type, now - self.decision_ns)
+        if self.origin_ns is not None:
+            self.record('tick_to_wire', msg_type, now - self.origin_ns)
+            # the following requests of the same decision are not attributed to the tick
+            self.origin_ns = None
+
+    def get_report(self):
+        report = {}
+        for (stage, msg_type), histogram in sorted(self.histograms.items()):
+            report.setdefault(stage, {})[msg_type] = histogram.get_summary()
+        return report
+
+    async def report_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            for stage, msg_types in self.get_report().items():
+                for msg_type, summary in msg_types.items():
+                    self.logger.info(f'latency {stage} {msg_type} us: {summary}')
+
+
+stats = LatencyStats()
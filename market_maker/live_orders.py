@@ -0,0 +1,90 @@
+import heapq
+import bisect
+import itertools
+
+from .definitions import OrderSide
+from .order_state import State
+
+
+class LiveOrders:
+    # live orders keyed by order id, with price sorted views per side and counts per state
+
+    def __init__(self):
+        self.orders = {}
+        self.states = {}
+        self.state_counts = [0] * (max(State) + 1)
+        self.sort_keys = {}
+        self.sides = {side: [] for side in OrderSide}
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    def __iter__(self):
+        return iter(self.orders)
+
+    def clear(self):
+        self.orders = {}
+        self.states = {}
+        self.state_counts = [0] * (max(State) + 1)
+        self.sort_keys = {}
+        self.sides = {side: [] for side in OrderSide}
+
+    def add(self, order, state):
+        order_id = order.order_id
+        if order_id in self.orders:
+            self.remove(order_id)
+
+        # the sequence number keeps orders with equal prices in the insertion order
+        sort_key = (order.price, next(self.sequence), order_id)
+        bisect.insort(self.sides[order.side], sort_key)
+
+        self.orders[order_id] = order
+        self.sort_keys[order_id] = sort_key
+        self.states[order_id] = state
+        self.state_counts[state] += 1
+
+    def remove(self, order_id):
+        order = self.orders.pop(order_id)
+
+        sort_key = self.sort_keys.pop(order_id)
+        side = self.sides[order.side]
+        del side[bisect.bisect_left(side, sort_key)]
+
+        self.state_counts[self.states.pop(order_id)] -= 1
+        return order
+
+    def discard(self, order_id):
+        if order_id in self.orders:
+            return self.remove(order_id)
+        return None
+
+    def update_state(self, order_id, state):
+        prev_state = self.states.get(order_id)
+        if prev_state is None or prev_state is state:
+            return
+        self.state_counts[prev_state] -= 1
+        self.state_counts[state] += 1
+        self.states[order_id] = state
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def get_orders(self):
+        return list(self.orders.values())
+
+    def get_side(self, side):
+        return [self.orders[sort_key[2]] for sort_key in self.sides[side]]
+
+    def get_sorted(self):
+        sort_keys = heapq.merge(*self.sides.values())
+        return [self.orders[sort_key[2]] for sort_key in sort_keys]
+
+    def count(self, states):
+        return sum(self.state_counts[state] for state in states)
+
+    def ids_in_states(self, states):
+        return [order_id for order_id, state in self.states.items() if state in states]
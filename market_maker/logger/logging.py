@@ -1,8 +1,18 @@
 import os
+import time
+import queue
+import atexit
 import logging
+import logging.handlers
+import collections
 from .log_formatter import LogFormatter
 
+# full payloads of the hot path are logged at this level, below DEBUG
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
 m_logger = None
+m_listener = None
 
 
 def setLogger(logger):
@@ -18,17 +28,168 @@ def getLogger():
         return m_logger
 
 
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # the event loop only merges the message and enqueues it. When the queue fills up the least
+    # important records are dropped first. Errors are neither lost nor waited for, they take
+    # the place of a queued record of a lower level
+    DEBUG_FILL_RATIO = 0.5
+    INFO_FILL_RATIO = 0.9
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.debug_limit = int(log_queue.maxsize * self.DEBUG_FILL_RATIO)
+        self.info_limit = int(log_queue.maxsize * self.INFO_FILL_RATIO)
+        self.dropped = collections.Counter()
+
+    def prepare(self, record):
+        # unlike the base class formatting is left to the listener thread, only the arguments are
+        # merged here since they may be changed by the caller afterwards
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        levelno = record.levelno
+        if levelno >= logging.ERROR:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.force_put(record)
+            return
+
+        size = self.queue.qsize()
+        if (levelno < logging.INFO and size >= self.debug_limit) or \
+                (levelno < logging.WARNING and size >= self.info_limit):
+            self.dropped[record.levelname] += 1
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[record.levelname] += 1
+
+    def force_put(self, record):
+        # the oldest queued record below ERROR is evicted. If every queued record is an error
+        # the queue goes over its bound, a stalled listener never stalls the event loop
+        log_queue = self.queue
+        with log_queue.mutex:
+            for idx, queued in enumerate(log_queue.queue):
+                if getattr(queued, 'levelno', logging.CRITICAL) < logging.ERROR:
+                    del log_queue.queue[idx]
+                    self.dropped[queued.levelname] += 1
+                    break
+            else:
+                log_queue.unfinished_tasks += 1
+            log_queue.queue.append(record)
+            log_queue.not_empty.notify()
+
+
+class BlockingQueueListener(logging.handlers.QueueListener):
+    IDLE_FLUSH_SECS = 1.0
+
+    def dequeue(self, block):
+        # batched handlers get a chance to flush when no records come in
+        while True:
+            try:
+                return self.queue.get(block, self.IDLE_FLUSH_SECS)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+    def enqueue_sentinel(self):
+        # the queue may be full on shutdown, the records ahead of the sentinel are still written
+        self.queue.put(self._sentinel)
+
+
+class BatchedFileHandler(logging.FileHandler):
+    # StreamHandler flushes after every record, here the writes are flushed in batches,
+    # on every error record and on close
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, filename, flush_interval=1.0):
+        self.flush_interval = flush_interval
+        self.last_flush_time = time.monotonic()
+        self.force_flush = False
+        super().__init__(filename)
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.BUFFER_SIZE,
+                    encoding=self.encoding)
+
+    def emit(self, record):
+        self.force_flush = record.levelno >= logging.ERROR
+        super().emit(record)
+
+    def flush(self):
+        now = time.monotonic()
+        if self.force_flush or now - self.last_flush_time >= self.flush_interval:
+            super().flush()
+            self.last_flush_time = now
+            self.force_flush = False
+
+    def close(self):
+        self.force_flush = True
+        self.flush()
+        super().close()
+
+
+def start_listener(handlers, queue_size=10000):
+    global m_listener
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+
+    m_listener = BlockingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    m_listener.start()
+    atexit.register(stop_logging)
+    return queue_handler
+
+
+def stop_logging():
+    # writes out everything which was enqueued and closes the handlers
+    global m_listener
+    if m_listener is None:
+        return
+
+    listener, m_listener = m_listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        try:
+            handler.flush()
+            handler.close()
+        except Exception:
+            pass
+
+
+def get_dropped_records():
+    stats = collections.Counter()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            stats.update(handler.dropped)
+    return dict(stats)
+
+
 def setup_logging(cfg, app_name):
     handler = logging.StreamHandler()
     handler.setFormatter(LogFormatter())
+    handlers = [handler]
 
     if cfg.logger.path_to_file:
-        logging.basicConfig(filename=cfg.logger.path_to_file, level=logging.WARNING)
-    logging.getLogger().addHandler(handler)
+        file_handler = BatchedFileHandler(cfg.logger.path_to_file,
+                                          cfg.logger.flush_interval or 1.0)
+        file_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        handlers.append(file_handler)
+        logging.getLogger().setLevel(logging.WARNING)
+
+    # formatting and I/O run in a listener thread, so a slow disk does not stall the event loop
+    logging.getLogger().addHandler(start_listener(handlers, cfg.logger.queue_size or 10000))
 
     app_logger = logging.getLogger(app_name)
     app_logger.setLevel(cfg.logger.level)
     setLogger(app_logger)
     logging.getLogger('asyncio').setLevel(logging.INFO)
     return app_logger
-
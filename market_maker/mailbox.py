@@ -0,0 +1,38 @@
+import collections
+
+
+class TopOfBookMailbox:
+    # keeps only the latest top of book per instrument, older ones are coalesced
+
+    def __init__(self):
+        self.slots = {}
+        self.received = collections.Counter()
+        self.coalesced = collections.Counter()
+        self.listeners = {}
+
+    def put(self, tob):
+        product = tob.product
+        if product in self.slots:
+            self.coalesced[product] += 1
+        self.slots[product] = tob
+        self.received[product] += 1
+
+        for event in self.listeners.get(product, ()):
+            event.set()
+
+    def subscribe(self, product, event):
+        self.listeners.setdefault(product, []).append(event)
+
+    def take(self, product):
+        return self.slots.pop(product, None)
+
+    def reset(self):
+        self.slots = {}
+
+    def get_stats(self):
+        return {
+            product: {
+                'received': self.received[product],
+                'coalesced': self.coalesced[product],
+            } for product in self.received
+        }
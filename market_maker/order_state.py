@@ -1,8 +1,8 @@
 import time
-from enum import Enum, auto
+from enum import IntEnum, auto
 
 
-class Event(Enum):
+class Event(IntEnum):
     on_creation = auto()
     on_insert_ack = auto()
     on_insert_rejection = auto()
@@ -17,145 +17,108 @@ class Event(Enum):
     on_amend_rejection = auto()
 
 
-class State:
-    def on_event(self, event):
-        pass
+class State(IntEnum):
+    Inactive = auto()
+    InsertPending = auto()
+    Active = auto()
+    AmendPending = auto()
+    Cancelled = auto()
+    InsertFailed = auto()
+    Fill = auto()
+    FullFill = auto()
+    CancelPending = auto()
+    CancelFailed = auto()
 
     def __repr__(self):
-        return self.__str__()
+        return self.name
 
     def __str__(self):
-        return self.__class__.__name__
-
-
-class Inactive(State):
-    def on_event(self, event):
-        if event == event.on_creation:
-            return InsertPending()
-        return self
-
-
-class InsertPending(State):
-    def on_event(self, event):
-        if event == event.on_insert_rejection:
-            return InsertFailed()
-        elif event == event.on_cancel:
-            return CancelPending()
-        elif event == event.on_insert_ack:
-            return Active()
-        elif event == event.on_cancel_ack:
-            return Cancelled()
-        elif event == event.on_fill:
-            return Fill()
-        elif event == event.on_full_fill:
-            return FullFill()
-        return self
-
-
-class Active(State):
-    def on_event(self, event):
-        if event == event.on_fill:
-            return Fill()
-        elif event == event.on_insert_rejection:
-            return InsertFailed()
-        elif event == event.on_cancel:
-            return CancelPending()
-        elif event == event.on_amend:
-            return AmendPending()
-        elif event == event.on_fill:
-            return Fill()
-        elif event == event.on_full_fill:
-            return FullFill()
-        elif event == event.on_amend_rejection:
-            return Inactive()
-        return self
-
-
-class AmendPending(State):
-    def on_event(self, event):
-        if event == event.on_cancel:
-            return CancelPending()
-        elif event == event.on_amend_ack:
-            return Active()
-        elif event == event.on_amend_partial_ack:
-            return Active()
-        elif event == event.on_amend_rejection:
-            return Inactive()
-        elif event == event.on_fill:
-            return Fill()
-        elif event == event.on_full_fill:
-            return FullFill()
-        elif event == event.on_cancel_ack:
-            return Cancelled()
-        return self
-
-
-class Cancelled(State):
-    def on_event(self, event):
-        if event == event.on_creation:
-            return InsertPending()
-        return self
-
-
-class InsertFailed(State):
-    def on_event(self, event):
-        return self
-
-
-class Fill(State):
-    def on_event(self, event):
-        if event == event.on_full_fill:
-            return FullFill()
-        elif event == event.on_cancel:
-            return CancelPending()
-        elif event == event.on_amend:
-            return AmendPending()
-        elif event == event.on_cancel:
-            return CancelPending()
-        elif event == event.on_cancel_ack:
-            return Cancelled()
-        return self
-
-
-class FullFill(State):
-    def on_event(self, event):
-        if event == event.on_cancel:
-            return CancelPending()
-        elif event == event.on_fill:
-            return Fill()
-        elif event == event.on_amend_partial_ack:
-            return Fill()
-        elif event == event.on_creation:
-            return InsertPending()
-        return self
-
-
-class CancelPending(State):
-    def on_event(self, event):
-        if event == event.on_fill:
-            return Fill()
-        elif event == event.on_cancel_ack:
-            return Cancelled()
-        elif event == event.on_cancel_rejection:
-            return CancelFailed()
-        return self
-
-
-class CancelFailed(State):
-    def on_event(self, event):
-        if event == event.on_fill:
-            return Fill()
-        elif event == event.on_full_fill:
-            return FullFill()
-        return self
+        return self.name
+
+
+TRANSITIONS = {
+    State.Inactive: {
+        Event.on_creation: State.InsertPending,
+    },
+    State.InsertPending: {
+        Event.on_insert_rejection: State.InsertFailed,
+        Event.on_cancel: State.CancelPending,
+        Event.on_insert_ack: State.Active,
+        Event.on_cancel_ack: State.Cancelled,
+        Event.on_fill: State.Fill,
+        Event.on_full_fill: State.FullFill,
+    },
+    State.Active: {
+        Event.on_fill: State.Fill,
+        Event.on_insert_rejection: State.InsertFailed,
+        Event.on_cancel: State.CancelPending,
+        Event.on_amend: State.AmendPending,
+        Event.on_full_fill: State.FullFill,
+        Event.on_amend_rejection: State.Inactive,
+    },
+    State.AmendPending: {
+        Event.on_cancel: State.CancelPending,
+        Event.on_amend_ack: State.Active,
+        Event.on_amend_partial_ack: State.Active,
+        Event.on_amend_rejection: State.Inactive,
+        Event.on_fill: State.Fill,
+        Event.on_full_fill: State.FullFill,
+        Event.on_cancel_ack: State.Cancelled,
+    },
+    State.Cancelled: {
+        Event.on_creation: State.InsertPending,
+    },
+    State.InsertFailed: {},
+    State.Fill: {
+        Event.on_fill: State.Fill,
+        Event.on_full_fill: State.FullFill,
+        Event.on_cancel: State.CancelPending,
+        Event.on_amend: State.AmendPending,
+        Event.on_cancel_ack: State.Cancelled,
+    },
+    State.FullFill: {
+        Event.on_cancel: State.CancelPending,
+        Event.on_fill: State.Fill,
+        Event.on_amend_partial_ack: State.Fill,
+        Event.on_creation: State.InsertPending,
+    },
+    State.CancelPending: {
+        Event.on_fill: State.Fill,
+        Event.on_cancel_ack: State.Cancelled,
+        Event.on_cancel_rejection: State.CancelFailed,
+    },
+    State.CancelFailed: {
+        Event.on_fill: State.Fill,
+        Event.on_full_fill: State.FullFill,
+    },
+}
+
+
+def compile_transitions(transitions):
+    # table[state][event] is the next state or None for an illegal transition
+    table = [[None] * (max(Event) + 1) for _ in range(max(State) + 1)]
+    for state, state_transitions in transitions.items():
+        for event, next_state in state_transitions.items():
+            table[state][event] = next_state
+    return tuple(tuple(row) for row in table)
+
+
+TRANSITION_TABLE = compile_transitions(TRANSITIONS)
 
 
 class OrderState:
+    __slots__ = ('order_id', 'state', 'last_update_timestamp')
+
     def __init__(self):
         self.order_id = None
-        self.state = Inactive()
+        self.state = State.Inactive
         self.last_update_timestamp = None
 
     def on_event(self, event):
-        self.state = self.state.on_event(event)
-        self.last_update_timestamp = time.time()
+        # returns False if the event is not expected in the current state, the state is kept
+        next_state = TRANSITION_TABLE[self.state][event]
+        if next_state is None:
+            return False
+        self.state = next_state
+        self.last_update_timestamp = time.monotonic_ns()
+        return True
@@ -1,17 +1,11 @@
+import time
 import uuid
+import collections
 
 from .order_state import (
     Event,
-    Active,
-    Fill,
-    FullFill,
-    Cancelled,
-    Inactive,
-    InsertPending,
-    AmendPending,
-    CancelPending,
+    State,
     OrderState,
-    CancelFailed,
 )
 
 from .definitions import (
@@ -29,6 +23,8 @@ from .definitions import (
     AmendAcknowledgementPartial
 )
 
+from .live_orders import LiveOrders
+from .quote_differ import QuoteDiffer
 from .logger import logging
 
 
@@ -45,8 +41,32 @@ class OrdersManager:
     PRICE_DIFF = 10e-5
     ORDERS_QTY_DIFF = 10e-10
 
-    def __init__(self, exchange_adapter):
+    NOT_READY_FOR_AMEND_STATES = frozenset((
+        State.Inactive,
+        State.InsertPending,
+        State.AmendPending,
+        State.CancelFailed,
+        State.CancelPending,
+    ))
+    ACTIVE_STATES = frozenset((State.Active, State.Fill))
+    # orders with an in-flight request, new targets are held until it is acked
+    PENDING_STATES = frozenset((State.InsertPending, State.AmendPending))
+    TERMINAL_STATES = frozenset((State.Cancelled, State.FullFill, State.InsertFailed))
+
+    ARCHIVE_SIZE = 1000
+    MAX_CANCELS_ON_FILL = 1000
+
+    def __init__(self, exchange_adapter, instrument_name=None, request_costs=None):
         self.exchange_adapter = exchange_adapter
+        # cancel all is limited to the instrument if the adapter is shared
+        self.instrument_name = instrument_name
+
+        # re-quotes send only the difference between the desired and the live ladder
+        request_costs = request_costs or {}
+        self.quote_differ = QuoteDiffer(request_costs.get('create', 1),
+                                        request_costs.get('amend', 1),
+                                        request_costs.get('cancel', 1))
+        self.requote_stats = collections.Counter()
 
         try:
             self.exchange_name = self.exchange_adapter.config.name
@@ -54,10 +74,19 @@ class OrdersManager:
             self.exchange_name = ''
 
         self.orders = {}
-        self.live_orders_ids = []
+        self.live_orders = LiveOrders()
         self.orders_states = {}
         self.order_id_to_order_id_map = {}
-        self.ids_to_cancel_on_fill = []
+        # orders cancelled by the bot itself, their eliminations are expected.
+        # Used as an ordered set, so the oldest ids can be dropped
+        self.ids_to_cancel_on_fill = {}
+        self.illegal_transitions = collections.Counter()
+
+        # order id -> the newest desired order, None for a cancel, sent once the order is acked
+        self.intents = {}
+
+        # final states of retired orders: (order_id, state, last_update_timestamp, order)
+        self.archive = collections.deque(maxlen=self.ARCHIVE_SIZE)
 
         self.update_type_to_state = {
             NewOrderAcknowledgement: Event.on_insert_ack,
@@ -76,10 +105,11 @@ class OrdersManager:
     def reset(self):
         self.logger.info(f'{self.exchange_name} orders manager will be reset')
         self.orders = {}
-        self.live_orders_ids = []
+        self.live_orders.clear()
         self.orders_states = {}
         self.order_id_to_order_id_map = {}
-        self.ids_to_cancel_on_fill = []
+        self.ids_to_cancel_on_fill = {}
+        self.intents = {}
 
     async def place_order(self, order):
         if not order.order_id:
@@ -96,7 +126,7 @@ class OrdersManager:
         if res.success is False:
             self.logger.error(f'Order placement failed, {res.msg}')
             raise Exception(f'Orders placement failed, err {res.msg}')
-        self.live_orders_ids.append(order.order_id)
+        self.add_live_order(order)
 
     async def place_orders(self, orders):
         if len(orders) == 0:
@@ -109,8 +139,8 @@ class OrdersManager:
 
         for elem in orders:
             self.orders[elem.order_id] = elem
-            self.live_orders_ids.append(elem.order_id)
             self.update_order_state(elem.order_id, Event.on_creation)
+            self.add_live_order(elem)
 
         try:
             res = await self.exchange_adapter.send_orders(orders)
@@ -137,57 +167,55 @@ class OrdersManager:
         if res.success is False:
             self.logger.error(f'Order amend failed, msg={res.msg}')
             raise Exception(f'Orders amend failed, msg={res.msg}')
-        self.live_orders_ids.remove(existing.order_id)
-        self.live_orders_ids.append(new.order_id)
+        self.live_orders.remove(existing.order_id)
+        self.add_live_order(new)
+        # the new order id replaces the existing one
+        self.archive_order(existing.order_id)
 
     async def amend_active_orders(self, new_orders):
-        try:
-            existing_orders = [self.orders[oid] for oid in self.live_orders_ids]
-        except KeyError as err:
-            raise Exception(f'Failed to grad existing orders {err}')
-        await self.amend_orders(new_orders, existing_orders)
+        await self.amend_orders(new_orders, self.live_orders.get_sorted())
 
-    async def _amend_orders(self, new_orders, existing_orders):
-        if len(new_orders) == 0:
+    async def _amend_orders(self, pairs):
+        if len(pairs) == 0:
             self.logger.debug('No need to send a bulk amend, no orders to be amended')
             return
 
-        new_orders = sort_orders(new_orders)
-        existing_orders = sort_orders(existing_orders)
-        if len([i for i, k in zip(new_orders, existing_orders) if i.side != k.side]) > 0:
+        if any(new.side != existing.side for new, existing in pairs):
             self.logger.error('Invalid orders for the amend')
             raise Exception('Invalid orders for the amend')
-        elif len(new_orders) != len(existing_orders):
-            self.logger.error('Invalid orders for the amend; not matching sizes')
-            raise Exception('Invalid orders for the amend; not matching sizes')
-        for i in range(1, len(new_orders)):
-            if new_orders[i].side is OrderSide.buy and new_orders[i - 1].side is OrderSide.sell:
+
+        # bids go first, unless a bid moves above a resting ask, then the asks make room
+        pairs = sorted(pairs, key=lambda pair: pair[0].price)
+        for i in range(1, len(pairs)):
+            if pairs[i][0].side is OrderSide.buy and pairs[i - 1][0].side is OrderSide.sell:
                 raise Exception('Self crossing orders detected')
 
         try:
-            new_bid = [order.price for order in new_orders if order.side is OrderSide.buy][-1]
+            new_bid = [new.price for new, _ in pairs if new.side is OrderSide.buy][-1]
             existing_ask = \
-                [order.price for order in existing_orders if order.side is OrderSide.sell][0]
+                [existing.price for _, existing in pairs if existing.side is OrderSide.sell][0]
             if new_bid > existing_ask:
-                new_orders.reverse()
-                existing_orders.reverse()
+                pairs.reverse()
         except IndexError:
             pass
 
-        for new, existing in zip(new_orders, existing_orders):
+        new_orders = [new for new, _ in pairs]
+        existing_orders = [existing for _, existing in pairs]
+        for new, existing in pairs:
             new.order_id = existing.order_id
             self.orders[new.order_id] = new
 
-            try:
-                res = await self.exchange_adapter.amend_orders(new_orders, existing_orders)
-            except Exception as err:
-                self.logger.error(f'Orders amend failed, err {err}')
-                raise
+        try:
+            res = await self.exchange_adapter.amend_orders(new_orders, existing_orders)
+        except Exception as err:
+            self.logger.error(f'Orders amend failed, err {err}')
+            raise
 
-        for order in existing_orders: self.live_orders_ids.remove(order.order_id)
+        for order in existing_orders:
+            self.live_orders.remove(order.order_id)
         for order in new_orders:
-            self.live_orders_ids.append(order.order_id)
             self.orders[order.order_id] = order
+            self.add_live_order(order)
             self.update_order_state(order.order_id, Event.on_amend)
 
     async def amend_orders(self, new_orders, existing_orders):
@@ -196,57 +224,120 @@ class OrdersManager:
                 # note that order_id can be regenerated later in the method
                 elem.order_id = generate_id()
 
-        new_orders = sort_orders(new_orders)
-        existing_orders = sort_orders(existing_orders)
-
-        pairs_to_amend = {}
-        orders_to_place = []
+        live = []
+        busy = []
+        pending_ids = set()
         orders_ids_to_cancel = []
-
-        if len(existing_orders) == 0:
-            orders_to_place = new_orders
-
-        for new, existing in zip(new_orders, existing_orders):
-            if new.side != existing.side:
-                self.logger.warning(f'Order sides are not the same. Order id {existing.order_id}')
-
+        for existing in existing_orders:
             existing_state = None
             try:
                 existing_state = self.orders_states[existing.order_id].state
             except KeyError:
-                self.logger.debug(f'Order status was not found. Order id {existing.order_id}')
+                self.logger.debug('Order status was not found. Order id %s', existing.order_id)
 
-            if isinstance(existing_state, Fill):
-                self.ids_to_cancel_on_fill.append(existing.order_id)
-                orders_to_place.append(new)
+            if existing_state is State.Fill:
+                # partially filled orders are replaced
+                self.add_cancel_on_fill(existing.order_id)
                 orders_ids_to_cancel.append(existing.order_id)
-            elif isinstance(existing_state, Cancelled) or isinstance(existing_state, FullFill):
-                self.live_orders_ids.remove(existing.order_id)
-                orders_to_place.append(new)
-            elif isinstance(existing_state, Cancelled) or isinstance(existing_state, FullFill):
-                self.live_orders_ids.remove(existing.order_id)
-                orders_to_place.append(new)
-            elif isinstance(existing_state, Active):
-                if abs(new.quantity - existing.quantity) < self.ORDERS_QTY_DIFF and \
-                        abs(new.price - existing.price) < self.ORDERS_QTY_DIFF:
-                    self.logger.debug(f'Order {new.order_id} will be ignored, no need to amend')
-                    self.live_orders_ids = [oid for oid in self.live_orders_ids if
-                                            oid != existing.order_id]
-
-                    new.order_id = existing.order_id
-                    self.live_orders_ids.append(new.order_id)
-                    self.orders[new.order_id] = new
-                else:
-                    pairs_to_amend[new] = existing
+            elif existing_state is State.Cancelled or existing_state is State.FullFill:
+                self.live_orders.remove(existing.order_id)
+                self.retire_order(existing.order_id)
+            elif existing_state is State.Active:
+                live.append(existing)
+            elif existing_state in self.PENDING_STATES:
+                # it is diffed at its in-flight target, a change is held until the ack
+                live.append(existing)
+                pending_ids.add(existing.order_id)
+            else:
+                busy.append(existing)
+
+        diff = self.quote_differ.diff(new_orders, live, busy)
+        self.logger.debug('Quote diff %s', diff)
+        if pending_ids:
+            self.hold_intents(diff, pending_ids)
+        self.requote_stats['kept'] += len(diff.keep)
+        self.requote_stats['amended'] += len(diff.amend)
+        self.requote_stats['placed'] += len(diff.place)
+        self.requote_stats['cancelled'] += len(orders_ids_to_cancel) + len(diff.cancel)
+        self.requote_stats['cost'] += diff.get_cost(self.quote_differ) + \
+            len(orders_ids_to_cancel) * self.quote_differ.cancel_cost
+
+        for new, existing in diff.keep:
+            if existing.order_id in pending_ids:
+                continue
+            new.order_id = existing.order_id
+            self.orders[new.order_id] = new
+            self.add_live_order(new)
+        for order in diff.cancel:
+            self.add_cancel_on_fill(order.order_id)
+            orders_ids_to_cancel.append(order.order_id)
 
         try:
             await self.cancel_orders(orders_ids_to_cancel)
-            await self.place_orders(orders_to_place)
-            await self._amend_orders(list(pairs_to_amend.keys()), list(pairs_to_amend.values()))
+            await self._amend_orders(diff.amend)
+            await self.place_orders(diff.place)
         except Exception as err:
             self.logger.error(f'Amend logic failed {err}')
             raise
 
+    def hold_intents(self, diff, pending_ids):
+        # requests for orders with an in-flight one are taken out of the diff, the newest
+        # target replaces the held one. A pending order which is kept needs nothing anymore
+        for new, existing in diff.keep:
+            if existing.order_id in pending_ids:
+                self.intents.pop(existing.order_id, None)
+
+        amend = []
+        for new, existing in diff.amend:
+            if existing.order_id in pending_ids:
+                self.intents[existing.order_id] = new
+                self.requote_stats['held'] += 1
+            else:
+                amend.append((new, existing))
+        diff.amend = amend
+
+        cancel = []
+        for existing in diff.cancel:
+            if existing.order_id in pending_ids:
+                self.intents[existing.order_id] = None
+                self.requote_stats['held'] += 1
+            else:
+                cancel.append(existing)
+        diff.cancel = cancel
+
+    def has_intent(self, order_id):
+        return order_id in self.intents
+
+    async def send_intent(self, order_id):
+        # the held target goes out once the in-flight request of the order is acked
+        try:
+            state = self.orders_states[order_id].state
+        except KeyError:
+            self.intents.pop(order_id, None)
+            return
+
+        if state in self.PENDING_STATES:
+            return
+        new = self.intents.pop(order_id)
+        existing = self.live_orders.get(order_id)
+        if state is not State.Active or existing is None:
+            # filled or gone, the next re-quote takes care of the level
+            return
+
+        self.requote_stats['intents_sent'] += 1
+        if new is None:
+            self.add_cancel_on_fill(order_id)
+            await self.cancel_orders([order_id])
+        elif abs(new.quantity - existing.quantity) >= self.ORDERS_QTY_DIFF or \
+                abs(new.price - existing.price) >= self.ORDERS_QTY_DIFF:
+            await self._amend_orders([(new, existing)])
+
+    def get_stuck_orders(self, timeout_secs):
+        # orders whose request was not acked within timeout_secs
+        deadline = time.monotonic_ns() - int(timeout_secs * 1e9)
+        return [order_id for order_id in self.live_orders.ids_in_states(self.PENDING_STATES)
+                if self.orders_states[order_id].last_update_timestamp < deadline]
+
     async def cancel_order(self, order_id):
         self.update_order_state(order_id, Event.on_cancel)
 
@@ -258,16 +349,13 @@ class OrdersManager:
         if res.success is False:
             self.logger.error(f'Orders cancellation failed, msg={res.msg}')
             raise Exception(f'Orders cancellation failed, msg={res.msg}')
-        try:
-            self.live_orders_ids.remove(order_id)
-        except ValueError:
-            pass
-        self.logger.debug(f'Order was cancelled. Order id = {order_id}')
+        self.live_orders.discard(order_id)
+        self.logger.debug('Order was cancelled. Order id = %s', order_id)
 
     async def cancel_orders(self, order_ids):
         try:
             order_ids = [oid for oid in order_ids if
-                         isinstance(self.orders_states[oid], FullFill) is False]
+                         self.orders_states[oid].state is not State.FullFill]
         except KeyError as err:
             self.logger.error(f'Failed to find an order for the cancellation {err}')
             return
@@ -275,31 +363,80 @@ class OrdersManager:
         if len(order_ids) == 0:
             return
 
-        self.live_orders_ids = [oid for oid in self.live_orders_ids if oid not in order_ids]
         for oid in order_ids:
-            try:
-                res = await self.cancel_order(oid)
-            except Exception as err:
-                self.logger.error(f'Order cancellation failed. {err}')
-                raise
+            self.update_order_state(oid, Event.on_cancel)
+            self.live_orders.discard(oid)
+
+        try:
+            res = await self.exchange_adapter.cancel_orders(order_ids)
+        except Exception as err:
+            self.logger.error(f'Bulk orders cancellation failed. {err}')
+            raise
+        if res.success is False:
+            self.logger.error(f'Bulk orders cancellation failed, msg={res.msg}')
+            raise Exception(f'Bulk orders cancellation failed, msg={res.msg}')
+        self.logger.debug('Orders were cancelled. Order ids = %s', order_ids)
 
     async def cancel_active_orders(self):
         try:
-            res = await self.exchange_adapter.cancel_active_orders()
+            res = await self.exchange_adapter.cancel_active_orders(self.instrument_name)
         except Exception as err:
             self.logger.error(f'Orders active orders cancellation failed. {err}')
             raise
 
     def is_ready_for_amend(self, order_id):
-        return not isinstance(self.orders_states[order_id].state,
-                              (
-                                  Inactive,
-                                  InsertPending,
-                                  AmendPending,
-                                  CancelFailed,
-                                  CancelPending
-                              )
-                              )
+        return self.orders_states[order_id].state not in self.NOT_READY_FOR_AMEND_STATES
+
+    def add_cancel_on_fill(self, order_id):
+        self.ids_to_cancel_on_fill[order_id] = True
+        if len(self.ids_to_cancel_on_fill) > self.MAX_CANCELS_ON_FILL:
+            oldest_id = next(iter(self.ids_to_cancel_on_fill))
+            del self.ids_to_cancel_on_fill[oldest_id]
+
+    def remove_cancel_on_fill(self, order_id):
+        # returns True if the elimination of the order was requested by the bot
+        return self.ids_to_cancel_on_fill.pop(order_id, None) is not None
+
+    def archive_order(self, order_id):
+        order_state = self.orders_states.pop(order_id, None)
+        order = self.orders.pop(order_id, None)
+        self.order_id_to_order_id_map.pop(order_id, None)
+        self.intents.pop(order_id, None)
+        if order_state is not None:
+            self.archive.append(
+                (order_id, order_state.state, order_state.last_update_timestamp, order))
+
+    def retire_order(self, order_id):
+        # terminal orders which are not live anymore are moved to the archive
+        try:
+            state = self.orders_states[order_id].state
+        except KeyError:
+            return False
+
+        if state not in self.TERMINAL_STATES or order_id in self.live_orders or \
+                order_id in self.ids_to_cancel_on_fill:
+            return False
+
+        self.archive_order(order_id)
+        return True
+
+    def get_memory_gauges(self):
+        return {
+            'orders': len(self.orders),
+            'orders_states': len(self.orders_states),
+            'live_orders': len(self.live_orders),
+            'ids_to_cancel_on_fill': len(self.ids_to_cancel_on_fill),
+            'order_id_to_order_id_map': len(self.order_id_to_order_id_map),
+            'intents': len(self.intents),
+            'archive': len(self.archive),
+        }
+
+    def add_live_order(self, order):
+        try:
+            state = self.orders_states[order.order_id].state
+        except KeyError:
+            state = State.Inactive
+        self.live_orders.add(order, state)
 
     def update_order_state(self, order_id, upd_event):
         if isinstance(upd_event, Event) is False:
@@ -326,13 +463,23 @@ class OrdersManager:
                         f' Recorded order {_order}, full_fill {upd_event}')
                     _upd_event = Event.on_fill
 
+        prev_state = curr_state.state
         try:
-            curr_state.on_event(_upd_event)
+            changed = curr_state.on_event(_upd_event)
         except Exception as err:
             self.logger.exception(f'{self.exchange_name} Invalid state. Order id = {order_id}')
             raise Exception(
                 f'{self.exchange_name}. Invalid state. Order id = {order_id}. Reason = {err}')
 
+        if changed is True:
+            self.live_orders.update_state(order_id, curr_state.state)
+            if curr_state.state in self.TERMINAL_STATES:
+                self.retire_order(order_id)
+        else:
+            self.illegal_transitions[(prev_state, _upd_event)] += 1
+            self.logger.debug('%s Illegal transition %s on %s. Order id = %s',
+                              self.exchange_name, prev_state, _upd_event.name, order_id)
+
     def activate_orders(self, orders_msg):
         self.logger.info(f'activate_orders started, orders_msg: {orders_msg}')
 
@@ -352,15 +499,12 @@ class OrdersManager:
 
         for elem, exchange_elem in zip(orders, exchange_orders_):
             elem.order_id = generate_id()
-            self.exchange_adapter.storage.uid_to_eid[
-                elem.order_id] = exchange_elem.exchange_order_id
-            self.exchange_adapter.storage.eid_to_uid[
-                exchange_elem.exchange_order_id] = elem.order_id
+            self.exchange_adapter.storage.map_ids(elem.order_id, exchange_elem.exchange_order_id)
 
             self.orders[elem.order_id] = elem
-            self.live_orders_ids.append(elem.order_id)
 
             self.update_order_state(elem.order_id, Event.on_creation)
+            self.add_live_order(elem)
             self.update_order_state(elem.order_id, Event.on_insert_ack)
             self.update_order_state(elem.order_id, Event.on_amend)
             self.update_order_state(elem.order_id, Event.on_amend_ack)
@@ -379,21 +523,26 @@ class OrdersManager:
         return orders
 
     def active_orders_ids(self):
-        return [oid for oid in self.live_orders_ids if
-                isinstance(self.orders_states[oid].state, Active) or isinstance(
-                    self.orders_states[oid].state, Fill)]
+        return self.live_orders.ids_in_states(self.ACTIVE_STATES)
+
+    def get_requote_stats(self):
+        return dict(self.requote_stats)
+
+    def get_illegal_transitions(self):
+        return {f'{state}:{event.name}': count
+                for (state, event), count in self.illegal_transitions.items()}
 
     def get_number_of_active_orders(self):
-        return len(self.active_orders_ids())
+        return self.live_orders.count(self.ACTIVE_STATES)
 
     def get_exch_order_id(self, client_order_id):
         return self.exchange_adapter.get_exch_order_id(client_order_id)
 
     def get_number_of_ready_for_amend(self):
-        return len([oid for oid in self.live_orders_ids if self.is_ready_for_amend(oid) is True])
+        return len(self.live_orders) - self.live_orders.count(self.NOT_READY_FOR_AMEND_STATES)
 
     def get_live_orders(self):
-        return [self.orders[oid] for oid in self.live_orders_ids]
+        return self.live_orders.get_orders()
 
     def connect_orders(self, order_id1, order_id2):
         self.order_id_to_order_id_map[order_id1] = order_id2
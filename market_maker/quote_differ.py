@@ -0,0 +1,96 @@
+from .definitions import OrderSide
+
+
+class QuoteDiff:
+    __slots__ = ('keep', 'amend', 'place', 'cancel')
+
+    def __init__(self):
+        # keep: (new, existing) pairs which need no request
+        # amend: (new, existing) pairs, cancel: existing orders
+        self.keep = []
+        self.amend = []
+        self.place = []
+        self.cancel = []
+
+    def get_cost(self, differ):
+        return len(self.amend) * differ.amend_cost + len(self.place) * differ.create_cost + \
+            len(self.cancel) * differ.cancel_cost
+
+    def __repr__(self):
+        return f'QuoteDiff(keep={len(self.keep)}, amend={len(self.amend)}, ' \
+               f'place={len(self.place)}, cancel={len(self.cancel)})'
+
+
+class QuoteDiffer:
+    # the cheapest set of requests turning the live ladder into the desired one, side by side.
+    # Levels which did not move are kept, so a ladder shifted by a tick costs the levels that
+    # appeared and disappeared at its ends rather than an amend per level
+    PRICE_DIFF = 10e-5
+    QTY_DIFF = 10e-10
+
+    def __init__(self, create_cost=1, amend_cost=1, cancel_cost=1):
+        # cost of one order in a request, in units of the venue rate limit
+        self.create_cost = create_cost
+        self.amend_cost = amend_cost
+        self.cancel_cost = cancel_cost
+
+    def diff(self, desired, live, busy=()):
+        # busy orders can not be touched, an in-flight request is waiting for its ack. They
+        # hold the level they are matched to, nothing is sent for it
+        res = QuoteDiff()
+        for side in OrderSide:
+            self.diff_side(res,
+                           sorted((o for o in desired if o.side is side), key=get_price),
+                           sorted((o for o in live if o.side is side), key=get_price),
+                           [o for o in busy if o.side is side])
+        return res
+
+    def diff_side(self, res, desired, live, busy):
+        busy_ids = {order.order_id for order in busy}
+        desired, live = self.match_prices(res, desired, sorted(live + busy, key=get_price),
+                                          busy_ids)
+
+        # the levels left are paired in price order
+        for new, existing in zip(desired, live):
+            if existing.order_id not in busy_ids:
+                self.move(res, new, existing)
+        res.place.extend(desired[len(live):])
+        res.cancel.extend(order for order in live[len(desired):]
+                          if order.order_id not in busy_ids)
+
+    def match_prices(self, res, desired, live, busy_ids):
+        # orders resting at a desired price are kept, or their size is changed.
+        # Returns the desired and live orders left without a match
+        desired_left = []
+        live_left = []
+        idx = 0
+        for new in desired:
+            while idx < len(live) and live[idx].price < new.price - self.PRICE_DIFF:
+                live_left.append(live[idx])
+                idx += 1
+            if idx == len(live) or abs(live[idx].price - new.price) >= self.PRICE_DIFF:
+                desired_left.append(new)
+                continue
+
+            existing = live[idx]
+            idx += 1
+            if existing.order_id in busy_ids:
+                continue
+            if abs(existing.quantity - new.quantity) < self.QTY_DIFF:
+                res.keep.append((new, existing))
+            else:
+                self.move(res, new, existing)
+        live_left.extend(live[idx:])
+        return desired_left, live_left
+
+    def move(self, res, new, existing):
+        # one amend, or a cancel and a new order if the venue charges more for the amend
+        if self.amend_cost > self.create_cost + self.cancel_cost:
+            res.cancel.append(existing)
+            res.place.append(new)
+        else:
+            res.amend.append((new, existing))
+
+
+def get_price(order):
+    return order.price
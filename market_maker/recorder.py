@@ -0,0 +1,51 @@
+import time
+
+from .logger import logging
+
+
+class FrameRecorder:
+    # append only file with one '<receive time, ns> <raw frame>' line per websocket frame. The
+    # receive time is the perf_counter_ns stamp of the socket reader, only differences matter
+    BUFFER_SIZE = 1 << 16
+    FLUSH_INTERVAL_SECS = 1.0
+
+    def __init__(self, path):
+        self.logger = logging.getLogger()
+
+        self.path = path
+        self.file = open(path, 'a', buffering=self.BUFFER_SIZE, encoding='utf-8')
+        self.frames = 0
+        self.last_flush_time = time.time()
+
+    def write(self, data, received_ns=None):
+        if received_ns is None:
+            received_ns = time.perf_counter_ns()
+
+        # json strings can not contain raw new lines, so the ones between tokens are safe to drop
+        if '\n' in data:
+            data = data.replace('\n', ' ')
+
+        self.file.write(f'{received_ns} {data}\n')
+        self.frames += 1
+
+        now = time.time()
+        if now - self.last_flush_time >= self.FLUSH_INTERVAL_SECS:
+            self.file.flush()
+            self.last_flush_time = now
+
+    def close(self):
+        # buffered frames are written out
+        try:
+            self.file.close()
+        except Exception as err:
+            self.logger.warning(f'Failed to close the recording {self.path}: {err}')
+
+
+def iter_frames(path):
+    with open(path, 'r', encoding='utf-8') as recording:
+        for line in recording:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            received_ns, data = line.split(' ', 1)
+            yield int(received_ns), data
@@ -0,0 +1,181 @@
+import time
+import json
+import asyncio
+import argparse
+import collections
+
+import yaml
+from munch import DefaultMunch
+
+from market_maker import codec
+from market_maker.recorder import iter_frames
+from market_maker.strategy.market_maker import MarketMaker
+from market_maker.gateways.gateway_interface import GatewayInterface
+from market_maker.gateways.emx.streaming import StreamingAdapter
+from market_maker.gateways.emx.shared_storage import SharedStorage
+from market_maker.definitions import (
+    ApiResult,
+    NewOrderAcknowledgement,
+    AmendAcknowledgement,
+    OrderEliminationAcknowledgement,
+)
+
+from market_maker.logger import logging
+
+
+class ReplayGateway(GatewayInterface):
+    # stands in for the exchange: requests are recorded and acknowledged after the strategy step
+
+    def __init__(self, config, auto_ack=True):
+        super().__init__()
+
+        self.config = config
+        self.auto_ack = auto_ack
+        self.storage = SharedStorage()
+        self.streaming = StreamingAdapter(self.config.streaming, None, self.storage,
+                                          self.tob_mailbox)
+        self.streaming.subscribed = True
+        self.streaming.orders_received = True
+
+        self.requests = collections.Counter()
+        self.pending_acks = []
+        self.reconnects = 0
+
+    def set_order_update_callback(self, msg_callback):
+        self.msg_callback = msg_callback
+
+    def update_post_only_flag(self, post_only_flag):
+        pass
+
+    def _request(self, action, ack_type=None, order_ids=()):
+        self.requests[action] += 1
+        if self.auto_ack and ack_type is not None:
+            for order_id in order_ids:
+                ack = ack_type()
+                ack.order_id = order_id
+                self.pending_acks.append(ack)
+
+        res = ApiResult()
+        res.success = True
+        return res
+
+    async def send_order(self, order):
+        return self._request('create-order', NewOrderAcknowledgement, [order.order_id])
+
+    async def send_orders(self, orders):
+        return self._request('create-order', NewOrderAcknowledgement,
+                             [order.order_id for order in orders])
+
+    async def amend_order(self, new, old):
+        return self._request('modify-order', AmendAcknowledgement, [new.order_id])
+
+    async def amend_orders(self, new, old):
+        return self._request('modify-order', AmendAcknowledgement,
+                             [order.order_id for order in new])
+
+    async def cancel_order(self, order_id):
+        return self._request('cancel-order', OrderEliminationAcknowledgement, [order_id])
+
+    async def cancel_orders(self, orders_ids):
+        return self._request('cancel-order', OrderEliminationAcknowledgement, orders_ids)
+
+    async def cancel_active_orders(self, contract_code=None):
+        return self._request('cancel-all-orders')
+
+    async def reconnect(self):
+        self.reconnects += 1
+
+    async def start(self):
+        pass
+
+    def is_ready(self):
+        return True
+
+
+class Replayer:
+    def __init__(self, cfg, path, speed=None, auto_ack=True):
+        self.logger = logging.getLogger()
+
+        self.path = path
+        # None replays as fast as possible, 1.0 at the recorded speed
+        self.speed = speed
+
+        self.gateway = ReplayGateway(cfg.adapter, auto_ack)
+        self.strategy = MarketMaker(cfg.strategy, self.gateway)
+        # there is nothing to wait for on start up
+        self.strategy.started_time = 0.0
+
+        self.frames = 0
+        self.errors = 0
+
+    async def _deliver(self, update):
+        try:
+            await self.gateway.msg_callback(update)
+        except Exception as err:
+            self.errors += 1
+            self.logger.info(f'Replayed update raised: {err}')
+
+    async def step(self, msg):
+        try:
+            await self.gateway.streaming.process(msg, self._deliver)
+        except Exception as err:
+            self.errors += 1
+            self.logger.info(f'Replayed frame raised: {err}')
+
+        await self.strategy.run()
+
+        while self.gateway.pending_acks:
+            acks, self.gateway.pending_acks = self.gateway.pending_acks, []
+            for ack in acks:
+                await self._deliver(ack)
+
+    async def run(self):
+        first_received_ns = None
+        started = time.monotonic()
+
+        for received_ns, data in iter_frames(self.path):
+            if first_received_ns is None:
+                first_received_ns = received_ns
+
+            if self.speed:
+                offset = (received_ns - first_received_ns) / 1e9 / self.speed
+                delay = offset - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            await self.step(codec.loads(data))
+            self.frames += 1
+
+        return self.get_stats(time.monotonic() - started)
+
+    def get_stats(self, duration):
+        return {
+            'frames': self.frames,
+            'duration_secs': duration,
+            'errors': self.errors,
+            'reconnects': self.gateway.reconnects,
+            'requests': dict(self.gateway.requests),
+            'ticks': self.gateway.tob_mailbox.get_stats(),
+            'illegal_transitions': self.strategy.orders_manager.get_illegal_transitions(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays a recorded EMX session into the strategy')
+    parser.add_argument('-config', help='a path to configuration file')
+    parser.add_argument('-recording', help='a path to the recorded frames')
+    parser.add_argument('-speed', type=float, default=None,
+                        help='replay speed, 1.0 is the recorded speed, '
+                             'as fast as possible if omitted')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as yaml_file:
+        cfg = DefaultMunch.fromDict(yaml.safe_load(yaml_file), None)
+
+    replayer = Replayer(cfg, args.recording, args.speed)
+    stats = asyncio.get_event_loop().run_until_complete(replayer.run())
+    print(json.dumps(stats, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import time
+import asyncio
+import collections
+
+from market_maker.logger import logging
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        # rate: orders per second, burst: max orders sent at once
+        self.rate = float(rate)
+        # a bucket holds at least one order, or a rate below one would never send
+        self.burst = max(1.0, float(burst or rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now):
+        self.refill(now)
+        return int(self.tokens)
+
+    def take(self, count):
+        self.tokens -= count
+
+    def get_delay(self, count, now):
+        # seconds until count tokens are there
+        self.refill(now)
+        return max(0.0, (min(count, self.burst) - self.tokens) / self.rate)
+
+
+class RequestScheduler:
+    # orders go out through a token bucket per action. Whatever the buckets do not let through
+    # is queued and sent in priority order, cancels first and new orders last. Queued orders are
+    # keyed, an amend of an order which is still queued replaces the queued one and a cancel
+    # drops it. New orders are keyed by client id, a cancel of one still queued drops it with
+    # drop(). Actions without a limit are only queued behind queued orders of a higher priority
+    PRIORITIES = ('cancel-order', 'modify-order', 'create-order')
+
+    def __init__(self, send, limits=None):
+        self.logger = logging.getLogger()
+
+        # send(action, bodies) is awaited for every request
+        self.send = send
+        self.buckets = {}
+        for action, limit in (limits or {}).items():
+            if action not in self.PRIORITIES:
+                raise Exception(f'Unknown rate limited action {action}. '
+                                f'Expected one of {self.PRIORITIES}')
+            self.buckets[action] = TokenBucket(limit['rate'], limit.get('burst'))
+
+        self.queues = {action: collections.OrderedDict() for action in self.PRIORITIES}
+        self.task = None
+        # an error of a queued request is raised on the next submit
+        self.error = None
+
+        self.stats = {key: collections.Counter()
+                      for key in ('sent', 'queued', 'coalesced', 'dropped')}
+
+    def reset(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        for queue in self.queues.values():
+            queue.clear()
+        self.error = None
+
+    def is_blocked(self, action):
+        # orders wait behind queued ones of the same or a higher priority
+        for queued_action in self.PRIORITIES:
+            if self.queues[queued_action]:
+                return True
+            if queued_action == action:
+                return False
+        return False
+
+    async def submit(self, action, keys, bodies):
+        # bodies is a list parallel to keys, or a single body with a single key
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+        if action == 'cancel-order':
+            for key in keys:
+                self.drop('modify-order', key)
+
+        bucket = self.buckets.get(action)
+        if not self.is_blocked(action) and \
+                (bucket is None or bucket.available(time.monotonic()) >= len(keys)):
+            if bucket is not None:
+                bucket.take(len(keys))
+            self.stats['sent'][action] += len(keys)
+            await self.send(action, bodies)
+            return
+
+        if not isinstance(bodies, list):
+            bodies = [bodies]
+        queue = self.queues[action]
+        for key, body in zip(keys, bodies):
+            if key in queue:
+                # the queued one keeps its place, only the newest body goes out
+                self.stats['coalesced'][action] += 1
+            else:
+                self.stats['queued'][action] += 1
+            queue[key] = body
+
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.drain())
+
+    async def drain(self):
+        try:
+            while True:
+                action = next((action for action in self.PRIORITIES if self.queues[action]),
+                              None)
+                if action is None:
+                    return
+
+                queue = self.queues[action]
+                bucket = self.buckets.get(action)
+                now = time.monotonic()
+                count = len(queue) if bucket is None else min(len(queue), bucket.available(now))
+                if count == 0:
+                    await asyncio.sleep(bucket.get_delay(1, now))
+                    continue
+
+                bodies = [queue.popitem(last=False)[1] for _ in range(count)]
+                if bucket is not None:
+                    bucket.take(count)
+                self.stats['sent'][action] += count
+                await self.send(action, bodies)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            self.logger.error(f'Queued requests were not sent: {err}')
+            self.error = err
+            for queue in self.queues.values():
+                queue.clear()
+        finally:
+            # a reset may have started another drain already
+            if self.task is asyncio.current_task():
+                self.task = None
+
+    def drop(self, action, key):
+        # returns True if the order was still queued, it is not sent then
+        if self.queues[action].pop(key, None) is None:
+            return False
+        self.stats['dropped'][action] += 1
+        return True
+
+    def get_queued(self):
+        return {action: len(queue) for action, queue in self.queues.items()}
+
+    def get_stats(self):
+        return {key: dict(counter) for key, counter in self.stats.items()}
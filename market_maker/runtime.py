@@ -0,0 +1,54 @@
+import asyncio
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from market_maker.logger import logging
+
+PRODUCTION = 'production'
+DIAGNOSTIC = 'diagnostic'
+PROFILES = (PRODUCTION, DIAGNOSTIC)
+
+SLOW_CALLBACK_DURATION_SECS = 0.05
+
+
+def new_event_loop(profile=PRODUCTION, use_uvloop=True,
+                   slow_callback_duration=SLOW_CALLBACK_DURATION_SECS):
+    # production: uvloop if it is installed, no debug checks
+    # diagnostic: the default loop in debug mode, slow callbacks and unawaited coroutines are logged
+    if profile not in PROFILES:
+        raise Exception(f'Unknown runtime profile {profile}. Expected one of {PROFILES}')
+
+    if profile == PRODUCTION and use_uvloop and uvloop is not None:
+        loop = uvloop.new_event_loop()
+    else:
+        loop = asyncio.new_event_loop()
+
+    if profile == DIAGNOSTIC:
+        loop.set_debug(enabled=True)
+        loop.slow_callback_duration = slow_callback_duration
+    else:
+        loop.set_debug(enabled=False)
+    return loop
+
+
+def setup_event_loop(cfg):
+    # has to run before the engine is created, asyncio primitives may bind to the current loop
+    runtime_cfg = cfg.runtime
+    profile = PRODUCTION
+    use_uvloop = True
+    slow_callback_duration = SLOW_CALLBACK_DURATION_SECS
+    if runtime_cfg is not None:
+        profile = runtime_cfg.profile or PRODUCTION
+        if runtime_cfg.uvloop is not None:
+            use_uvloop = runtime_cfg.uvloop
+        slow_callback_duration = runtime_cfg.slow_callback_duration or slow_callback_duration
+
+    loop = new_event_loop(profile, use_uvloop, slow_callback_duration)
+    asyncio.set_event_loop(loop)
+
+    logging.getLogger().info('Runtime profile %s, event loop %s, debug %s',
+                             profile, type(loop).__module__, loop.get_debug())
+    return loop
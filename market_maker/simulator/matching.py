@@ -0,0 +1,279 @@
+import bisect
+import itertools
+
+BUY = 'buy'
+SELL = 'sell'
+
+
+class SimOrder:
+    __slots__ = (
+        'order_id',
+        'client_id',
+        'contract_code',
+        'side',
+        'order_type',
+        'price',
+        'size',
+        'size_filled',
+        'notional_filled',
+        'fill_fees',
+        'post_only',
+        'status',
+        'message',
+        'sort_key',
+    )
+
+    def __init__(self, order_id, client_id, contract_code, side, order_type, size, price=None,
+                 post_only=False):
+        self.order_id = order_id
+        self.client_id = client_id
+        self.contract_code = contract_code
+        self.side = side
+        self.order_type = order_type
+        self.price = price
+        self.size = size
+        self.size_filled = 0.0
+        self.notional_filled = 0.0
+        self.fill_fees = 0.0
+        self.post_only = post_only
+        self.status = 'order-received'
+        self.message = None
+        self.sort_key = None
+
+    @property
+    def remaining(self):
+        return self.size - self.size_filled
+
+    @property
+    def average_fill_price(self):
+        if self.size_filled == 0:
+            return 0.0
+        return self.notional_filled / self.size_filled
+
+
+class Fill:
+    __slots__ = ('price', 'size', 'fee', 'fee_type', 'auction_code')
+
+    def __init__(self, price, size, fee, fee_type, auction_code):
+        self.price = price
+        self.size = size
+        self.fee = fee
+        self.fee_type = fee_type
+        self.auction_code = auction_code
+
+
+class Book:
+    # resting orders of one contract, each side is sorted by (price, time), the best one is first
+
+    def __init__(self):
+        self.sides = {BUY: [], SELL: []}
+        self.orders = {}
+        # the rest of the market, orders crossing it are filled against it
+        self.bid = None
+        self.bid_size = 0.0
+        self.ask = None
+        self.ask_size = 0.0
+
+    def add(self, order, seq):
+        price = -order.price if order.side == BUY else order.price
+        order.sort_key = (price, seq, order.order_id)
+        bisect.insort(self.sides[order.side], order.sort_key)
+        self.orders[order.order_id] = order
+
+    def remove(self, order):
+        side = self.sides[order.side]
+        del side[bisect.bisect_left(side, order.sort_key)]
+        del self.orders[order.order_id]
+        order.sort_key = None
+
+    def best(self, side):
+        keys = self.sides[side]
+        if not keys:
+            return None
+        return self.orders[keys[0][2]]
+
+
+def crosses(side, price, other_price):
+    # a market order (no price) crosses any price
+    if other_price is None:
+        return False
+    if price is None:
+        return True
+    if side == BUY:
+        return price >= other_price
+    return price <= other_price
+
+
+class MatchingEngine:
+    # price-time priority matching of simulated EMX orders, every call returns the order events
+    # as (action, order, fill) tuples in the order the exchange would publish them
+
+    def __init__(self, maker_fee=0.0, taker_fee=0.0):
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+
+        self.books = {}
+        self.orders = {}
+        self.positions = {}
+
+        self.order_ids = itertools.count(1)
+        self.sequence = itertools.count()
+        self.auctions = itertools.count(1)
+
+    def get_book(self, contract_code):
+        book = self.books.get(contract_code)
+        if book is None:
+            book = self.books[contract_code] = Book()
+            self.positions.setdefault(contract_code, 0.0)
+        return book
+
+    def get_open_orders(self, contract_code=None):
+        return [order for order in self.orders.values()
+                if contract_code is None or order.contract_code == contract_code]
+
+    def create(self, contract_code, client_id, side, order_type, size, price=None,
+               post_only=False):
+        order = SimOrder(f'sim-{next(self.order_ids)}', client_id, contract_code, side,
+                         order_type, size, price, post_only)
+        events = [('order-received', order, None)]
+
+        if side not in (BUY, SELL) or order_type not in ('limit', 'market') or size <= 0 or \
+                (order_type == 'limit' and price is None):
+            return order, events + self._reject(order, 'rejected', 'Invalid order')
+
+        book = self.get_book(contract_code)
+        if post_only and self._would_take(book, side, price):
+            return order, events + self._reject(order, 'rejected', 'Post only order would take')
+
+        order.status = 'accepted'
+        events.append(('accepted', order, None))
+        self._execute(book, order, events)
+        return order, events
+
+    def modify(self, order_id, size, price=None):
+        order = self.orders.get(order_id)
+        if order is None:
+            return self._reject(self._unknown(order_id), 'modify-rejected', 'Order not found')
+
+        events = [('modify-received', order, None)]
+        if size <= order.size_filled:
+            order.message = 'Size is below the filled size'
+            return events + [('modify-rejected', order, None)]
+
+        if price is None:
+            price = order.price
+
+        book = self.books[order.contract_code]
+        if order.post_only and self._would_take(book, order.side, price):
+            order.message = 'Post only order would take'
+            return events + [('modify-rejected', order, None)]
+
+        # a modified order loses its time priority
+        book.remove(order)
+        del self.orders[order_id]
+        order.price = price
+        order.size = size
+        events.append(('accepted', order, None))
+        self._execute(book, order, events)
+        return events
+
+    def cancel(self, order_id):
+        order = self.orders.get(order_id)
+        if order is None:
+            return self._reject(self._unknown(order_id), 'cancel-rejected', 'Order not found')
+
+        self.books[order.contract_code].remove(order)
+        del self.orders[order_id]
+        order.status = 'canceled'
+        return [('cancel-received', order, None), ('canceled', order, None)]
+
+    def cancel_all(self, contract_code=None):
+        events = []
+        for order in self.get_open_orders(contract_code):
+            events.extend(self.cancel(order.order_id))
+        return events
+
+    def set_quote(self, contract_code, bid, bid_size, ask, ask_size):
+        # resting orders the new quote moved through are filled by the rest of the market
+        book = self.get_book(contract_code)
+        book.bid, book.bid_size, book.ask, book.ask_size = bid, bid_size, ask, ask_size
+
+        events = []
+        for side, price, size in ((BUY, ask, ask_size), (SELL, bid, bid_size)):
+            while size > 0:
+                resting = book.best(side)
+                if resting is None or not crosses(side, resting.price, price):
+                    break
+                qty = min(size, resting.remaining)
+                size -= qty
+                self._fill(book, resting, resting.price, qty, True, next(self.auctions), events)
+        return events
+
+    def _would_take(self, book, side, price):
+        resting = book.best(SELL if side == BUY else BUY)
+        if resting is not None and crosses(side, price, resting.price):
+            return True
+        return crosses(side, price, book.ask if side == BUY else book.bid)
+
+    def _execute(self, book, order, events):
+        other_side = SELL if order.side == BUY else BUY
+
+        while order.remaining > 0:
+            resting = book.best(other_side)
+            if resting is None or not crosses(order.side, order.price, resting.price):
+                break
+            qty = min(order.remaining, resting.remaining)
+            auction = next(self.auctions)
+            self._fill(book, resting, resting.price, qty, True, auction, events)
+            self._fill(book, order, resting.price, qty, False, auction, events)
+
+        if order.side == BUY:
+            quote, quote_size = book.ask, book.ask_size
+        else:
+            quote, quote_size = book.bid, book.bid_size
+        if order.remaining > 0 and quote is not None and quote_size > 0 and \
+                crosses(order.side, order.price, quote):
+            qty = min(order.remaining, quote_size)
+            if order.side == BUY:
+                book.ask_size -= qty
+            else:
+                book.bid_size -= qty
+            self._fill(book, order, quote, qty, False, next(self.auctions), events)
+
+        if order.remaining <= 0:
+            return
+
+        if order.order_type == 'market':
+            order.status = 'canceled'
+            events.append(('canceled', order, None))
+            return
+
+        book.add(order, next(self.sequence))
+        self.orders[order.order_id] = order
+
+    def _fill(self, book, order, price, qty, is_maker, auction, events):
+        fee = price * qty * (self.maker_fee if is_maker else self.taker_fee)
+        order.size_filled += qty
+        order.notional_filled += price * qty
+        order.fill_fees += fee
+
+        sign = 1.0 if order.side == BUY else -1.0
+        self.positions[order.contract_code] += sign * qty
+
+        if order.remaining <= 0:
+            order.status = 'done'
+            if order.sort_key is not None:
+                book.remove(order)
+                del self.orders[order.order_id]
+
+        fill = Fill(price, qty, fee, 'maker' if is_maker else 'taker',
+                    f'{order.contract_code}-{auction}')
+        events.append(('filled', order, fill))
+
+    def _reject(self, order, action, message):
+        order.status = action
+        order.message = message
+        return [(action, order, None)]
+
+    def _unknown(self, order_id):
+        return SimOrder(order_id, None, None, None, None, 0.0)
@@ -0,0 +1,354 @@
+import time
+import json
+import asyncio
+import argparse
+import datetime
+import collections
+
+import aiohttp
+from aiohttp import web
+
+from market_maker import codec
+from market_maker.simulator.matching import MatchingEngine
+from market_maker.simulator.ticker import SyntheticTicker
+
+from market_maker.logger import logging
+
+
+def format_timestamp():
+    return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def format_size(size):
+    return f'{size:.4f}'
+
+
+def format_price(price):
+    return None if price is None else str(price)
+
+
+def order_data(order, fill=None):
+    data = {
+        'status': order.status,
+        'timestamp': format_timestamp(),
+        'contract_code': order.contract_code,
+        'client_id': order.client_id,
+        'order_id': order.order_id,
+        'order_type': order.order_type,
+        'side': order.side,
+        'size': format_size(order.size),
+        'size_filled': format_size(order.size_filled),
+        'fill_fees': str(order.fill_fees),
+        'price': format_price(order.price),
+        'stop_price': None,
+        'average_fill_price': str(order.average_fill_price),
+    }
+    if order.message is not None:
+        data['message'] = order.message
+    if fill is not None:
+        data['fill_price'] = str(fill.price)
+        data['size_filled_delta'] = format_size(fill.size)
+        data['fill_fees_delta'] = str(fill.fee)
+        data['fee_type'] = fill.fee_type
+        data['auction_code'] = fill.auction_code
+    return data
+
+
+class Connection:
+    def __init__(self, ws, latency):
+        self.ws = ws
+        self.channels = set()
+        self.contract_codes = set()
+        # requests wait here for the simulated latency, so they are handled in the sent order
+        self.requests = asyncio.Queue()
+        self.latency = latency
+
+    def is_subscribed(self, channel, contract_code=None):
+        if channel not in self.channels:
+            return False
+        return contract_code is None or not self.contract_codes or \
+            contract_code in self.contract_codes
+
+
+class EmxSimulator:
+    # a local stand-in for EMX: the websocket speaks the trading, orders, ticker and positions
+    # channels, GET /v1/orders returns the open orders
+    MAX_TICKS_PER_BATCH = 1000
+
+    def __init__(self, tickers=(), tick_rate=10.0, latency=0.0, maker_fee=0.0, taker_fee=0.0):
+        self.logger = logging.getLogger()
+
+        self.tickers = list(tickers)
+        self.tick_rate = tick_rate
+        self.latency = latency
+
+        self.engine = MatchingEngine(maker_fee, taker_fee)
+        for ticker in self.tickers:
+            self.engine.get_book(ticker.contract_code)
+        self.connections = set()
+
+        self.actions = {
+            'create-order': self.create_order,
+            'modify-order': self.modify_order,
+            'cancel-order': self.cancel_order,
+            'cancel-all-orders': self.cancel_all_orders,
+        }
+
+        self.requests = collections.Counter()
+        self.frames_sent = 0
+        self.ticks = 0
+
+        self.app = web.Application()
+        self.app.router.add_get('/', self.handle_ws)
+        self.app.router.add_get('/v1/orders', self.handle_orders)
+        self.runner = None
+        self.ticker_task = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+
+        if self.tickers and self.tick_rate:
+            self.ticker_task = asyncio.ensure_future(self.run_ticker())
+        self.logger.info(f'EMX simulator is listening on {host}:{port}')
+
+    async def stop(self):
+        if self.ticker_task is not None:
+            self.ticker_task.cancel()
+            self.ticker_task = None
+
+        for conn in list(self.connections):
+            await conn.ws.close()
+
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def get_stats(self):
+        return {
+            'ticks': self.ticks,
+            'frames_sent': self.frames_sent,
+            'requests': dict(self.requests),
+            'open_orders': len(self.engine.orders),
+            'positions': dict(self.engine.positions),
+        }
+
+    async def handle_orders(self, request):
+        contract_code = request.query.get('contract_code')
+        orders = [{
+            'order_id': order.order_id,
+            'contract_code': order.contract_code,
+            'side': order.side,
+            'type': order.order_type,
+            'size': format_size(order.remaining),
+            'price': format_price(order.price),
+        } for order in self.engine.get_open_orders(contract_code)]
+        return web.json_response({'orders': orders}, dumps=codec.dumps)
+
+    async def handle_ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        conn = Connection(ws, self.latency)
+        self.connections.add(conn)
+        worker = asyncio.ensure_future(self.process_requests(conn))
+
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.text:
+                    continue
+                try:
+                    data = codec.loads(msg.data)
+                except ValueError:
+                    self.logger.warning(f'Simulator was unable to load the msg {msg.data}')
+                    continue
+                await conn.requests.put((time.monotonic() + conn.latency, data))
+        finally:
+            worker.cancel()
+            self.connections.discard(conn)
+        return ws
+
+    async def process_requests(self, conn):
+        while True:
+            due, msg = await conn.requests.get()
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                await self.process_request(conn, msg)
+            except Exception as err:
+                self.logger.exception(f'Simulator failed to process {msg}: {err}')
+
+    async def process_request(self, conn, msg):
+        if msg.get('type') == 'subscribe':
+            await self.subscribe(conn, msg)
+            return
+
+        if msg.get('channel') != 'trading' or msg.get('type') != 'request':
+            self.logger.warning(f'Simulator got an unknown request {msg}')
+            return
+
+        action = msg.get('action')
+        process_action = self.actions.get(action)
+        if process_action is None:
+            self.logger.warning(f'Simulator got an unknown action {action}')
+            return
+        self.requests[action] += 1
+
+        data = msg.get('data')
+        events = []
+        for body in data if isinstance(data, list) else [data]:
+            events.extend(process_action(body))
+        await self.publish_events(events)
+
+    async def subscribe(self, conn, msg):
+        conn.channels.update(msg.get('channels', []))
+        conn.contract_codes.update(msg.get('contract_codes', []))
+        await self.send(conn, {'type': 'subscriptions', 'channels': sorted(conn.channels)})
+
+        if 'orders' in conn.channels:
+            orders = [order_data(order) for order in self.engine.get_open_orders()
+                      if conn.is_subscribed('orders', order.contract_code)]
+            await self.send(conn, {'channel': 'orders', 'type': 'snapshot', 'data': orders})
+
+        if 'positions' in conn.channels:
+            # flat positions are reported for every subscribed contract
+            contract_codes = conn.contract_codes.union(self.engine.positions)
+            positions = [{'contract_code': contract_code,
+                          'quantity': format_size(self.engine.positions.get(contract_code, 0.0))}
+                         for contract_code in sorted(contract_codes)
+                         if conn.is_subscribed('positions', contract_code)]
+            await self.send(conn, {'channel': 'positions', 'type': 'snapshot', 'data': positions})
+
+    def create_order(self, body):
+        price = body.get('price')
+        _, events = self.engine.create(body.get('contract_code'), body.get('client_id'),
+                                       body.get('side'), body.get('type'),
+                                       float(body.get('size', 0.0)),
+                                       None if price is None else float(price),
+                                       bool(body.get('post_only', False)))
+        return events
+
+    def modify_order(self, body):
+        price = body.get('price')
+        return self.engine.modify(body.get('order_id'), float(body.get('size', 0.0)),
+                                  None if price is None else float(price))
+
+    def cancel_order(self, body):
+        return self.engine.cancel(body.get('order_id'))
+
+    def cancel_all_orders(self, body):
+        return self.engine.cancel_all(body.get('contract_code'))
+
+    async def publish_events(self, events):
+        filled_contracts = set()
+        for action, order, fill in events:
+            await self.broadcast('orders', order.contract_code, {
+                'channel': 'orders',
+                'type': 'update',
+                'action': action,
+                'data': order_data(order, fill),
+            })
+            if fill is not None:
+                filled_contracts.add(order.contract_code)
+
+        for contract_code in filled_contracts:
+            await self.broadcast('positions', contract_code, {
+                'channel': 'positions',
+                'type': 'update',
+                'data': {
+                    'contract_code': contract_code,
+                    'quantity': format_size(self.engine.positions[contract_code]),
+                },
+            })
+
+    async def run_ticker(self):
+        started = time.monotonic()
+        interval = 1.0 / self.tick_rate
+
+        while True:
+            # at high rates sleep granularity is too coarse, so the ticks that are due are
+            # published in one batch
+            due = int((time.monotonic() - started) * self.tick_rate) - self.ticks
+            for _ in range(min(due, self.MAX_TICKS_PER_BATCH)):
+                await self.publish_tick()
+            await asyncio.sleep(interval)
+
+    async def publish_tick(self):
+        self.ticks += 1
+        for ticker in self.tickers:
+            bid, bid_size, ask, ask_size = ticker.next_quote()
+            events = self.engine.set_quote(ticker.contract_code, bid, bid_size, ask, ask_size)
+
+            timestamp = format_timestamp()
+            await self.broadcast('ticker', ticker.contract_code, {
+                'channel': 'ticker',
+                'type': 'update',
+                'data': {
+                    'contract_code': ticker.contract_code,
+                    'quote': {
+                        'bid': str(bid),
+                        'bid_size': format_size(bid_size),
+                        'ask': str(ask),
+                        'ask_size': format_size(ask_size),
+                        'timestamp': timestamp,
+                    },
+                    'mark_price': str((bid + ask) / 2),
+                },
+            })
+            await self.publish_events(events)
+
+    async def broadcast(self, channel, contract_code, msg):
+        data = None
+        for conn in list(self.connections):
+            if not conn.is_subscribed(channel, contract_code):
+                continue
+            if data is None:
+                data = codec.dumps(msg)
+            await self.send_str(conn, data)
+
+    async def send(self, conn, msg):
+        await self.send_str(conn, codec.dumps(msg))
+
+    async def send_str(self, conn, data):
+        try:
+            await conn.ws.send_str(data)
+        except Exception as err:
+            self.logger.info(f'Simulator failed to send a frame: {err}')
+            self.connections.discard(conn)
+            return
+        self.frames_sent += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local EMX exchange simulator')
+    parser.add_argument('-host', default='127.0.0.1')
+    parser.add_argument('-port', type=int, default=8080)
+    parser.add_argument('-contract', default='BTC-PERP', help='simulated contract code')
+    parser.add_argument('-price', type=float, default=4000.0, help='initial bid price')
+    parser.add_argument('-tick_size', type=float, default=0.5)
+    parser.add_argument('-tick_rate', type=float, default=10.0, help='ticker updates per second')
+    parser.add_argument('-latency', type=float, default=0.0,
+                        help='seconds every request is delayed by')
+    parser.add_argument('-seed', type=int, default=None)
+    args = parser.parse_args()
+
+    ticker = SyntheticTicker(args.contract, args.price, args.tick_size, seed=args.seed)
+    simulator = EmxSimulator([ticker], args.tick_rate, args.latency)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(simulator.start(args.host, args.port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(simulator.stop())
+        print(json.dumps(simulator.get_stats(), indent=4))
+
+
+if __name__ == '__main__':
+    main()
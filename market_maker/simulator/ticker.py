@@ -0,0 +1,25 @@
+import random
+
+
+class SyntheticTicker:
+    # random walk of the mid price in ticks, the spread is kept at spread_ticks
+    PRICE_DIGITS = 10
+
+    def __init__(self, contract_code, price, tick_size, spread_ticks=1, size=1.0,
+                 move_probability=0.5, seed=None):
+        self.contract_code = contract_code
+        self.tick_size = tick_size
+        self.spread_ticks = spread_ticks
+        self.size = size
+        self.move_probability = move_probability
+        self.random = random.Random(seed)
+
+        self.bid_ticks = int(round(price / tick_size))
+
+    def next_quote(self):
+        if self.random.random() < self.move_probability:
+            self.bid_ticks += 1 if self.random.random() < 0.5 else -1
+
+        bid = round(self.bid_ticks * self.tick_size, self.PRICE_DIGITS)
+        ask = round((self.bid_ticks + self.spread_ticks) * self.tick_size, self.PRICE_DIGITS)
+        return bid, self.size, ask, self.size
@@ -1,10 +1,12 @@
 import time
+import asyncio
 import decimal
 import traceback
 from enum import Enum
 
 from market_maker.strategy.strategy_interface import StrategyInterface
 from market_maker.orders_manager import OrdersManager
+from market_maker import latency
 
 from market_maker.logger import logging
 
@@ -29,6 +31,8 @@ class ActionType(Enum):
 class MarketMaker(StrategyInterface):
     TIME_TO_WAIT_SINCE_START_SECS = 10
     MAX_NUMBER_OF_ATTEMPTS_SECS = 10
+    MIN_REQUOTE_INTERVAL_SECS = 0.1
+    MAX_IDLE_SECS = 1.0
 
     def __init__(self, cfg, exchange_adapter):
         self.logger = logging.getLogger()
@@ -39,13 +43,23 @@ class MarketMaker(StrategyInterface):
         self.exchange_adapter = exchange_adapter
         self.exchange_adapter.set_order_update_callback(self.on_market_update)
         self.exchange_adapter.update_post_only_flag(self.send_post_only_orders)
-        self.orders_manager = OrdersManager(self.exchange_adapter)
+        self.orders_manager = OrdersManager(self.exchange_adapter, self.instrument_name,
+                                            cfg.request_costs)
+        self.exchange_adapter.add_reconnect_listener(self.on_reconnect)
 
         self.process_orders_on_start = False
         self.exchange_adapter.cancel_orders_on_start = True
 
         self.update_orders_flag = False
 
+        self.min_requote_interval = self.MIN_REQUOTE_INTERVAL_SECS
+        if cfg.min_requote_interval is not None:
+            self.min_requote_interval = cfg.min_requote_interval
+
+        # set by market data and order updates, awaited by the strategy loop
+        self.wakeup = asyncio.Event()
+        self.exchange_adapter.tob_mailbox.subscribe(self.instrument_name, self.wakeup)
+
         self.started_time = time.time()
         self.last_amend_time = None
         self.reconnecting = False
@@ -152,6 +166,18 @@ class MarketMaker(StrategyInterface):
         self.orders_manager.reset()
         await self.exchange_adapter.reconnect()
 
+    async def on_reconnect(self):
+        # the connection may be shared with other strategies, a reconnection started by
+        # any of them cancels the orders of all instruments
+        if self.reconnecting:
+            return
+
+        self.logger.warning(f'{self.instrument_name} orders are reset after a reconnection')
+        self.last_amend_time = None
+        self.num_of_sent_orders = 0
+        self.orders_manager.reset()
+        self.started_time = time.time()
+
     async def _cancel_orders(self):
         try:
             await self.orders_manager.cancel_active_orders()
@@ -172,12 +198,7 @@ class MarketMaker(StrategyInterface):
             self.logger.info('Strategy is not active, update will be ignored')
             return
         elif isinstance(update, TopOfBook):
-            if self.tob is None:
-                self.update_orders_flag = True
-                self.tob = update
-            elif self.tob_moved(update):
-                self.update_orders_flag = True
-                self.tob = update
+            self.process_tob(update)
             return
         elif isinstance(update, ExchangeOrders):
             await self.process_active_orders_on_start(update)
@@ -186,25 +207,54 @@ class MarketMaker(StrategyInterface):
             self.current_position = update.position
             return
         elif isinstance(update, (AmendRejection, NewOrderRejection)):
-            self.logger.info(f'Received order rejection {update.__dict__}')
-            raise Exception(f'Received order rejection {update.__dict__}')
+            self.logger.info('Received order rejection %s', update)
+            raise Exception(f'Received order rejection {update}')
         elif isinstance(update, OrderEliminationAcknowledgement):
-            if update.order_id in self.orders_manager.ids_to_cancel_on_fill:
-                return
-            else:
-                self.logger.info(f'Received order elimination {update.__dict__}')
-                raise Exception(f'Received order elimination {update.__dict__}')
+            if self.orders_manager.remove_cancel_on_fill(update.order_id) is False:
+                self.logger.info('Received order elimination %s', update)
+                raise Exception(f'Received order elimination {update}')
         try:
             self.orders_manager.update_order_state(update.order_id, update)
+            if self.orders_manager.has_intent(update.order_id):
+                await self.orders_manager.send_intent(update.order_id)
         except Exception as err:
             self.logger.error(f'update_order_state failed on {update}')
             raise Exception(f'on_market_update raised. update = {type(update)}, reason = {err}')
+        self.wakeup.set()
+
+    async def wait_for_update(self):
+        # wake up periodically anyway, start up delay and ack timeouts are time based
+        idle_handle = asyncio.get_event_loop().call_later(self.MAX_IDLE_SECS, self.wakeup.set)
+        await self.wakeup.wait()
+        idle_handle.cancel()
+        self.wakeup.clear()
+
+        if self.last_amend_time is not None:
+            delay = self.last_amend_time + self.min_requote_interval - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def process_tob(self, tob):
+        if self.tob is None:
+            self.update_orders_flag = True
+            self.tob = tob
+        elif self.tob_moved(tob):
+            self.update_orders_flag = True
+            self.tob = tob
+
+    def consume_market_data(self):
+        tob = self.exchange_adapter.tob_mailbox.take(self.instrument_name)
+        if tob is not None:
+            self.process_tob(tob)
 
     async def run(self):
         if self.active is False:
             self.logger.info('Strategy is not active, method run will be stopped')
             return
-        elif self.tob is None:
+
+        self.consume_market_data()
+
+        if self.tob is None:
             return
         elif self.update_orders_flag is False:
             return
@@ -220,13 +270,6 @@ class MarketMaker(StrategyInterface):
             return True
         return False
 
-    def _orders_are_ready_for_amend(self):
-        known_statuses = self.orders_manager.get_number_of_ready_for_amend()
-        if self.last_amend_time and len(self.orders_manager.live_orders_ids) > 0 and \
-                known_statuses != self.num_of_sent_orders:
-            return known_statuses
-        return True
-
     def generate_orders(self):
         best_ask, best_bid = self.tob.best_ask_price, self.tob.best_bid_price
         if self.mid_price_based_calculation:
@@ -299,25 +342,21 @@ class MarketMaker(StrategyInterface):
             self.logger.info('Ongoing reconnection, react_to_market_move will be stopped')
             return
 
-        self.logger.info('react_to_market_move started')
+        self.logger.debug('react_to_market_move started')
 
-        res = self._orders_are_ready_for_amend()
-        if res is not True:
+        # orders waiting for an ack hold their newest target, the other levels are re-quoted.
+        # An ack which does not come at all means the order state is lost
+        stuck_orders = self.orders_manager.get_stuck_orders(self.MAX_NUMBER_OF_ATTEMPTS_SECS)
+        if stuck_orders:
+            err_msg = (
+                f'Will be reconnected since {len(stuck_orders)} orders were not acked '
+                f'within {self.MAX_NUMBER_OF_ATTEMPTS_SECS} seconds'
+            )
 
-            self.logger.info('_orders_are_ready_for_amend returned False')
-
-            known_statuses = res
-            if self.last_amend_time + self.MAX_NUMBER_OF_ATTEMPTS_SECS < time.time():
-                err_msg = (
-                    f'Will be reconnected since only {known_statuses} '
-                    f'active orders were updated within {self.MAX_NUMBER_OF_ATTEMPTS_SECS} seconds'
-                )
-
-                res = await self.handle_exception(err_msg)
-                if res is False:
-                    self.logger.log('Error: %s', err_msg)
-                    raise Exception('handle_exception failed')
-                return
+            res = await self.handle_exception(err_msg)
+            if res is False:
+                self.logger.log('Error: %s', err_msg)
+                raise Exception('handle_exception failed')
             return
 
         orders = self.generate_orders()
@@ -327,6 +366,7 @@ class MarketMaker(StrategyInterface):
                 self.logger.warning('Failed to perform retreat adjustment')
                 return
 
+        latency.stats.mark_decision(self.tob.received_ns)
         try:
             await self.orders_manager.amend_active_orders(orders)
         except Exception as err:
@@ -335,6 +375,8 @@ class MarketMaker(StrategyInterface):
                 self.logger.exception('Exception')
                 raise Exception(f'Orders amend failed {err}')
             return
+        finally:
+            latency.stats.end_decision()
 
         self.last_amend_time = time.time()
         self.num_of_sent_orders = len(orders)
@@ -1,4 +1,5 @@
 import abc
+import asyncio
 
 
 class StrategyInterface(abc.ABC):
@@ -10,3 +11,6 @@ class StrategyInterface(abc.ABC):
     @abc.abstractmethod
     async def handle_exception(self, err_msg):
         pass
+
+    async def wait_for_update(self):
+        await asyncio.sleep(0.1)
@@ -0,0 +1,310 @@
+import time
+import signal
+import asyncio
+import multiprocessing
+from multiprocessing.connection import wait
+
+from munch import DefaultMunch
+
+from market_maker import latency
+from market_maker.engine import Engine
+from market_maker.latency import Histogram
+from market_maker.runtime import setup_event_loop
+from market_maker.logger import logging
+from market_maker.logger.logging import setup_logging, stop_logging
+
+
+def shard_config(cfg_dict, workers):
+    # instruments are dealt round robin, every shard gets its own connection for its symbols
+    strategies = cfg_dict.get('strategies') or [cfg_dict['strategy']]
+    workers = max(1, min(workers, len(strategies)))
+
+    shards = []
+    for idx in range(workers):
+        shard = dict(cfg_dict)
+        shard.pop('strategy', None)
+        shard['strategies'] = strategies[idx::workers]
+        symbols = [strategy['instrument_name'] for strategy in shard['strategies']]
+
+        shard['adapter'] = dict(cfg_dict['adapter'])
+        for section in ('streaming', 'execution'):
+            shard['adapter'][section] = dict(cfg_dict['adapter'].get(section) or {})
+            shard['adapter'][section]['symbol'] = symbols
+
+        logger_cfg = cfg_dict.get('logger')
+        if logger_cfg and logger_cfg.get('path_to_file'):
+            shard['logger'] = dict(logger_cfg)
+            shard['logger']['path_to_file'] = f'{logger_cfg["path_to_file"]}.{idx}'
+        shards.append(shard)
+    return shards
+
+
+class WorkerLink:
+    # worker side of the pipe: heartbeats with positions, latency histograms from time to
+    # time, and commands from the supervisor
+
+    def __init__(self, conn, engine, heartbeat_interval, metrics_interval):
+        self.logger = logging.getLogger()
+
+        self.conn = conn
+        self.engine = engine
+        self.heartbeat_interval = heartbeat_interval
+        self.metrics_interval = metrics_interval
+        self.last_metrics_time = time.time()
+
+    def get_heartbeat(self):
+        heartbeat = {
+            'positions': {strategy.instrument_name: strategy.current_position
+                          for strategy in self.engine.strategies},
+            'active': {strategy.instrument_name: strategy.active
+                       for strategy in self.engine.strategies},
+        }
+        # pickling the histograms is not free, they are sent less often than heartbeats
+        if time.time() - self.last_metrics_time >= self.metrics_interval:
+            self.last_metrics_time = time.time()
+            heartbeat['latency'] = latency.stats.histograms
+        return heartbeat
+
+    async def process_command(self, command):
+        self.logger.warning(f'Worker received {command} command')
+        if command == 'kill':
+            for strategy in self.engine.strategies:
+                try:
+                    await strategy.stop_strategy()
+                except Exception as err:
+                    self.logger.error(f'{strategy.instrument_name} was not stopped: {err}')
+        elif command == 'stop':
+            self.engine.is_active = False
+            asyncio.get_event_loop().stop()
+
+    async def run(self):
+        while True:
+            try:
+                self.conn.send(('heartbeat', self.get_heartbeat()))
+                while self.conn.poll():
+                    await self.process_command(self.conn.recv())
+            except (EOFError, BrokenPipeError):
+                self.logger.error('Supervisor is gone, worker will be stopped')
+                await self.process_command('kill')
+                await self.process_command('stop')
+                return
+            await asyncio.sleep(self.heartbeat_interval)
+
+
+def run_worker(cfg_dict, conn, heartbeat_interval, metrics_interval):
+    # the supervisor handles ctrl+c and stops the workers over the pipe
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    cfg = DefaultMunch.fromDict(cfg_dict, None)
+    setup_logging(cfg, (cfg.logger and cfg.logger.name) or 'mm_bot')
+    setup_event_loop(cfg)
+
+    engine = Engine(cfg)
+    link = WorkerLink(conn, engine, heartbeat_interval, metrics_interval)
+    asyncio.ensure_future(link.run())
+    try:
+        engine.run()
+    finally:
+        stop_logging()
+
+
+class Worker:
+    def __init__(self, idx, cfg_dict):
+        self.idx = idx
+        self.cfg_dict = cfg_dict
+        self.instruments = [strategy['instrument_name'] for strategy in cfg_dict['strategies']]
+
+        self.process = None
+        self.conn = None
+        self.last_heartbeat = None
+        self.heartbeat = {}
+        self.histograms = {}
+        self.restarts = 0
+        self.failed = False
+
+
+class Supervisor:
+    # runs the instruments in a pool of worker processes, one Engine and connection each.
+    # Workers are restarted if they exit or stop sending heartbeats
+    WORKERS = 2
+    HEARTBEAT_INTERVAL_SECS = 1.0
+    HEARTBEAT_TIMEOUT_SECS = 10.0
+    METRICS_INTERVAL_SECS = 10.0
+    MAX_RESTARTS = 5
+    STOP_TIMEOUT_SECS = 10.0
+
+    def __init__(self, cfg, target=run_worker, start_method='spawn'):
+        self.logger = logging.getLogger()
+
+        supervisor_cfg = cfg.supervisor or DefaultMunch()
+        self.heartbeat_interval = supervisor_cfg.heartbeat_interval or \
+            self.HEARTBEAT_INTERVAL_SECS
+        self.heartbeat_timeout = supervisor_cfg.heartbeat_timeout or self.HEARTBEAT_TIMEOUT_SECS
+        self.metrics_interval = supervisor_cfg.metrics_interval or self.METRICS_INTERVAL_SECS
+        self.max_restarts = self.MAX_RESTARTS
+        if supervisor_cfg.max_restarts is not None:
+            self.max_restarts = supervisor_cfg.max_restarts
+
+        self.target = target
+        self.context = multiprocessing.get_context(start_method)
+        self.workers = [Worker(idx, shard) for idx, shard in
+                        enumerate(shard_config(cfg.toDict(), supervisor_cfg.workers or
+                                               self.WORKERS))]
+
+        self.running = False
+        self.kill_requested = False
+        self.last_report_time = time.time()
+
+    def start_worker(self, worker):
+        conn, child_conn = self.context.Pipe()
+        worker.process = self.context.Process(
+            target=self.target,
+            args=(worker.cfg_dict, child_conn, self.heartbeat_interval, self.metrics_interval),
+            name=f'mm_worker_{worker.idx}',
+            daemon=True)
+        worker.process.start()
+        child_conn.close()
+
+        worker.conn = conn
+        # the start up counts as a heartbeat, the engine needs time to connect
+        worker.last_heartbeat = time.time()
+        self.logger.info(f'Worker {worker.idx} started for {worker.instruments}, '
+                         f'pid = {worker.process.pid}')
+
+    def stop_worker(self, worker):
+        try:
+            worker.conn.send('stop')
+        except (OSError, EOFError):
+            pass
+        worker.process.join(self.STOP_TIMEOUT_SECS)
+        if worker.process.is_alive():
+            self.logger.warning(f'Worker {worker.idx} did not stop, it will be terminated')
+            worker.process.terminate()
+            worker.process.join()
+        worker.conn.close()
+
+    def start(self):
+        self.running = True
+        for worker in self.workers:
+            self.start_worker(worker)
+
+    def stop(self):
+        self.running = False
+        for worker in self.workers:
+            if worker.process is not None and not worker.failed:
+                self.stop_worker(worker)
+
+    def kill_switch(self):
+        # every strategy cancels its orders and stops quoting, the workers keep running
+        self.logger.warning('Kill switch: strategies of all workers will be stopped')
+        for worker in self.workers:
+            if worker.failed:
+                continue
+            try:
+                worker.conn.send('kill')
+            except (OSError, EOFError):
+                self.logger.error(f'Kill command was not delivered to worker {worker.idx}')
+
+    def receive(self, worker):
+        try:
+            while worker.conn.poll():
+                msg_type, data = worker.conn.recv()
+                if msg_type == 'heartbeat':
+                    worker.last_heartbeat = time.time()
+                    histograms = data.pop('latency', None)
+                    if histograms is not None:
+                        worker.histograms = histograms
+                    worker.heartbeat = data
+        except (EOFError, OSError):
+            # the process exit is picked up by check_workers
+            pass
+
+    def check_workers(self):
+        now = time.time()
+        for worker in self.workers:
+            if worker.failed:
+                continue
+
+            if not worker.process.is_alive():
+                reason = f'exited with {worker.process.exitcode}'
+            elif now - worker.last_heartbeat > self.heartbeat_timeout:
+                reason = f'sent no heartbeat for {now - worker.last_heartbeat:.1f} seconds'
+            else:
+                continue
+
+            self.logger.error(f'Worker {worker.idx} for {worker.instruments} {reason}')
+            self.receive(worker)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+
+            if worker.restarts >= self.max_restarts:
+                self.logger.error(f'Worker {worker.idx} will not be restarted, '
+                                  f'{worker.restarts} restarts were made')
+                worker.failed = True
+                continue
+            worker.restarts += 1
+            self.start_worker(worker)
+
+    def get_report(self):
+        positions = {}
+        active = {}
+        histograms = {}
+        for worker in self.workers:
+            positions.update(worker.heartbeat.get('positions', {}))
+            active.update(worker.heartbeat.get('active', {}))
+            for key, histogram in worker.histograms.items():
+                merged = histograms.get(key)
+                if merged is None:
+                    merged = histograms[key] = Histogram()
+                merged.merge(histogram)
+
+        report = {
+            'positions': positions,
+            'active': active,
+            'workers': {worker.idx: {'alive': not worker.failed and worker.process is not None
+                                     and worker.process.is_alive(),
+                                     'restarts': worker.restarts} for worker in self.workers},
+            'latency': {},
+        }
+        for (stage, msg_type), histogram in sorted(histograms.items()):
+            report['latency'].setdefault(stage, {})[msg_type] = histogram.get_summary()
+        return report
+
+    def poll(self, timeout):
+        conns = {worker.conn: worker for worker in self.workers if not worker.failed}
+        for conn in wait(list(conns), timeout):
+            self.receive(conns[conn])
+
+        if self.kill_requested:
+            self.kill_requested = False
+            self.kill_switch()
+
+        self.check_workers()
+
+        if time.time() - self.last_report_time >= self.metrics_interval:
+            self.last_report_time = time.time()
+            self.logger.info(f'Supervisor report: {self.get_report()}')
+
+    def run(self):
+        # SIGUSR1 triggers the kill switch, ctrl+c and SIGTERM stop the workers
+        def request_kill(signum, frame):
+            self.kill_requested = True
+
+        def request_stop(signum, frame):
+            self.running = False
+
+        signal.signal(signal.SIGUSR1, request_kill)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        self.logger.info(f'Supervisor started {len(self.workers)} workers')
+        self.start()
+        try:
+            while self.running and not all(worker.failed for worker in self.workers):
+                self.poll(self.heartbeat_interval)
+        except KeyboardInterrupt:
+            self.logger.warning('Supervisor was interrupted')
+        finally:
+            self.stop()
+        self.logger.info('Supervisor stopped')
@@ -1,17 +1,30 @@
 import time
-import json
 import asyncio
 import aiohttp
 
+from . import codec
+from . import latency
 from .logger import logging
+from .logger.logging import TRACE
 
 
 class WebsocketClient:
+    QUEUE_SIZE = 10000
+    HEARTBEAT_INTERVAL_SECS = 30
+    STALE_CONNECTION_SECS = 90
+
     def __init__(self, exchange_name=None):
         self.ws = None
         self.session = None
         self.exchange_name = exchange_name
 
+        # (read time, frame) pairs are pushed here by the reader task and drained by the gateway
+        self.queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.received_ns = None
+        self.reader_task = None
+        self.keepalive_task = None
+        self.last_msg_time = time.time()
+
         self.logger = logging.getLogger()
 
     def create_client_session(self):
@@ -30,6 +43,8 @@ class WebsocketClient:
         except Exception as err:
             raise Exception('{} Failed to connect. Uknown exception: {}'.format(url, err))
 
+        self.start_reader()
+
     async def create_session_and_connection(self, url, auth_params=None):
         while True:
             try:
@@ -61,25 +76,83 @@ class WebsocketClient:
             else:
                 await self.send(auth_params)
 
+    def start_reader(self):
+        self.stop_reader()
+        self.last_msg_time = time.time()
+        self.reader_task = asyncio.ensure_future(self._read_loop(self.ws))
+        self.keepalive_task = asyncio.ensure_future(self._keepalive_loop(self.ws))
+
+    def stop_reader(self):
+        for task in (self.reader_task, self.keepalive_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self.reader_task = None
+        self.keepalive_task = None
+
+    async def _push_error(self, err):
+        await self.queue.put(
+            (time.perf_counter_ns(), aiohttp.WSMessage(aiohttp.WSMsgType.error, err, None)))
+
+    async def _read_loop(self, ws):
+        while True:
+            try:
+                msg = await ws.receive()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                self.logger.error('Failed to get ws msg: {}'.format(err))
+                await self._push_error(err)
+                return
+
+            received_ns = time.perf_counter_ns()
+            self.last_msg_time = time.time()
+            if self.logger.isEnabledFor(TRACE):
+                self.logger.log(TRACE, 'websocket_client received: %s', msg)
+            await self.queue.put((received_ns, msg))
+
+            if msg.type in (aiohttp.WSMsgType.closed, aiohttp.WSMsgType.error):
+                return
+
+    async def _keepalive_loop(self, ws):
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL_SECS)
+
+            if time.time() - self.last_msg_time >= self.STALE_CONNECTION_SECS:
+                self.logger.warning(
+                    'No ws msgs were received within {} secs'.format(self.STALE_CONNECTION_SECS))
+                await self._push_error(Exception('Stale connection was detected'))
+                return
+
+            try:
+                await ws.ping(b'keepalive')
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                self.logger.info('Ping failed: {}'.format(err))
+
     async def send(self, params):
-        await self.ws.send_str(json.dumps(params))
+        await self.send_payload(codec.dumps_bytes(params), params.get('action'))
+
+    async def send_payload(self, data, msg_type=None):
+        latency.stats.mark_sent(msg_type)
+
+        # send_frame avoids a bytes -> str -> bytes round trip on recent aiohttp versions
+        send_frame = getattr(self.ws, 'send_frame', None)
+        if send_frame is not None:
+            await send_frame(data, aiohttp.WSMsgType.text)
+        else:
+            await self.ws.send_str(data.decode())
 
     async def receive(self):
-        try:
-            msg = await asyncio.wait_for(self.ws.receive(), timeout=0.1)
-        except asyncio.TimeoutError:
-            self.logger.debug('no incoming msgs websocket_client')
-            return None
-        except Exception as err:
-            self.logger.error('Failed to get ws msg: {}'.format(err))
-            raise
-        self.logger.debug('websocket_client received: %s', msg)
+        self.received_ns, msg = await self.queue.get()
         return msg
 
     async def ping(self, msg):
         await self.ws.ping(msg)
 
     async def close(self):
+        self.stop_reader()
+
         try:
             await self.ws.close()
         except Exception as err:
@@ -89,3 +162,7 @@ class WebsocketClient:
             await self.session.close()
         except Exception as err:
             self.logger.exception('Failed to close ws session')
+
+        # frames of the previous connection must not be dispatched after reconnection
+        while not self.queue.empty():
+            self.queue.get_nowait()
@@ -4,16 +4,23 @@ import argparse
 
 from munch import DefaultMunch
 
-from market_maker.logger.logging import setup_logging
+from market_maker.logger.logging import setup_logging, stop_logging
 from market_maker.engine import Engine
-
-import logging
+from market_maker.supervisor import Supervisor
+from market_maker.runtime import setup_event_loop
 
 
 def run(cfg):
-    logging.basicConfig(level=logging.DEBUG)
-    engine = Engine(cfg)
-    engine.run()
+    # instruments are sharded across worker processes if several workers are configured
+    if cfg.supervisor and cfg.supervisor.workers and cfg.supervisor.workers > 1:
+        engine = Supervisor(cfg)
+    else:
+        setup_event_loop(cfg)
+        engine = Engine(cfg)
+    try:
+        engine.run()
+    finally:
+        stop_logging()
 
 
 def get_config():
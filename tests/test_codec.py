@@ -0,0 +1,19 @@
+import pytest
+
+from market_maker import codec
+
+
+@pytest.mark.parametrize('name', sorted(codec.codecs))
+def test_codec_round_trip(name):
+    impl = codec.codecs[name]
+    msg = {'channel': 'trading', 'data': [{'price': '100.5', 'post_only': True}]}
+
+    assert impl.loads(impl.dumps(msg)) == msg
+    assert impl.loads(impl.dumps_bytes(msg)) == msg
+    assert impl.dumps_bytes(msg) == impl.dumps(msg).encode()
+
+
+def test_unknown_codec():
+    with pytest.raises(Exception):
+        codec.use('unknown')
+    assert codec.loads is codec.codec.loads
@@ -1,12 +1,25 @@
+import logging
+
 import pytest
 from munch import DefaultMunch
 
-from market_maker.gateways.emx import streaming
+from market_maker import codec
+from market_maker.websocket_client import WebsocketClient
+from market_maker.gateways.emx import streaming, execution, ticker
+from market_maker.gateways.emx.adapter import EmxAdapter
 from market_maker.gateways.emx.shared_storage import SharedStorage
+from market_maker.mailbox import TopOfBookMailbox
+from market_maker.logger.logging import TRACE
+from market_maker.gateways.emx.templates import RequestTemplates
 
 from market_maker.definitions import (
+    OrderRequest,
+    OrderSide,
+    OrderType,
     OrderFillAcknowledgement,
     OrderFullFillAcknowledgement,
+    OrderEliminationAcknowledgement,
+    TopOfBook,
 )
 
 
@@ -193,3 +206,418 @@ async def test_streaming_full_fill(cfg_fixture):
     await adapter.process(sub_msg, clb.msg_callback)
     await adapter.process(order_msg, clb.msg_callback)
     assert clb.success
+
+
+def make_ticker_msg(bid, ask):
+    return {
+        "channel": "ticker",
+        "type": "update",
+        "data": {
+            "contract_code": "BTCG19",
+            "quote": {
+                "bid": str(bid),
+                "bid_size": "1.0",
+                "ask": str(ask),
+                "ask_size": "2.0",
+            },
+            "mark_price": str((bid + ask) / 2.0),
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_streaming_elimination_after_canceled_fill(cfg_fixture):
+    # a partly filled order is cancelled, its last fill frame comes before the elimination
+    data = {
+        "status": "canceled",
+        "timestamp": "2019-02-22T10:03:21.000Z",
+        "contract_code": "BTCG19",
+        "order_id": "475cc533-7248-4266-87ab-3cb82b64b4c7",
+        "order_type": "limit",
+        "side": "sell",
+        "size": "345.9343",
+        "size_filled": "1.5258",
+        "price": "3925.50",
+    }
+
+    strg = SharedStorage()
+    strg.map_ids("test_uid", data["order_id"])
+    adapter = streaming.StreamingAdapter(cfg_fixture, None, strg)
+
+    received = []
+
+    async def msg_callback(msg):
+        received.append(msg)
+
+    await adapter.process({"type": "subscriptions"}, msg_callback)
+    await adapter.process({"channel": "orders", "type": "update", "action": "filled",
+                           "data": data}, msg_callback)
+    assert received == []
+    await adapter.process({"channel": "orders", "type": "update", "action": "canceled",
+                           "data": data}, msg_callback)
+
+    assert len(received) == 1
+    assert isinstance(received[0], OrderEliminationAcknowledgement)
+    assert received[0].order_id == "test_uid"
+    assert strg.get_uid(data["order_id"]) is None
+
+
+@pytest.mark.asyncio
+async def test_streaming_ticks_are_conflated(cfg_fixture):
+    mailbox = TopOfBookMailbox()
+    adapter = streaming.StreamingAdapter(cfg_fixture, None, SharedStorage(), mailbox)
+
+    clb = Callback()
+    clb.type_to_check = TopOfBook
+
+    await adapter.process({"type": "subscriptions"}, clb.msg_callback)
+    for bid in (100.0, 101.0, 102.0):
+        await adapter.process(make_ticker_msg(bid, bid + 1.0), clb.msg_callback)
+
+    assert clb.success is False
+    assert mailbox.get_stats()["BTCG19"] == {"received": 3, "coalesced": 2}
+
+    tob = mailbox.take("BTCG19")
+    assert tob.best_bid_price == 102.0
+    assert tob.best_ask_qty == 2.0
+    assert mailbox.take("BTCG19") is None
+
+
+@pytest.mark.parametrize("codec_name", sorted(codec.codecs))
+def test_fast_ticker_decode_matches_the_generic_path(cfg_fixture, codec_name):
+    codec.use(codec_name)
+    try:
+        adapter = streaming.StreamingAdapter(cfg_fixture, None, SharedStorage())
+        msg = make_ticker_msg(3925.0, 3925.5)
+        msg["data"]["last_trade"] = {"price": "3925.50", "volume": "0.1250"}
+
+        route, tob = adapter.decode_tick(codec.dumps(msg))
+        expected = adapter.process_tick(msg)
+    finally:
+        codec.use()
+
+    assert route.name == "ticker"
+    assert tob.product == expected.product == "BTCG19"
+    assert tob.mark_price == expected.mark_price == 3925.25
+    for field in ("best_bid_price", "best_bid_qty", "best_ask_price", "best_ask_qty"):
+        assert getattr(tob, field) == getattr(expected, field)
+
+
+@pytest.mark.parametrize("frame", [
+    # spaced out, keys in another order, numbers instead of strings, escapes, other channels
+    '{"channel": "ticker", "type": "update", "data": {}}',
+    '{"type":"update","channel":"ticker","data":{}}',
+    '{"channel":"ticker","type":"update","data":{"contract_code":"BTC-PERP",'
+    '"quote":{"bid":3925.0,"bid_size":"1","ask":"3925.5","ask_size":"1"}}}',
+    '{"channel":"ticker","type":"update","data":{"contract_code":"BTC\\"PERP",'
+    '"quote":{"bid":"3925.0","bid_size":"1","ask":"3925.5","ask_size":"1"}}}',
+    '{"channel":"ticker","type":"update","data":{"contract_code":"BTC-PERP",'
+    '"quote":{"bid":"","bid_size":"1","ask":"3925.5","ask_size":"1"}}}',
+    '{"channel":"positions","type":"update","data":{"contract_code":"BTC-PERP"}}',
+    # a field between the quote and the mark price
+    '{"channel":"ticker","type":"update","data":{"contract_code":"BTC-PERP",'
+    '"quote":{"bid":"3925.0","bid_size":"1","ask":"3925.5","ask_size":"1"},'
+    '"index_price":"3925.3","mark_price":"3925.2"}}',
+])
+def test_fast_ticker_decode_falls_back(cfg_fixture, frame):
+    adapter = streaming.StreamingAdapter(cfg_fixture, None, SharedStorage())
+    assert adapter.decode_tick(frame) is None
+
+
+def test_fast_ticker_decode_without_mark_price():
+    frame = ('{"channel":"ticker","type":"snapshot","data":{"contract_code":"BTC-PERP",'
+             '"quote":{"bid":"3925.0","bid_size":"1","ask":"3925.5","ask_size":"2"}}}')
+    assert ticker.decode(frame) == ("snapshot", "BTC-PERP", 3925.0, 1.0, 3925.5, 2.0, None)
+
+
+@pytest.mark.asyncio
+async def test_streaming_frames_are_counted_per_route(cfg_fixture):
+    adapter = streaming.StreamingAdapter(cfg_fixture, None, SharedStorage(), TopOfBookMailbox())
+
+    await adapter.process({"type": "subscriptions"}, None)
+    await adapter.process(make_ticker_msg(100.0, 101.0), None)
+    assert adapter.route_name == "ticker"
+
+    # no precompiled key, the fallback still matches the channel
+    await adapter.process(dict(make_ticker_msg(100.0, 101.0), type="partial"), None)
+    await adapter.process({"channel": "orders", "type": "update", "action": "unknown"}, None)
+    assert adapter.route_name == "unrouted"
+
+    assert adapter.get_route_stats() == {"subscriptions": 1, "ticker": 2, "unrouted": 1}
+
+
+@pytest.mark.asyncio
+async def test_streaming_payloads_are_logged_at_trace_only(cfg_fixture, caplog):
+    adapter = streaming.StreamingAdapter(cfg_fixture, None, SharedStorage(), TopOfBookMailbox())
+    await adapter.process({"type": "subscriptions"}, None)
+
+    msg = make_ticker_msg(100.0, 101.0)
+    with caplog.at_level(logging.INFO):
+        await adapter.process(msg, None)
+    assert not caplog.records
+
+    with caplog.at_level(TRACE):
+        await adapter.process(msg, None)
+    assert [record.levelname for record in caplog.records] == ["TRACE"]
+    assert caplog.records[0].args == msg
+
+
+def test_shared_storage_lifecycle():
+    strg = SharedStorage(max_size=2)
+    strg.map_ids("uid_1", "eid_1")
+    strg.map_ids("uid_2", "eid_1")  # amend binds the exchange order to a new uid
+    strg.mark_amend("eid_1")
+
+    assert strg.get_eid("uid_1") is None
+    assert strg.get_uid("eid_1") == "uid_2"
+    assert strg.is_amend("eid_1")
+
+    assert strg.release_eid("eid_1") == "uid_2"
+    assert strg.get_uid("eid_1") is None
+    assert strg.is_amend("eid_1") is False
+
+    for idx in range(3):
+        strg.map_ids(f"uid_{idx}", f"eid_{idx}")
+    assert list(strg.eid_to_uid) == ["eid_1", "eid_2"]
+    assert list(strg.uid_to_eid) == ["uid_1", "uid_2"]
+
+    stats = strg.get_stats()
+    assert stats["uid_hits"] == 1
+    assert stats["uid_misses"] == 1
+    assert stats["evictions"] == 1
+
+    strg.reset()
+    assert strg.get_stats() == {
+        "uid_to_eid": 0, "eid_to_uid": 0, "eids_to_amend": 0, "uid_hits": 0,
+        "uid_misses": 0, "eid_hits": 0, "eid_misses": 0, "evictions": 0}
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    async def send_str(self, data):
+        self.sent.append(codec.loads(data))
+
+
+@pytest.mark.asyncio
+async def test_execution_bulk_cancel_is_chunked(cfg_fixture):
+    cfg_fixture.max_orders_per_cancel = 2
+
+    strg = SharedStorage()
+    for idx in range(3):
+        strg.map_ids(f"uid_{idx}", f"eid_{idx}")
+
+    ws = WebsocketClient()
+    ws.ws = FakeWs()
+    adapter = execution.ExecutionAdapter(cfg_fixture, None, ws, strg)
+
+    res = await adapter.cancel_orders(["uid_0", "uid_1", "uid_2", "unknown"])
+    assert res.success
+
+    assert len(ws.ws.sent) == 2
+    assert ws.ws.sent[0]["action"] == "cancel-order"
+    assert ws.ws.sent[0]["data"] == [{"order_id": "eid_0"}, {"order_id": "eid_1"}]
+    assert ws.ws.sent[1]["data"] == {"order_id": "eid_2"}
+
+
+@pytest.mark.parametrize("codec_name", sorted(codec.codecs))
+def test_request_templates_match_the_encoded_dict(codec_name):
+    codec.use(codec_name)
+    try:
+        templates = RequestTemplates(4)
+        templates.check_codec()
+        bodies = [
+            templates.create_body("BTC-PERP", "buy", "limit", True, "uid-1", 0.01, 3925.5),
+            templates.create_body("BTC-PERP", "sell", "market", True, 'odd "id"', 0.50001),
+        ]
+        expected = {
+            "channel": "trading",
+            "type": "request",
+            "action": "create-order",
+            "data": [
+                {"client_id": "uid-1", "contract_code": "BTC-PERP", "type": "limit",
+                 "side": "buy", "size": "0.01", "price": "3925.5", "post_only": True},
+                {"client_id": 'odd "id"', "contract_code": "BTC-PERP", "type": "market",
+                 "side": "sell", "size": "0.5"},
+            ]
+        }
+        assert templates.request("create-order", bodies) == codec.dumps_bytes(expected)
+
+        body = templates.amend_body("sell", "limit", "eid-1", 0.02, 3926.0)
+        expected = {
+            "channel": "trading",
+            "type": "request",
+            "action": "modify-order",
+            "data": {"type": "limit", "side": "sell", "order_id": "eid-1", "size": "0.02",
+                     "price": "3926.0"},
+        }
+        assert templates.request("modify-order", body) == codec.dumps_bytes(expected)
+    finally:
+        codec.use()
+
+
+@pytest.mark.asyncio
+async def test_execution_bulk_amend_request(cfg_fixture):
+    cfg_fixture.symbol = "BTC-PERP"
+    strg = SharedStorage()
+    strg.map_ids("old_1", "eid_1")
+
+    ws = WebsocketClient()
+    ws.ws = FakeWs()
+    adapter = execution.ExecutionAdapter(cfg_fixture, None, ws, strg)
+
+    old, new = OrderRequest(), OrderRequest()
+    for order, order_id, price in ((old, "old_1", 100.0), (new, "new_1", 100.5)):
+        order.order_id = order_id
+        order.side = OrderSide.buy
+        order.type = OrderType.limit
+        order.quantity = 0.123456
+        order.price = price
+
+    res = await adapter.amend_orders([new], [old])
+    assert res.success
+    assert ws.ws.sent == [{
+        "channel": "trading",
+        "type": "request",
+        "action": "modify-order",
+        "data": [{"type": "limit", "side": "buy", "order_id": "eid_1", "size": "0.1235",
+                  "price": "100.5"}],
+    }]
+    assert strg.get_uid("eid_1") == "new_1"
+    assert strg.is_amend("eid_1")
+
+
+@pytest.mark.asyncio
+async def test_execution_cancel_all_per_contract(cfg_fixture):
+    cfg_fixture.symbol = ["BTC-PERP", "ETH-PERP"]
+
+    ws = WebsocketClient()
+    ws.ws = FakeWs()
+    adapter = execution.ExecutionAdapter(cfg_fixture, None, ws, SharedStorage())
+
+    await adapter.cancel_active_orders("ETH-PERP")
+    assert [msg["data"] for msg in ws.ws.sent] == [{"contract_code": "ETH-PERP"}]
+
+    await adapter.cancel_active_orders()
+    assert [msg["data"] for msg in ws.ws.sent[1:]] == [
+        {"contract_code": "BTC-PERP"}, {"contract_code": "ETH-PERP"}]
+
+
+@pytest.mark.asyncio
+async def test_streaming_positions_of_several_contracts(cfg_fixture):
+    cfg_fixture.symbol = ["BTC-PERP", "ETH-PERP"]
+    adapter = streaming.StreamingAdapter(cfg_fixture, None, SharedStorage())
+    adapter.subscribed = True
+
+    positions = []
+
+    async def msg_callback(msg):
+        positions.append((msg.instrument, msg.position))
+
+    await adapter.process({
+        "channel": "positions",
+        "type": "snapshot",
+        "data": [
+            {"contract_code": "BTC-PERP", "quantity": "1.5"},
+            {"contract_code": "XRP-PERP", "quantity": "3"},
+            {"contract_code": "ETH-PERP", "quantity": "-2"},
+        ]
+    }, msg_callback)
+    await adapter.process({
+        "channel": "positions",
+        "type": "update",
+        "data": {"contract_code": "ETH-PERP", "quantity": "0"},
+    }, msg_callback)
+
+    assert positions == [("BTC-PERP", 1.5), ("ETH-PERP", -2.0), ("ETH-PERP", 0.0)]
+
+
+@pytest.mark.asyncio
+async def test_execution_cancel_all_drops_queued_requests(cfg_fixture):
+    cfg_fixture.symbol = "BTC-PERP"
+    cfg_fixture.rate_limits = {"create-order": {"rate": 1, "burst": 1}}
+
+    ws = WebsocketClient()
+    ws.ws = FakeWs()
+    adapter = execution.ExecutionAdapter(cfg_fixture, None, ws, SharedStorage())
+
+    for idx in range(3):
+        order = OrderRequest()
+        order.order_id = f"uid_{idx}"
+        order.side = OrderSide.buy
+        order.type = OrderType.limit
+        order.price = 3925.0
+        order.quantity = 1.0
+        await adapter.send_order(order)
+    assert adapter.scheduler.get_queued()["create-order"] == 2
+
+    await adapter.cancel_active_orders()
+    assert adapter.scheduler.task is None
+    assert adapter.scheduler.get_queued()["create-order"] == 0
+    assert [msg["action"] for msg in ws.ws.sent] == ["create-order", "cancel-all-orders"]
+
+
+@pytest.mark.asyncio
+async def test_reconnect_drops_queued_requests(cfg_fixture):
+    cfg_fixture.execution = DefaultMunch()
+    cfg_fixture.execution.symbol = "BTC-PERP"
+    cfg_fixture.execution.rate_limits = {"modify-order": {"rate": 1, "burst": 1}}
+    cfg_fixture.streaming = DefaultMunch()
+    adapter = EmxAdapter(cfg_fixture)
+    adapter.websocket.ws = FakeWs()
+
+    async def restart():
+        adapter.started = True
+
+    async def close():
+        pass
+
+    adapter.start = restart
+    adapter.websocket.close = close
+
+    for idx in range(3):
+        adapter.storage.map_ids(f"uid_{idx}", f"eid_{idx}")
+        order = OrderRequest()
+        order.order_id = f"uid_{idx}"
+        order.side = OrderSide.buy
+        order.type = OrderType.limit
+        order.price = 3925.0
+        order.quantity = 1.0
+        await adapter.amend_order(order, order)
+    assert adapter.execution.scheduler.get_queued()["modify-order"] == 2
+
+    await adapter.reconnect()
+
+    assert adapter.execution.scheduler.task is None
+    assert adapter.execution.scheduler.get_queued()["modify-order"] == 0
+    assert adapter.storage.get_eid("uid_1") is None
+    assert [msg["data"]["order_id"] for msg in adapter.websocket.ws.sent] == ["eid_0"]
+
+
+@pytest.mark.asyncio
+async def test_execution_cancel_drops_queued_new_orders(cfg_fixture):
+    cfg_fixture.symbol = "BTC-PERP"
+    cfg_fixture.rate_limits = {"create-order": {"rate": 1, "burst": 1}}
+
+    ws = WebsocketClient()
+    ws.ws = FakeWs()
+    adapter = execution.ExecutionAdapter(cfg_fixture, None, ws, SharedStorage())
+
+    orders = []
+    for idx in range(3):
+        order = OrderRequest()
+        order.order_id = f"uid_{idx}"
+        order.side = OrderSide.buy
+        order.type = OrderType.limit
+        order.price = 3925.0
+        order.quantity = 1.0
+        orders.append(order)
+    await adapter.send_orders(orders[:1])
+    await adapter.send_orders(orders[1:])
+
+    assert (await adapter.cancel_orders(["uid_1"])).success
+    assert (await adapter.cancel_order("uid_2")).success
+    assert adapter.scheduler.get_queued()["create-order"] == 0
+    assert adapter.scheduler.get_stats()["dropped"] == {"create-order": 2}
+    assert [msg["action"] for msg in ws.ws.sent] == ["create-order"]
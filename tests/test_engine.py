@@ -0,0 +1,134 @@
+import pytest
+from munch import DefaultMunch
+
+from market_maker.engine import Engine
+from market_maker.definitions import (
+    ExchangeOrder,
+    ExchangeOrders,
+    NewOrderAcknowledgement,
+    OrderEliminationAcknowledgement,
+    Position,
+)
+
+
+def make_strategy_config(instrument_name):
+    cfg = DefaultMunch()
+    cfg.name = "market_maker"
+    cfg.instrument_name = instrument_name
+    cfg.mid_price_based_calculation = False
+    cfg.send_post_only_orders = True
+    cfg.tick_size = 0.5
+    cfg.stop_strategy_on_error = False
+    cfg.positional_retreat = DefaultMunch()
+    cfg.positional_retreat.position_increment = 0
+    cfg.positional_retreat.retreat_ticks = 0
+    cfg.orders = DefaultMunch()
+    cfg.orders.asks = [[0, 1]]
+    cfg.orders.bids = [[0, 1]]
+    return cfg
+
+
+@pytest.fixture
+def cfg_fixture():
+    cfg = DefaultMunch()
+    cfg.strategies = [make_strategy_config("BTC-PERP"), make_strategy_config("ETH-PERP")]
+
+    cfg.adapter = DefaultMunch()
+    cfg.adapter.api_key = ""
+    cfg.adapter.api_secret = ""
+    cfg.adapter.streaming = DefaultMunch()
+    cfg.adapter.streaming.symbol = ["BTC-PERP", "ETH-PERP"]
+    cfg.adapter.execution = DefaultMunch()
+    cfg.adapter.execution.symbol = ["BTC-PERP", "ETH-PERP"]
+    return cfg
+
+
+def test_engine_creates_a_strategy_per_instrument(cfg_fixture):
+    engine = Engine(cfg_fixture)
+
+    assert list(engine.strategies_by_instrument) == ["BTC-PERP", "ETH-PERP"]
+    assert engine.exchange_adapter.msg_callback == engine.route_update
+    assert [strategy.orders_manager.instrument_name for strategy in engine.strategies] == \
+        ["BTC-PERP", "ETH-PERP"]
+
+    cfg_fixture.strategies[1].instrument_name = "BTC-PERP"
+    with pytest.raises(Exception):
+        Engine(cfg_fixture)
+
+
+@pytest.mark.asyncio
+async def test_engine_routes_updates_by_contract(cfg_fixture):
+    engine = Engine(cfg_fixture)
+
+    updates = {"BTC-PERP": [], "ETH-PERP": []}
+    for strategy in engine.strategies:
+        async def on_market_update(update, instrument=strategy.instrument_name):
+            updates[instrument].append(update)
+        strategy.on_market_update = on_market_update
+
+    pos = Position()
+    pos.instrument = "ETH-PERP"
+    ack = NewOrderAcknowledgement()
+    ack.instrument_name = "BTC-PERP"
+    elimination = OrderEliminationAcknowledgement()
+    elimination.instrument = "XRP-PERP"
+
+    snapshot = ExchangeOrders()
+    for instrument in ("BTC-PERP", "ETH-PERP", "ETH-PERP"):
+        order = ExchangeOrder()
+        order.instrument_name = instrument
+        snapshot.bids.append(order)
+
+    for update in (pos, ack, elimination, snapshot):
+        await engine.route_update(update)
+
+    assert updates["BTC-PERP"][0] is ack
+    assert updates["ETH-PERP"][0] is pos
+    assert [len(update.bids) for update in (updates["BTC-PERP"][1], updates["ETH-PERP"][1])] == \
+        [1, 2]
+    assert updates["ETH-PERP"][1].instrument == "ETH-PERP"
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resets_the_other_strategies(cfg_fixture):
+    engine = Engine(cfg_fixture)
+    btc, eth = engine.strategies
+    btc.num_of_sent_orders = eth.num_of_sent_orders = 2
+
+    btc.reconnecting = True
+    for callback in engine.exchange_adapter.reconnect_listeners:
+        await callback()
+
+    assert btc.num_of_sent_orders == 2
+    assert eth.num_of_sent_orders == 0
+
+
+@pytest.mark.asyncio
+async def test_connection_errors_stop_every_strategy(cfg_fixture):
+    for strategy_cfg in cfg_fixture.strategies:
+        strategy_cfg.stop_strategy_on_error = True
+    engine = Engine(cfg_fixture)
+    adapter = engine.exchange_adapter
+
+    cancelled = []
+    reconnects = []
+
+    async def cancel_active_orders(contract_code=None):
+        cancelled.append(contract_code)
+
+    async def reconnect():
+        reconnects.append(True)
+
+    async def listen():
+        engine.is_active = False
+        raise Exception('Connection msg closed was received')
+
+    adapter.cancel_active_orders = cancel_active_orders
+    adapter.reconnect = reconnect
+    adapter.listen = listen
+
+    await engine.listen_updates()
+
+    assert [strategy.active for strategy in engine.strategies] == [False, False]
+    assert sorted(set(cancelled)) == ["BTC-PERP", "ETH-PERP"]
+    assert len(reconnects) == 1
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from market_maker.latency import Histogram, LatencyStats
+from market_maker.definitions import TopOfBook
+
+
+def test_histogram_percentiles_are_within_one_percent():
+    rnd = random.Random(1)
+    values = sorted(int(rnd.lognormvariate(11, 1)) for _ in range(20000))
+
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == len(values)
+    assert histogram.min == values[0]
+    assert histogram.max == values[-1]
+    for pct in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * pct / 100.0) - 1]
+        assert histogram.percentile(pct) == pytest.approx(exact, rel=0.01)
+
+
+def test_histogram_merge():
+    first, second = Histogram(), Histogram()
+    for value in range(100):
+        first.record(value)
+        second.record(value + 1000000)
+    first.merge(second)
+
+    assert first.count == 200
+    assert first.max == 1000099
+    assert first.percentile(50) == 99
+    assert first.percentile(100) == 1000099
+
+
+def test_stats_attribute_the_first_send_to_the_tick():
+    stats = LatencyStats()
+    stats.record_frame('ticker', 100, 200, 300, 400)
+
+    stats.mark_decision(100)
+    stats.mark_sent('modify-order')
+    stats.mark_sent('create-order')
+    stats.end_decision()
+    # sends outside of a decision are not timed
+    stats.mark_sent('cancel-order')
+
+    report = stats.get_report()
+    assert report['queue']['ticker']['count'] == 1
+    assert report['translate']['ticker']['p50'] == 0.1
+    assert report['strategy']['ticker']['count'] == 1
+    assert set(report['send']) == {'modify-order', 'create-order'}
+    assert set(report['tick_to_wire']) == {'modify-order'}
+
+
+def test_tob_without_a_socket_is_not_timed():
+    stats = LatencyStats()
+    stats.mark_decision(TopOfBook().received_ns)
+    stats.mark_sent('modify-order')
+    assert stats.get_report() == {}
@@ -0,0 +1,43 @@
+from market_maker.live_orders import LiveOrders
+from market_maker.order_state import State
+from market_maker.definitions import OrderRequest, OrderSide
+
+
+def make_order(order_id, side, price):
+    order = OrderRequest()
+    order.order_id = order_id
+    order.side = side
+    order.price = price
+    return order
+
+
+def test_sorted_views():
+    live_orders = LiveOrders()
+    live_orders.add(make_order('b1', OrderSide.buy, 99.0), State.Active)
+    live_orders.add(make_order('a1', OrderSide.sell, 102.0), State.Active)
+    live_orders.add(make_order('b2', OrderSide.buy, 98.0), State.Active)
+    live_orders.add(make_order('a2', OrderSide.sell, 101.0), State.InsertPending)
+
+    assert [o.order_id for o in live_orders.get_side(OrderSide.buy)] == ['b2', 'b1']
+    assert [o.order_id for o in live_orders.get_sorted()] == ['b2', 'b1', 'a2', 'a1']
+
+    live_orders.add(make_order('b1', OrderSide.buy, 97.0), State.Active)
+    assert [o.order_id for o in live_orders.get_side(OrderSide.buy)] == ['b1', 'b2']
+    assert len(live_orders) == 4
+
+
+def test_state_counts():
+    live_orders = LiveOrders()
+    live_orders.add(make_order('b1', OrderSide.buy, 99.0), State.InsertPending)
+    live_orders.add(make_order('a1', OrderSide.sell, 101.0), State.InsertPending)
+    assert live_orders.count([State.InsertPending]) == 2
+
+    live_orders.update_state('b1', State.Active)
+    live_orders.update_state('unknown', State.Active)
+    assert live_orders.count([State.InsertPending]) == 1
+    assert live_orders.count([State.Active]) == 1
+
+    live_orders.remove('a1')
+    assert live_orders.discard('a1') is None
+    assert live_orders.count([State.InsertPending]) == 0
+    assert live_orders.ids_in_states([State.Active]) == ['b1']
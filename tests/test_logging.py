@@ -0,0 +1,79 @@
+import queue
+import logging
+
+from munch import DefaultMunch
+
+from market_maker.logger import logging as mm_logging
+from market_maker.logger.logging import DroppingQueueHandler, BatchedFileHandler, TRACE
+
+
+def make_record(level, msg, args=None):
+    return logging.LogRecord('test', level, __file__, 1, msg, args, None)
+
+
+def test_queue_handler_drops_debug_first():
+    log_queue = queue.Queue(maxsize=10)
+    handler = DroppingQueueHandler(log_queue)
+
+    for idx in range(10):
+        handler.handle(make_record(logging.INFO, 'info %d', (idx,)))
+    for level in (TRACE, logging.DEBUG, logging.WARNING, logging.WARNING):
+        handler.handle(make_record(level, 'warning'))
+
+    assert log_queue.qsize() == 10
+    assert handler.dropped == {'TRACE': 1, 'DEBUG': 1, 'INFO': 1, 'WARNING': 1}
+    # the arguments are merged on the caller side
+    record = log_queue.get_nowait()
+    assert record.msg == 'info 0' and record.args is None
+
+    handler.handle(make_record(logging.ERROR, 'error'))
+    assert log_queue.qsize() == 10
+
+
+def test_errors_do_not_wait_for_a_stalled_listener():
+    log_queue = queue.Queue(maxsize=3)
+    handler = DroppingQueueHandler(log_queue)
+
+    handler.handle(make_record(logging.ERROR, 'error 0'))
+    handler.handle(make_record(logging.WARNING, 'warning'))
+    handler.handle(make_record(logging.ERROR, 'error 1'))
+    # the queue is full, the warning makes room
+    handler.handle(make_record(logging.ERROR, 'error 2'))
+    assert handler.dropped == {'WARNING': 1}
+    # only errors are queued, the queue goes over its bound
+    handler.handle(make_record(logging.ERROR, 'error 3'))
+
+    records = []
+    while not log_queue.empty():
+        records.append(log_queue.get_nowait().msg)
+        log_queue.task_done()
+    assert records == ['error 0', 'error 1', 'error 2', 'error 3']
+    assert log_queue.unfinished_tasks == 0
+
+
+def test_errors_are_flushed_and_nothing_is_lost_on_shutdown(tmp_path):
+    path = str(tmp_path / 'mm.log')
+    cfg = DefaultMunch.fromDict({
+        'logger': {'level': 'DEBUG', 'path_to_file': path, 'flush_interval': 3600},
+    }, None)
+
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    try:
+        logger = mm_logging.setup_logging(cfg, 'test_logging')
+        file_handler = mm_logging.m_listener.handlers[1]
+        assert isinstance(file_handler, BatchedFileHandler)
+
+        for idx in range(100):
+            logger.info('info %d', idx)
+        logger.error('error')
+        mm_logging.stop_logging()
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+        mm_logging.setLogger(None)
+
+    with open(path) as log_file:
+        lines = log_file.read().splitlines()
+    assert len(lines) == 101
+    assert lines[-1] == 'ERROR:test_logging:error'
@@ -0,0 +1,39 @@
+import pytest
+
+from market_maker.order_state import Event, State, OrderState, TRANSITIONS
+from market_maker.orders_manager import OrdersManager
+
+
+def test_amend_cycle():
+    order_state = OrderState()
+    for event in (Event.on_creation, Event.on_insert_ack, Event.on_amend):
+        assert order_state.on_event(event)
+    assert order_state.state is State.AmendPending
+
+    assert order_state.on_event(Event.on_amend_ack)
+    assert order_state.state is State.Active
+
+
+def test_illegal_transition_keeps_state():
+    order_state = OrderState()
+    assert order_state.on_event(Event.on_fill) is False
+    assert order_state.state is State.Inactive
+
+
+@pytest.mark.parametrize('state', list(State))
+def test_table_matches_transitions(state):
+    for event in Event:
+        order_state = OrderState()
+        order_state.state = state
+        order_state.on_event(event)
+        assert order_state.state is TRANSITIONS[state].get(event, state)
+
+
+def test_illegal_transitions_are_counted():
+    om = OrdersManager(None)
+    om.update_order_state('oid', Event.on_creation)
+    om.update_order_state('oid', Event.on_amend_ack)
+    om.update_order_state('oid', Event.on_amend_ack)
+
+    assert om.orders_states['oid'].state is State.InsertPending
+    assert om.get_illegal_transitions() == {'InsertPending:on_amend_ack': 2}
@@ -2,6 +2,7 @@ import pytest
 from munch import DefaultMunch
 
 from market_maker.orders_manager import OrdersManager
+from market_maker.order_state import Event, State
 from market_maker.gateways import gateway_interface
 
 from market_maker.definitions import (
@@ -82,7 +83,7 @@ class bittest_adapter(gateway_interface.GatewayInterface):
         self.orders_cancelled += len(cancel_requests)
         return res
 
-    async def cancel_active_orders(self):
+    async def cancel_active_orders(self, contract_code=None):
         pass
 
     async def start(self):
@@ -120,3 +121,182 @@ async def test_place_orders_1():
 
     assert om.exchange_adapter.orders_sent == 2
     assert len(om.orders.values()) == 2
+
+
+@pytest.mark.asyncio
+async def test_amend_active_orders():
+    adapter = bittest_adapter()
+    om = OrdersManager(adapter)
+
+    orders = []
+    for side, price in ((OrderSide.buy, 99.0), (OrderSide.sell, 101.0)):
+        order = OrderRequest()
+        order.side = side
+        order.type = OrderType.limit
+        order.price = price
+        order.quantity = 1.0
+        orders.append(order)
+    await om.place_orders(orders)
+    assert om.get_number_of_ready_for_amend() == 0
+
+    for order in orders:
+        om.update_order_state(order.order_id, Event.on_insert_ack)
+    assert om.get_number_of_ready_for_amend() == 2
+    assert om.get_number_of_active_orders() == 2
+
+    new_orders = []
+    for side, price in ((OrderSide.buy, 98.0), (OrderSide.sell, 102.0)):
+        order = OrderRequest()
+        order.side = side
+        order.type = OrderType.limit
+        order.price = price
+        order.quantity = 1.0
+        new_orders.append(order)
+    await om.amend_active_orders(new_orders)
+
+    assert adapter.orders_amended > 0
+    assert om.get_number_of_ready_for_amend() == 0
+    assert sorted(o.price for o in om.get_live_orders()) == [98.0, 102.0]
+    assert {o.order_id for o in om.get_live_orders()} == {o.order_id for o in orders}
+
+
+@pytest.mark.asyncio
+async def test_terminal_orders_are_retired():
+    adapter = bittest_adapter()
+    om = OrdersManager(adapter)
+
+    order = OrderRequest()
+    order.side = OrderSide.buy
+    order.type = OrderType.limit
+    order.price = 100.0
+    order.quantity = 1.0
+    await om.place_order(order)
+    om.update_order_state(order.order_id, Event.on_insert_ack)
+
+    await om.cancel_orders([order.order_id])
+    assert om.get_memory_gauges()['orders_states'] == 1
+
+    om.update_order_state(order.order_id, Event.on_cancel_ack)
+    gauges = om.get_memory_gauges()
+    assert gauges['orders'] == 0
+    assert gauges['orders_states'] == 0
+    assert gauges['live_orders'] == 0
+    assert gauges['archive'] == 1
+    assert om.archive[0][:2] == (order.order_id, State.Cancelled)
+
+
+@pytest.mark.asyncio
+async def test_cancel_orders_in_one_request():
+    adapter = bittest_adapter()
+    om = OrdersManager(adapter)
+
+    orders = []
+    for price in (99.0, 98.0, 97.0):
+        order = OrderRequest()
+        order.side = OrderSide.buy
+        order.type = OrderType.limit
+        order.price = price
+        order.quantity = 1.0
+        orders.append(order)
+    await om.place_orders(orders)
+    for order in orders:
+        om.update_order_state(order.order_id, Event.on_insert_ack)
+
+    await om.cancel_orders([order.order_id for order in orders])
+
+    assert adapter.orders_cancelled == 3
+    assert len(om.live_orders) == 0
+    assert all(om.orders_states[o.order_id].state is State.CancelPending for o in orders)
+
+
+@pytest.mark.asyncio
+async def test_requote_sends_only_the_moved_levels():
+    adapter = bittest_adapter()
+    om = OrdersManager(adapter)
+
+    def make_orders(bids, asks):
+        orders = []
+        for side, prices in ((OrderSide.buy, bids), (OrderSide.sell, asks)):
+            for price in prices:
+                order = OrderRequest()
+                order.side = side
+                order.type = OrderType.limit
+                order.price = price
+                order.quantity = 1.0
+                orders.append(order)
+        return orders
+
+    orders = make_orders([99.0, 98.0, 97.0], [101.0, 102.0, 103.0])
+    await om.place_orders(orders)
+    for order in orders:
+        om.update_order_state(order.order_id, Event.on_insert_ack)
+
+    await om.amend_active_orders(make_orders([100.0, 99.0, 98.0], [102.0, 103.0, 104.0]))
+
+    assert adapter.orders_amended == 2
+    assert adapter.orders_sent == 6 and adapter.orders_cancelled == 0
+    assert om.get_requote_stats() == {'kept': 4, 'amended': 2, 'placed': 0, 'cancelled': 0,
+                                      'cost': 2}
+    assert sorted(o.price for o in om.get_live_orders()) == \
+        [98.0, 99.0, 100.0, 102.0, 103.0, 104.0]
+    assert {o.order_id for o in om.get_live_orders()} == {o.order_id for o in orders}
+    assert om.get_number_of_ready_for_amend() == 4
+
+
+@pytest.mark.asyncio
+async def test_targets_of_pending_orders_are_held_until_the_ack():
+    adapter = bittest_adapter()
+    om = OrdersManager(adapter)
+
+    def make_orders(bids):
+        orders = []
+        for price in bids:
+            order = OrderRequest()
+            order.side = OrderSide.buy
+            order.type = OrderType.limit
+            order.price = price
+            order.quantity = 1.0
+            orders.append(order)
+        return orders
+
+    orders = make_orders([99.0, 98.0])
+    await om.place_orders(orders)
+    for order in orders:
+        om.update_order_state(order.order_id, Event.on_insert_ack)
+
+    # both levels move, the amends are in flight
+    await om.amend_active_orders(make_orders([97.0, 96.0]))
+    assert adapter.orders_amended == 2
+    fast, slow = orders
+
+    # the fast level is re-quoted twice while the slow one waits for its ack
+    for bids in ([95.0, 94.0], [93.0, 92.0]):
+        om.update_order_state(fast.order_id, Event.on_amend_ack)
+        await om.amend_active_orders(make_orders(bids))
+    assert adapter.orders_amended == 4
+    assert om.has_intent(slow.order_id)
+    assert om.get_requote_stats()['held'] == 2
+    assert om.get_stuck_orders(10.0) == []
+
+    # the ack sends the newest target only
+    om.update_order_state(slow.order_id, Event.on_amend_ack)
+    await om.send_intent(slow.order_id)
+    assert adapter.orders_amended == 5
+    assert not om.has_intent(slow.order_id)
+    assert sorted(o.price for o in om.get_live_orders()) == [92.0, 93.0]
+    assert sorted(om.get_stuck_orders(-1.0)) == sorted([fast.order_id, slow.order_id])
+
+    # the slow level is dropped while its amend is in flight, the cancel is held
+    om.update_order_state(fast.order_id, Event.on_amend_ack)
+    await om.amend_active_orders(make_orders([om.orders[fast.order_id].price]))
+    assert adapter.orders_cancelled == 0
+    assert om.has_intent(slow.order_id)
+
+    # its elimination is expected once the cancel is sent
+    om.update_order_state(slow.order_id, Event.on_amend_ack)
+    await om.send_intent(slow.order_id)
+    assert adapter.orders_cancelled == 1
+    assert om.remove_cancel_on_fill(slow.order_id)
+    om.update_order_state(slow.order_id, Event.on_cancel_ack)
+    assert slow.order_id not in om.orders_states
+    assert [o.order_id for o in om.get_live_orders()] == [fast.order_id]
@@ -0,0 +1,79 @@
+from market_maker.quote_differ import QuoteDiffer
+from market_maker.definitions import OrderRequest, OrderSide, OrderType
+
+
+def make_ladder(bids, asks, quantity=1.0, prefix='new'):
+    orders = []
+    for side, prices in ((OrderSide.buy, bids), (OrderSide.sell, asks)):
+        for price in prices:
+            order = OrderRequest()
+            order.order_id = f'{prefix}-{side.name}-{price}'
+            order.side = side
+            order.type = OrderType.limit
+            order.price = price
+            order.quantity = quantity
+            orders.append(order)
+    return orders
+
+
+def prices(orders):
+    return sorted(order.price for order in orders)
+
+
+def test_ladder_shifted_by_a_tick():
+    live = make_ladder([99.0, 98.0, 97.0], [101.0, 102.0, 103.0], prefix='live')
+    desired = make_ladder([100.0, 99.0, 98.0], [102.0, 103.0, 104.0])
+
+    diff = QuoteDiffer().diff(desired, live)
+
+    assert prices(new for new, _ in diff.keep) == [98.0, 99.0, 102.0, 103.0]
+    assert sorted((new.price, existing.price) for new, existing in diff.amend) == \
+        [(100.0, 97.0), (104.0, 101.0)]
+    assert diff.place == [] and diff.cancel == []
+
+
+def test_unchanged_ladder_sends_nothing():
+    live = make_ladder([99.0, 98.0], [101.0, 102.0], prefix='live')
+    diff = QuoteDiffer().diff(make_ladder([99.0, 98.0], [101.0, 102.0]), live)
+
+    assert len(diff.keep) == 4
+    assert diff.get_cost(QuoteDiffer()) == 0
+
+
+def test_sizes_are_amended_in_place():
+    live = make_ladder([99.0], [101.0], prefix='live')
+    diff = QuoteDiffer().diff(make_ladder([99.0], [101.0], quantity=2.0), live)
+
+    assert sorted((new.price, existing.price) for new, existing in diff.amend) == \
+        [(99.0, 99.0), (101.0, 101.0)]
+
+
+def test_expensive_amends_are_replaced():
+    live = make_ladder([99.0, 98.0], [], prefix='live')
+    differ = QuoteDiffer(create_cost=1, amend_cost=3, cancel_cost=1)
+    diff = differ.diff(make_ladder([100.0, 99.0], []), live)
+
+    assert diff.amend == []
+    assert prices(diff.place) == [100.0]
+    assert prices(diff.cancel) == [98.0]
+    assert diff.get_cost(differ) == 2
+
+
+def test_levels_are_added_and_removed():
+    live = make_ladder([99.0, 98.0], [101.0, 102.0, 103.0], prefix='live')
+    diff = QuoteDiffer().diff(make_ladder([99.0, 98.0, 97.0], [101.0]), live)
+
+    assert prices(diff.place) == [97.0]
+    assert prices(diff.cancel) == [102.0, 103.0]
+    assert diff.amend == []
+
+
+def test_busy_orders_are_not_touched():
+    live = make_ladder([98.0], [], prefix='live')
+    busy = make_ladder([97.0], [], prefix='busy')
+    diff = QuoteDiffer().diff(make_ladder([100.0, 99.0], []), live, busy)
+
+    # the busy order holds a level, the other one is moved
+    assert [(new.price, existing.price) for new, existing in diff.amend] == [(100.0, 98.0)]
+    assert diff.place == [] and diff.cancel == []
+    assert all(existing not in busy for _, existing in diff.keep)
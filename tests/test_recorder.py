@@ -0,0 +1,87 @@
+import json
+
+import pytest
+from munch import DefaultMunch
+
+from market_maker.recorder import FrameRecorder, iter_frames
+from market_maker.replay import Replayer
+from market_maker.gateways.emx.adapter import EmxAdapter
+
+
+@pytest.fixture
+def cfg_fixture():
+    cfg = DefaultMunch()
+
+    cfg.strategy = DefaultMunch()
+    cfg.strategy.name = "market_maker"
+    cfg.strategy.instrument_name = "BTC-PERP"
+    cfg.strategy.mid_price_based_calculation = False
+    cfg.strategy.send_post_only_orders = True
+    cfg.strategy.tick_size = 0.5
+    cfg.strategy.stop_strategy_on_error = False
+    cfg.strategy.min_requote_interval = 0.0
+    cfg.strategy.positional_retreat = DefaultMunch()
+    cfg.strategy.positional_retreat.position_increment = None
+    cfg.strategy.positional_retreat.retreat_ticks = None
+    cfg.strategy.orders = DefaultMunch()
+    cfg.strategy.orders.asks = [[0, 1], [1, 1]]
+    cfg.strategy.orders.bids = [[0, 1], [1, 1]]
+
+    cfg.adapter = DefaultMunch()
+    cfg.adapter.streaming = DefaultMunch()
+    cfg.adapter.streaming.symbol = "BTC-PERP"
+    return cfg
+
+
+def ticker_frame(bid):
+    return json.dumps({
+        "channel": "ticker",
+        "type": "update",
+        "data": {
+            "contract_code": "BTC-PERP",
+            "quote": {"bid": str(bid), "bid_size": "1", "ask": str(bid + 0.5), "ask_size": "1"},
+        }
+    }, indent=2)
+
+
+def test_recorder_round_trip(tmp_path):
+    path = str(tmp_path / "session.rec")
+    recorder = FrameRecorder(path)
+    recorder.write(ticker_frame(100.0), received_ns=1)
+    recorder.write('{"type": "subscriptions"}', received_ns=2)
+    recorder.close()
+
+    frames = list(iter_frames(path))
+    assert [received_ns for received_ns, _ in frames] == [1, 2]
+    assert json.loads(frames[0][1])["data"]["quote"]["bid"] == "100.0"
+
+
+def test_gateway_close_writes_out_the_recording(tmp_path, cfg_fixture):
+    path = str(tmp_path / "session.rec")
+    cfg_fixture.adapter.record_path = path
+    cfg_fixture.adapter.execution = DefaultMunch()
+    adapter = EmxAdapter(cfg_fixture.adapter)
+
+    adapter.recorder.write('{"type": "subscriptions"}', received_ns=7)
+    assert list(iter_frames(path)) == []
+
+    adapter.close()
+    assert list(iter_frames(path)) == [(7, '{"type": "subscriptions"}')]
+    assert adapter.recorder is None
+
+
+@pytest.mark.asyncio
+async def test_replay_drives_the_strategy(tmp_path, cfg_fixture):
+    path = str(tmp_path / "session.rec")
+    recorder = FrameRecorder(path)
+    for idx, bid in enumerate((100.0, 100.5, 101.0)):
+        recorder.write(ticker_frame(bid), received_ns=idx * 1000)
+    recorder.close()
+
+    stats = await Replayer(cfg_fixture, path).run()
+
+    assert stats["frames"] == 3
+    assert stats["errors"] == 0
+    assert stats["requests"]["create-order"] == 1
+    assert stats["requests"]["modify-order"] == 2
+    assert stats["ticks"]["BTC-PERP"]["received"] == 3
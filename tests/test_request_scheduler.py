@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from market_maker.request_scheduler import RequestScheduler, TokenBucket
+
+
+class Sender:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    async def send(self, action, bodies):
+        if self.fail:
+            raise ConnectionError('closed')
+        self.sent.append((action, bodies))
+
+
+def make_scheduler(sender, burst=1):
+    limits = {action: {'rate': 1000, 'burst': burst} for action in RequestScheduler.PRIORITIES}
+    return RequestScheduler(sender.send, limits)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(10, 2)
+    now = bucket.updated
+    assert bucket.available(now) == 2
+
+    bucket.take(2)
+    assert bucket.available(now) == 0
+    assert bucket.get_delay(1, now) == pytest.approx(0.1)
+    assert bucket.available(now + 0.15) == 1
+    assert bucket.available(now + 10.0) == 2
+
+
+@pytest.mark.asyncio
+async def test_queued_orders_go_out_in_priority_order():
+    sender = Sender()
+    scheduler = make_scheduler(sender)
+
+    await scheduler.submit('create-order', ['uid_1'], 'create 1')
+    await scheduler.submit('cancel-order', ['eid_1'], 'cancel 1')
+    # the buckets are empty, the rest is queued
+    await scheduler.submit('create-order', ['uid_2'], 'create 2')
+    await scheduler.submit('modify-order', ['eid_2', 'eid_3'], ['amend 2', 'amend 3'])
+    await scheduler.submit('modify-order', ['eid_2'], 'amend 2, newer')
+    await scheduler.submit('cancel-order', ['eid_4'], 'cancel 4')
+    assert scheduler.get_queued() == {'cancel-order': 1, 'modify-order': 2, 'create-order': 1}
+
+    while scheduler.task is not None:
+        await asyncio.sleep(0.001)
+
+    assert [bodies for _, bodies in sender.sent] == [
+        'create 1', 'cancel 1', ['cancel 4'], ['amend 2, newer'], ['amend 3'], ['create 2']]
+    assert scheduler.get_stats()['coalesced'] == {'modify-order': 1}
+
+
+@pytest.mark.asyncio
+async def test_cancel_drops_queued_amends():
+    sender = Sender()
+    scheduler = make_scheduler(sender)
+
+    await scheduler.submit('modify-order', ['eid_1'], 'amend 1')
+    await scheduler.submit('modify-order', ['eid_1'], 'amend 1, queued')
+    await scheduler.submit('cancel-order', ['eid_1'], 'cancel 1')
+
+    assert scheduler.get_queued()['modify-order'] == 0
+    assert scheduler.get_stats()['dropped'] == {'modify-order': 1}
+    assert sender.sent == [('modify-order', 'amend 1'), ('cancel-order', 'cancel 1')]
+
+    # a new order which is still queued has no exchange id yet, it is dropped by its client id
+    await scheduler.submit('create-order', ['uid_1'], 'create 1')
+    await scheduler.submit('create-order', ['uid_2'], 'create 2')
+    assert scheduler.drop('create-order', 'uid_2')
+    assert not scheduler.drop('create-order', 'uid_1')
+    while scheduler.task is not None:
+        await asyncio.sleep(0.001)
+    assert sender.sent[2:] == [('create-order', 'create 1')]
+
+
+@pytest.mark.asyncio
+async def test_unlimited_actions_wait_behind_queued_cancels():
+    sender = Sender()
+    scheduler = RequestScheduler(sender.send, {'cancel-order': {'rate': 1000, 'burst': 1}})
+
+    await scheduler.submit('cancel-order', ['eid_1'], 'cancel 1')
+    await scheduler.submit('cancel-order', ['eid_2'], 'cancel 2')
+    await scheduler.submit('create-order', ['uid_1'], 'create 1')
+    assert sender.sent == [('cancel-order', 'cancel 1')]
+
+    while scheduler.task is not None:
+        await asyncio.sleep(0.001)
+    assert sender.sent[1:] == [('cancel-order', ['cancel 2']), ('create-order', ['create 1'])]
+
+
+@pytest.mark.asyncio
+async def test_errors_of_queued_requests_are_raised_on_submit():
+    sender = Sender()
+    scheduler = make_scheduler(sender)
+
+    await scheduler.submit('create-order', ['uid_1'], 'create 1')
+    sender.fail = True
+    await scheduler.submit('create-order', ['uid_2'], 'create 2')
+    while scheduler.task is not None:
+        await asyncio.sleep(0.001)
+
+    with pytest.raises(ConnectionError):
+        await scheduler.submit('create-order', ['uid_3'], 'create 3')
+    assert scheduler.get_queued()['create-order'] == 0
+
+
+@pytest.mark.asyncio
+async def test_rates_below_one_order_per_second_send():
+    sender = Sender()
+    scheduler = RequestScheduler(sender.send, {'create-order': {'rate': 0.5}})
+    bucket = scheduler.buckets['create-order']
+    assert bucket.burst == 1.0
+
+    await scheduler.submit('create-order', ['uid_1'], 'create 1')
+    # almost two seconds later the second order waits for the rest of its token
+    bucket.updated -= 1.95
+    await scheduler.submit('create-order', ['uid_2'], 'create 2')
+    assert sender.sent == [('create-order', 'create 1')]
+
+    await asyncio.wait_for(scheduler.task, 1.0)
+    assert sender.sent[1:] == [('create-order', ['create 2'])]
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from munch import DefaultMunch
+
+from market_maker import runtime
+
+
+def test_profiles_set_the_loop_debug_mode():
+    loop = runtime.new_event_loop(runtime.PRODUCTION, use_uvloop=False)
+    assert loop.get_debug() is False
+    assert isinstance(loop, asyncio.AbstractEventLoop)
+    loop.close()
+
+    loop = runtime.new_event_loop(runtime.DIAGNOSTIC, slow_callback_duration=0.01)
+    assert loop.get_debug() is True
+    assert loop.slow_callback_duration == 0.01
+    loop.close()
+
+    with pytest.raises(Exception):
+        runtime.new_event_loop('fast')
+
+
+def test_setup_event_loop_installs_the_loop():
+    cfg = DefaultMunch()
+    cfg.runtime = DefaultMunch()
+    cfg.runtime.profile = runtime.DIAGNOSTIC
+
+    loop = runtime.setup_event_loop(cfg)
+    try:
+        assert asyncio.get_event_loop() is loop
+        assert loop.get_debug() is True
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+    loop = runtime.setup_event_loop(DefaultMunch())
+    try:
+        assert loop.get_debug() is False
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,98 @@
+import json
+
+import aiohttp
+import pytest
+
+from market_maker.simulator.matching import MatchingEngine
+from market_maker.simulator.server import EmxSimulator
+
+
+def actions(events):
+    return [action for action, _, _ in events]
+
+
+def test_price_time_priority():
+    engine = MatchingEngine()
+    first, _ = engine.create('BTC-PERP', 'a', 'sell', 'limit', 1.0, 101.0)
+    second, _ = engine.create('BTC-PERP', 'b', 'sell', 'limit', 1.0, 100.5)
+    third, _ = engine.create('BTC-PERP', 'c', 'sell', 'limit', 1.0, 100.5)
+
+    taker, events = engine.create('BTC-PERP', 'd', 'buy', 'limit', 1.5, 101.0)
+    assert actions(events) == ['order-received', 'accepted', 'filled', 'filled', 'filled', 'filled']
+    assert second.status == 'done'
+    assert third.size_filled == 0.5
+    assert first.size_filled == 0.0
+    assert taker.status == 'done'
+    assert taker.average_fill_price == 100.5
+    assert engine.positions['BTC-PERP'] == 0.0
+
+
+def test_post_only_rejection():
+    engine = MatchingEngine()
+    engine.set_quote('BTC-PERP', 100.0, 1.0, 100.5, 1.0)
+
+    order, events = engine.create('BTC-PERP', 'a', 'buy', 'limit', 1.0, 100.5, post_only=True)
+    assert actions(events) == ['order-received', 'rejected']
+    assert order.order_id not in engine.orders
+
+    order, events = engine.create('BTC-PERP', 'b', 'buy', 'limit', 1.0, 100.0, post_only=True)
+    assert actions(events) == ['order-received', 'accepted']
+
+    events = engine.modify(order.order_id, 1.0, 101.0)
+    assert actions(events) == ['modify-received', 'modify-rejected']
+    assert engine.orders[order.order_id].price == 100.0
+
+
+def test_quote_moving_through_resting_orders_fills_them():
+    engine = MatchingEngine()
+    engine.set_quote('BTC-PERP', 100.0, 1.0, 100.5, 1.0)
+    bid, _ = engine.create('BTC-PERP', 'a', 'buy', 'limit', 2.0, 100.0, post_only=True)
+
+    events = engine.set_quote('BTC-PERP', 99.0, 1.0, 99.5, 1.5)
+    assert actions(events) == ['filled']
+    assert bid.size_filled == 1.5
+    assert engine.positions['BTC-PERP'] == 1.5
+
+    assert actions(engine.cancel(bid.order_id)) == ['cancel-received', 'canceled']
+    assert actions(engine.cancel(bid.order_id)) == ['cancel-rejected']
+
+
+@pytest.mark.asyncio
+async def test_simulator_speaks_emx_channels(unused_tcp_port):
+    simulator = EmxSimulator()
+    await simulator.start(port=unused_tcp_port)
+
+    async with aiohttp.ClientSession() as session:
+        ws = await session.ws_connect(f'http://127.0.0.1:{unused_tcp_port}/')
+        await ws.send_str(json.dumps({
+            'type': 'subscribe',
+            'channels': ['orders', 'trading', 'ticker', 'positions'],
+            'contract_codes': ['BTC-PERP'],
+        }))
+        assert json.loads((await ws.receive()).data)['type'] == 'subscriptions'
+        assert json.loads((await ws.receive()).data)['type'] == 'snapshot'
+        assert json.loads((await ws.receive()).data)['channel'] == 'positions'
+
+        await ws.send_str(json.dumps({
+            'channel': 'trading',
+            'type': 'request',
+            'action': 'create-order',
+            'data': [
+                {'client_id': 'a', 'contract_code': 'BTC-PERP', 'type': 'limit', 'side': 'buy',
+                 'size': '1.0', 'price': '100.0', 'post_only': True},
+            ]
+        }))
+        received = json.loads((await ws.receive()).data)
+        accepted = json.loads((await ws.receive()).data)
+        assert received['action'] == 'order-received'
+        assert accepted['action'] == 'accepted'
+        assert accepted['data']['client_id'] == 'a'
+
+        resp = await session.get(
+            f'http://127.0.0.1:{unused_tcp_port}/v1/orders?contract_code=BTC-PERP')
+        orders = (await resp.json())['orders']
+        assert [order['order_id'] for order in orders] == [accepted['data']['order_id']]
+
+        await ws.close()
+
+    await simulator.stop()
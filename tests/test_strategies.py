@@ -1,11 +1,18 @@
+import time
+import asyncio
+
 import pytest
 from munch import DefaultMunch
 
 from market_maker.strategy.market_maker import MarketMaker
 from market_maker.gateways import gateway_interface
 
+from market_maker.order_state import State
 from market_maker.definitions import (
+    ApiResult,
     TopOfBook,
+    NewOrderAcknowledgement,
+    OrderEliminationAcknowledgement,
 )
 
 
@@ -38,7 +45,7 @@ class BittestAdapter(gateway_interface.GatewayInterface):
         pass
 
     async def send_order(self, order_request):
-        res = api_result()
+        res = ApiResult()
         res.success = True
 
         self.orders_sent += 1
@@ -46,7 +53,7 @@ class BittestAdapter(gateway_interface.GatewayInterface):
         return res
 
     async def send_orders(self, orders_request):
-        res = api_result()
+        res = ApiResult()
         res.success = True
 
         self.orders_sent += len(orders_request)
@@ -55,14 +62,14 @@ class BittestAdapter(gateway_interface.GatewayInterface):
         return res
 
     async def amend_orders(self, new, old):
-        res = api_result()
+        res = ApiResult()
         res.success = True
 
         self.orders_amended += len(new)
         return res
 
     async def amend_order(self, i, j):
-        res = api_result()
+        res = ApiResult()
         res.success = True
 
         self.orders_amended += 1
@@ -70,20 +77,20 @@ class BittestAdapter(gateway_interface.GatewayInterface):
         return res
 
     async def cancel_order(self, cancel_request):
-        res = api_result()
+        res = ApiResult()
         res.success = True
 
         self.orders_cancelled += 1
         return res
 
     async def cancel_orders(self, cancel_requests):
-        res = api_result()
+        res = ApiResult()
         res.success = True
 
         self.orders_cancelled += len(cancel_requests)
         return res
 
-    async def cancel_active_orders(self):
+    async def cancel_active_orders(self, contract_code=None):
         pass
 
     async def start(self):
@@ -265,3 +272,86 @@ async def test_maker_positional_retreat(cfg_strategy_fixture):
 
     assert orders[0].price == _tob.best_bid_price - 10*strategy.tick_size
     assert orders[1].price == _tob.best_ask_price
+
+
+@pytest.mark.asyncio
+async def test_maker_expects_eliminations_of_its_cancels(cfg_strategy_fixture):
+    # an amend costs more than a cancel and a new order, moved levels are replaced
+    cfg_strategy_fixture.request_costs = {'amend': 3}
+    adapter = BittestAdapter()
+    strategy = MarketMaker(cfg_strategy_fixture, adapter)
+    om = strategy.orders_manager
+
+    def make_tob(bid, ask):
+        tob = TopOfBook()
+        tob.best_bid_price = bid
+        tob.best_ask_price = ask
+        return tob
+
+    strategy.tob = make_tob(99.0, 101.0)
+    await om.amend_active_orders(strategy.generate_orders())
+    placed = om.get_live_orders()
+    for order in placed:
+        ack = NewOrderAcknowledgement()
+        ack.order_id = order.order_id
+        await strategy.on_market_update(ack)
+
+    strategy.tob = make_tob(100.0, 102.0)
+    await om.amend_active_orders(strategy.generate_orders())
+    assert adapter.orders_cancelled == 2 and adapter.orders_sent == 4
+
+    for order in placed:
+        elimination = OrderEliminationAcknowledgement()
+        elimination.order_id = order.order_id
+        await strategy.on_market_update(elimination)
+        assert order.order_id not in om.orders_states
+
+    assert om.get_memory_gauges()['ids_to_cancel_on_fill'] == 0
+    assert all(state.state is State.InsertPending for state in om.orders_states.values())
+
+
+@pytest.mark.asyncio
+async def test_maker_wakes_up_on_a_tob_update(cfg_strategy_fixture):
+    adapter = BittestAdapter()
+    strategy = MarketMaker(cfg_strategy_fixture, adapter)
+    strategy.MAX_IDLE_SECS = 10.0
+
+    task = asyncio.ensure_future(strategy.wait_for_update())
+    await asyncio.sleep(0.01)
+    assert not task.done()
+
+    tob = TopOfBook()
+    tob.product = cfg_strategy_fixture.instrument_name
+    adapter.tob_mailbox.put(tob)
+    await asyncio.wait_for(task, 1.0)
+    assert not strategy.wakeup.is_set()
+
+
+@pytest.mark.asyncio
+async def test_maker_requotes_are_throttled(cfg_strategy_fixture):
+    cfg_strategy_fixture.min_requote_interval = 0.2
+    strategy = MarketMaker(cfg_strategy_fixture, BittestAdapter())
+
+    # the last re-quote was just sent, the update is handled once the interval passed
+    strategy.last_amend_time = time.time()
+    strategy.wakeup.set()
+    started = time.monotonic()
+    await strategy.wait_for_update()
+    assert time.monotonic() - started >= 0.15
+
+    # long after the last re-quote an update is handled at once
+    strategy.last_amend_time = time.time() - 1.0
+    strategy.wakeup.set()
+    started = time.monotonic()
+    await strategy.wait_for_update()
+    assert time.monotonic() - started < 0.1
+
+
+@pytest.mark.asyncio
+async def test_maker_wakes_up_when_idle(cfg_strategy_fixture):
+    strategy = MarketMaker(cfg_strategy_fixture, BittestAdapter())
+    strategy.MAX_IDLE_SECS = 0.05
+
+    started = time.monotonic()
+    await asyncio.wait_for(strategy.wait_for_update(), 1.0)
+    assert time.monotonic() - started >= 0.04
@@ -0,0 +1,64 @@
+import time
+
+from munch import DefaultMunch
+
+from market_maker.latency import Histogram
+from market_maker.supervisor import Supervisor, shard_config
+
+
+def make_config(instruments, workers):
+    cfg = {
+        'logger': {'name': 'mm_bot', 'path_to_file': '/tmp/mm_bot.log'},
+        'strategies': [{'name': 'market_maker', 'instrument_name': instrument}
+                       for instrument in instruments],
+        'adapter': {
+            'api_key': '',
+            'streaming': {'url': 'wss://api.testnet.emx.com', 'symbol': list(instruments)},
+            'execution': {'url': 'http://api.testnet.emx.com', 'symbol': list(instruments)},
+        },
+        'supervisor': {'workers': workers, 'heartbeat_interval': 0.05, 'max_restarts': 1},
+    }
+    return DefaultMunch.fromDict(cfg, None)
+
+
+def test_instruments_are_sharded_round_robin():
+    cfg = make_config(['BTC-PERP', 'ETH-PERP', 'ETH-BTC'], 2).toDict()
+    shards = shard_config(cfg, 2)
+
+    assert [[s['instrument_name'] for s in shard['strategies']] for shard in shards] == \
+        [['BTC-PERP', 'ETH-BTC'], ['ETH-PERP']]
+    assert shards[1]['adapter']['streaming'] == {'url': 'wss://api.testnet.emx.com',
+                                                 'symbol': ['ETH-PERP']}
+    assert shards[1]['adapter']['execution']['symbol'] == ['ETH-PERP']
+    assert shards[1]['logger']['path_to_file'] == '/tmp/mm_bot.log.1'
+    # the original config is not modified
+    assert cfg['adapter']['streaming']['symbol'] == ['BTC-PERP', 'ETH-PERP', 'ETH-BTC']
+
+    assert len(shard_config(cfg, 8)) == 3
+
+
+def exiting_worker(cfg_dict, conn, heartbeat_interval, metrics_interval):
+    histogram = Histogram()
+    histogram.record(1000)
+    instrument = cfg_dict['strategies'][0]['instrument_name']
+    conn.send(('heartbeat', {'positions': {instrument: 1.0}, 'active': {instrument: True},
+                             'latency': {('tick_to_wire', 'modify-order'): histogram}}))
+
+
+def test_supervisor_restarts_exited_workers():
+    supervisor = Supervisor(make_config(['BTC-PERP', 'ETH-PERP'], 2), target=exiting_worker)
+    supervisor.start()
+    try:
+        deadline = time.time() + 60.0
+        while not all(worker.failed for worker in supervisor.workers):
+            assert time.time() < deadline
+            supervisor.poll(0.05)
+    finally:
+        supervisor.stop()
+
+    assert [worker.restarts for worker in supervisor.workers] == [1, 1]
+
+    report = supervisor.get_report()
+    assert report['positions'] == {'BTC-PERP': 1.0, 'ETH-PERP': 1.0}
+    assert report['latency']['tick_to_wire']['modify-order']['count'] == 2
+    assert report['workers'][0] == {'alive': False, 'restarts': 1}
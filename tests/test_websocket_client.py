@@ -0,0 +1,57 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from market_maker.websocket_client import WebsocketClient
+
+
+class FakeWs:
+    def __init__(self, msgs):
+        self.msgs = asyncio.Queue()
+        for msg in msgs:
+            self.msgs.put_nowait(msg)
+        self.pings = 0
+
+    async def receive(self):
+        return await self.msgs.get()
+
+    async def ping(self, msg):
+        self.pings += 1
+
+
+def text_msg(data):
+    return aiohttp.WSMessage(aiohttp.WSMsgType.text, data, None)
+
+
+@pytest.mark.asyncio
+async def test_reader_pushes_frames_in_order():
+    client = WebsocketClient()
+    client.ws = FakeWs([
+        text_msg('{"a": 1}'),
+        text_msg('{"a": 2}'),
+        aiohttp.WSMessage(aiohttp.WSMsgType.closed, None, None),
+    ])
+    client.start_reader()
+
+    assert (await client.receive()).data == '{"a": 1}'
+    assert (await client.receive()).data == '{"a": 2}'
+    assert (await client.receive()).type == aiohttp.WSMsgType.closed
+
+    await asyncio.sleep(0)
+    assert client.reader_task.done()
+    client.stop_reader()
+
+
+@pytest.mark.asyncio
+async def test_stale_connection_is_reported():
+    client = WebsocketClient()
+    client.HEARTBEAT_INTERVAL_SECS = 0.01
+    client.STALE_CONNECTION_SECS = 0.05
+    client.ws = FakeWs([])
+    client.start_reader()
+
+    msg = await asyncio.wait_for(client.receive(), timeout=1.0)
+    assert msg.type == aiohttp.WSMsgType.error
+    assert client.ws.pings >= 1
+    client.stop_reader()